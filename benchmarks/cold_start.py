@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Benchmark of the first chunk of a search on a cold page cache, e.g. on an indexer that has just booted, by the access
+hints given for the database (the geoip command's prefetch and lock_tree options).
+
+Before each run the database file is evicted from the page cache: all clean pages are dropped through
+/proc/sys/vm/drop_caches where that is allowed (as root on Linux), and otherwise the pages of the database file alone
+with posix_fadvise(POSIX_FADV_DONTNEED). Then a new process opens the database and looks up a chunk of random
+IPv4 addresses, and reports:
+
+    open         -- the time to open the database, which includes locking the search tree with lock_tree
+    first chunk  -- the time to look up the chunk
+    total        -- open + first chunk, i.e. the latency of the first chunk of a search
+    major faults -- the page faults that had to wait for the disk
+
+With the default hints every node of the search tree that a lookup reads costs a page fault and a small read from disk,
+and the kernel reads ahead around it, also in the data section. With prefetch the tree is read ahead in large reads as
+soon as the database is opened, and the data section is not read ahead. With lock_tree the whole tree is read and
+locked in memory while the database is opened, subject to RLIMIT_MEMLOCK (ulimit -l).
+
+The search tree has to be large for this to matter, as in the Enterprise and City databases; the results also depend
+on the storage (e.g. an SSD or a network volume). If the page cache can not be dropped, every run is warm.
+
+Usage:
+    python benchmarks/cold_start.py [--events N] [--repeat 3] [--modes default,prefetch,lock_tree] \\
+        data/databases/GeoIP2-Enterprise.mmdb
+"""
+import argparse
+import ipaddress
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
+
+import maxminddb  # noqa: E402
+
+MODES = {'default': {}, 'prefetch': {'prefetch': True}, 'lock_tree': {'lock_tree': True}}
+
+
+def child(path, mode, events):
+    ''' Opens the database and looks up a chunk of random addresses, and prints the timings. '''
+    rng = random.Random(0)
+    ips = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(events)]
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_majflt
+    start_time = time.perf_counter()
+    reader = maxminddb.open_database(path, maxminddb.MODE_MMAP, **MODES[mode])
+    open_time = time.perf_counter()
+    reader.get_many(ips)
+    chunk_time = time.perf_counter()
+    statistics = reader.statistics()
+    print(json.dumps(dict(
+        open=open_time - start_time, chunk=chunk_time - open_time,
+        faults=resource.getrusage(resource.RUSAGE_SELF).ru_majflt - faults,
+        locked=statistics['search_tree_locked'], lock_error=statistics['search_tree_lock_error'])))
+    reader.close()
+
+
+def drop_page_cache(path):
+    ''' Evicts the database file from the page cache. Returns how it was done, or None if it could not be. '''
+    os.sync()
+    try:
+        with open('/proc/sys/vm/drop_caches', 'w') as drop_caches:
+            drop_caches.write('1')
+        return 'drop_caches'
+    except OSError:
+        pass
+    if hasattr(os, 'posix_fadvise'):
+        descriptor = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+            return 'posix_fadvise'
+        except OSError:
+            pass
+        finally:
+            os.close(descriptor)
+    return None
+
+
+def run(path, mode, events):
+    ''' Returns the timings of one cold run in a new process, and how the page cache was dropped. '''
+    dropped = drop_page_cache(path)
+    output = subprocess.check_output([sys.executable, __file__, '--child', mode, '--events', str(events), path])
+    return json.loads(output), dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the first chunk of lookups on a cold page cache.')
+    parser.add_argument('database', help='the MaxMind DB to open')
+    parser.add_argument('--events', type=int, default=10000, help='random addresses in the chunk (default: 10000)')
+    parser.add_argument('--repeat', type=int, default=3, help='cold runs per mode, the median is reported (default: 3)')
+    parser.add_argument('--modes', default='default,prefetch,lock_tree',
+                        help='comma-separated hints (default: default,prefetch,lock_tree)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.database, args.child, args.events)
+        return
+
+    with maxminddb.open_database(args.database, maxminddb.MODE_MMAP) as reader:
+        tree_size = reader.metadata().search_tree_size
+    print('database: {:.1f} MiB, search tree: {:.1f} MiB, {} addresses'.format(
+        os.path.getsize(args.database) / 2 ** 20, tree_size / 2 ** 20, args.events))
+    print('{:<10} {:>10} {:>16} {:>10} {:>14}'.format('hints', 'open (ms)', 'first chunk (ms)', 'total (ms)',
+                                                      'major faults'))
+    for mode in args.modes.split(','):
+        runs = []
+        for _ in range(args.repeat):
+            (result, dropped) = run(args.database, mode, args.events)
+            runs.append(result)
+        runs.sort(key=lambda result: result['open'] + result['chunk'])
+        median = runs[len(runs) // 2]
+        print('{:<10} {:>10.1f} {:>16.1f} {:>10.1f} {:>14}'.format(
+            mode, median['open'] * 1000, median['chunk'] * 1000, (median['open'] + median['chunk']) * 1000,
+            median['faults']))
+        if mode == 'lock_tree' and not median['locked']:
+            print('  the search tree was not locked: {}'.format(median['lock_error']))
+    print('page cache dropped with: {}'.format(dropped or 'nothing (the runs were warm)'))
+
+
+if __name__ == '__main__':
+    main()
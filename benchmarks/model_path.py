@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for building the geoip command's event fields from one GeoIP2 database.
+
+Compares the per-address cost of the model path, which decoded every record in full with a geoip2.database.Reader
+opened without a field projection, built a geoip2 model (e.g. geoip2.models.City) for it and read the fields from its
+attributes, with the raw path the command uses now, which decodes only the projected fields of the record with
+geoip2.database.Reader.raw_many and passes them to the database's field plan.
+
+Usage:
+    python benchmarks/model_path.py [--lookups N] data/databases/GeoIP2-City.mmdb ...
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+
+import geoip2.database  # noqa: E402
+from geoip_fields import compile_plan  # noqa: E402
+
+
+def model_fields(database, response):
+    ''' The field builders from before the field plans, reading the attributes of a geoip2 model. '''
+    if database == 'City':
+        country = response.country.name
+        country_code = response.country.iso_code
+        if country is None and response.registered_country.name is not None:
+            country = response.registered_country.name + ' (registered)'
+            country_code = response.registered_country.iso_code + ' (registered)'
+        return {
+            'Country': country,
+            'Region': response.subdivisions.most_specific.name,
+            'City': response.city.name,
+            'lat': response.location.latitude,
+            'lon': response.location.longitude,
+            'Region.code': response.subdivisions.most_specific.iso_code,
+            'Postal.code': response.postal.code,
+            'Country.code': country_code,
+            'network': response.traits.network}
+    if database == 'Enterprise':
+        return {
+            'ip_address': response.traits.ip_address,
+            'country': '{} ({})'.format(response.country.name, response.country.iso_code),
+            'city': response.city.name,
+            'postal_code': response.postal.code,
+            'latitude': response.location.latitude,
+            'longitude': response.location.longitude,
+            'accuracy_radius': response.location.accuracy_radius,
+            'autonomous_system_number': response.traits.autonomous_system_number,
+            'autonomous_system_organization': response.traits.autonomous_system_organization,
+            'isp': response.traits.isp,
+            'organization': response.traits.organization,
+            'domain': response.traits.domain,
+            'user_type': response.traits.user_type,
+            'connection_type': response.traits.connection_type}
+    if database == 'Anonymous-IP':
+        return {
+            'is_anonymous': response.is_anonymous,
+            'is_anonymous_vpn': response.is_anonymous_vpn,
+            'is_hosting_provider': response.is_hosting_provider,
+            'is_public_proxy': response.is_public_proxy,
+            'is_residential_proxy': response.is_residential_proxy,
+            'is_tor_exit_node': response.is_tor_exit_node,
+            'network': response.network}
+    if database == 'ASN':
+        return {
+            'autonomous_system_number': response.autonomous_system_number,
+            'autonomous_system_organization': response.autonomous_system_organization,
+            'network': response.network}
+    if database == 'Connection-Type':
+        return {'connection_type': response.connection_type, 'network': response.network}
+    if database == 'Domain':
+        return {'domain': response.domain}
+    return {
+        'autonomous_system_number': response.autonomous_system_number,
+        'autonomous_system_organization': response.autonomous_system_organization,
+        'isp': response.isp,
+        'organization': response.organization,
+        'network': response.network}
+
+
+def database_name(reader):
+    ''' Returns the name of the field plan for a reader (e.g. 'City' for GeoLite2-City). '''
+    database_type = reader.metadata().database_type
+    for name in ('Anonymous-IP', 'ASN', 'Connection-Type', 'Domain', 'ISP', 'City', 'Enterprise'):
+        if database_type.endswith(name):
+            return name
+    if database_type.endswith('Country'):
+        return 'City'
+    sys.exit('unsupported database type: {}'.format(database_type))
+
+
+def random_addresses(reader, count, ipv6):
+    ''' Returns up to count random addresses that have a record in the database, so that every lookup builds fields.
+    '''
+    rng = random.Random(0)
+    addresses = []
+    for _ in range(count * 100):
+        if ipv6:
+            ip = str(ipaddress.IPv6Address(rng.getrandbits(128)))
+        else:
+            ip = str(ipaddress.IPv4Address(rng.getrandbits(32)))
+        if reader.raw(ip)[0] is not None:
+            addresses.append(ip)
+            if len(addresses) == count:
+                break
+    return addresses
+
+
+def best_of(function, addresses, repeat):
+    ''' Returns the best time per address, in microseconds, of building the fields for every address. '''
+    return min(timeit.repeat(lambda: function(addresses), number=1, repeat=repeat)) / len(addresses) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare building event fields from geoip2 models and raw records.')
+    parser.add_argument('databases', nargs='+', help='GeoIP2 databases to look addresses up in')
+    parser.add_argument('--lookups', type=int, default=20000, help='number of random addresses (default: 20000)')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per path, best is reported (default: 5)')
+    parser.add_argument('--ipv6', action='store_true', help='look up IPv6 instead of IPv4 addresses')
+    args = parser.parse_args()
+
+    print('{:<40} {:>12} {:>12} {:>8}'.format('database', 'model (us)', 'raw (us)', 'speedup'))
+    for path in args.databases:
+        with geoip2.database.Reader(path) as probe:
+            database = database_name(probe)
+        plan = compile_plan(database)
+        method = database.lower().replace('-', '_')
+        full_reader = geoip2.database.Reader(path)
+        reader = geoip2.database.Reader(path, fields=plan.paths)
+        if args.ipv6 and reader.metadata().ip_version == 4:
+            full_reader.close()
+            reader.close()
+            continue
+        addresses = random_addresses(reader, args.lookups, args.ipv6)
+        if not addresses:
+            print('{:<40} no records found'.format(os.path.basename(path)))
+            full_reader.close()
+            reader.close()
+            continue
+
+        def model_path(ips):
+            return [model_fields(database, response) if response is not None else None
+                    for response in full_reader.get_many(method, ips)]
+
+        def raw_path(ips):
+            return [plan.fields(record, ip, prefix_len) if record is not None else None
+                    for ip, (record, prefix_len) in zip(ips, reader.raw_many(ips))]
+
+        if model_path(addresses) != raw_path(addresses):
+            sys.exit('{}: the paths disagree'.format(path))
+        model = best_of(model_path, addresses, args.repeat)
+        raw = best_of(raw_path, addresses, args.repeat)
+        print('{:<40} {:>12.2f} {:>12.2f} {:>7.2f}x'.format(os.path.basename(path), model, raw, model / raw))
+        full_reader.close()
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Benchmark for looking up a large chunk of events in worker processes (the geoip command's workers option).
+
+Builds a synthetic chunk of events with random IPv4 addresses, some of them repeated, and times looking up its distinct
+addresses in every given database in the search process alone (geoip_lookup.MultiReader) and with pools of worker
+processes (geoip_lookup.LookupPool). The time of the pools excludes starting the workers, which the command does once
+per search. The speedup is bounded by the number of CPU cores.
+
+Usage:
+    python benchmarks/parallel_lookup.py [--events N] [--workers 1,2,4] data/databases/GeoIP2-City.mmdb ...
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+
+import geoip2.database  # noqa: E402
+from geoip_fields import compile_plan  # noqa: E402
+from geoip_lookup import LookupPool, MultiReader  # noqa: E402
+
+# The plan of each database type, as chosen by the command.
+PLANS = ('Anonymous-IP', 'ASN', 'Connection-Type', 'Domain', 'ISP', 'City', 'Enterprise')
+
+
+def database_name(path):
+    ''' Returns the name of the field plan for a database (e.g. 'City' for GeoLite2-City). '''
+    with geoip2.database.Reader(path) as reader:
+        database_type = reader.metadata().database_type
+    for name in PLANS:
+        if database_type.endswith(name):
+            return name
+    if database_type.endswith('Country'):
+        return 'City'
+    sys.exit('unsupported database type: {}'.format(database_type))
+
+
+def synthetic_chunk(events, distinct):
+    ''' Returns the IP address field of a chunk of events, drawn from a number of distinct random addresses. '''
+    rng = random.Random(0)
+    addresses = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(distinct)]
+    return [rng.choice(addresses) for _ in range(events)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare looking up a chunk in the search process and in workers.')
+    parser.add_argument('databases', nargs='+', help='GeoIP2 databases to look addresses up in')
+    parser.add_argument('--events', type=int, default=50000, help='events in the chunk (default: 50000)')
+    parser.add_argument('--distinct', type=int, default=40000, help='distinct addresses in the chunk (default: 40000)')
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated pool sizes to time (default: 1,2,4)')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='fewest addresses per process, as batch_size in geoip.conf (default: 5000)')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per setup, best is reported (default: 3)')
+    args = parser.parse_args()
+
+    names = [database_name(path) for path in args.databases]
+    plans = [compile_plan(name) for name in names]
+    # No caches, so that every run looks up every address in the databases.
+    options = dict(network_cache_size=0, record_cache_size=0)
+    reader = MultiReader([(name, geoip2.database.Reader(path, fields=plan.paths, **options), plan)
+                          for name, path, plan in zip(names, args.databases, plans)])
+    ips = list(dict.fromkeys(synthetic_chunk(args.events, args.distinct)))
+
+    def best_of(lookup):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = lookup()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    (single, expected) = best_of(lambda: reader.lookup_many(ips))
+    print('{} events, {} distinct addresses, {} databases, {} CPUs'.format(
+        args.events, len(ips), len(reader), os.cpu_count()))
+    print('{:<24} {:>10} {:>8}'.format('processes', 'time (s)', 'speedup'))
+    print('{:<24} {:>10.3f} {:>7.2f}x'.format('search process only', single, 1.0))
+    for workers in (int(count) for count in args.workers.split(',')):
+        pool = LookupPool(workers, args.batch_size, 600, list(zip(names, args.databases, [options] * len(names))),
+                          [], ['en'], False, None)
+        pool.lookup_many(reader, ips)  # Wait for the workers to start
+        (elapsed, result) = best_of(lambda: pool.lookup_many(reader, ips))
+        pool.close()
+        if result is None:
+            sys.exit('{} workers: too few addresses for the batch size'.format(workers))
+        if result != expected:
+            sys.exit('{} workers: the results differ'.format(workers))
+        print('{:<24} {:>10.3f} {:>7.2f}x'.format('{} workers'.format(workers), elapsed, single / elapsed))
+    for (_, database_reader, _, _) in reader.databases:
+        database_reader.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Memory accounting of concurrent search processes that read the same database, by open mode (Linux only).
+
+Starts a number of processes that each open the database, as concurrent geoip searches do, and look up the same random
+addresses to warm it. Then reports the memory of the processes from /proc/<pid>/smaps_rollup:
+
+    rss   -- resident memory, which counts every page a process has mapped, including pages shared with others
+    pss   -- proportional set size, which divides each shared page between the processes that map it; the sum over the
+             processes is the memory they actually use
+    shmem -- the growth of Shmem in /proc/meminfo, i.e. the copies of the database in /dev/shm (MODE_SHM)
+
+With MODE_MEMORY each process holds a private copy, so the total PSS grows by the size of the database with every
+process. With MODE_MMAP and MODE_SHM the pages of the database are shared and the total PSS stays flat, while the RSS
+of each process still includes the pages it has touched.
+
+Usage:
+    python benchmarks/shared_memory.py [--processes N] [--modes memory,mmap,shm] data/databases/GeoIP2-City.mmdb
+"""
+import argparse
+import ipaddress
+import os
+import random
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
+
+import maxminddb  # noqa: E402
+
+MODES = {'memory': maxminddb.MODE_MEMORY, 'mmap': maxminddb.MODE_MMAP, 'shm': maxminddb.MODE_SHM}
+
+
+def child(path, mode, lookups):
+    ''' Opens the database, warms it and waits for the parent to measure this process. '''
+    reader = maxminddb.open_database(path, MODES[mode])
+    rng = random.Random(0)
+    for _ in range(lookups):
+        reader.get(ipaddress.IPv4Address(rng.getrandbits(32)))
+    print('ready', flush=True)
+    sys.stdin.read()
+    reader.close()
+
+
+def smaps_rollup(pid):
+    ''' Returns the Rss and Pss of a process, in KiB. '''
+    values = {}
+    with open('/proc/{}/smaps_rollup'.format(pid)) as smaps:
+        for line in smaps:
+            (name, _, rest) = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                values[name] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def shmem():
+    ''' Returns the Shmem of /proc/meminfo, in KiB. '''
+    with open('/proc/meminfo') as meminfo:
+        for line in meminfo:
+            if line.startswith('Shmem:'):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(path, mode, processes, lookups):
+    ''' Returns the total rss and pss of the processes, and the growth of Shmem, in MiB. '''
+    before = shmem()
+    children = [subprocess.Popen(
+        [sys.executable, __file__, '--child', mode, '--lookups', str(lookups), path],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True) for _ in range(processes)]
+    try:
+        for process in children:
+            process.stdout.readline()
+        usage = [smaps_rollup(process.pid) for process in children]
+        shared = shmem() - before
+    finally:
+        for process in children:
+            process.stdin.close()
+            process.wait()
+    return sum(rss for rss, _ in usage) / 1024, sum(pss for _, pss in usage) / 1024, shared / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the memory of concurrent processes reading a database.')
+    parser.add_argument('database', help='the MaxMind DB to open')
+    parser.add_argument('--processes', type=int, default=8, help='concurrent processes (default: 8)')
+    parser.add_argument('--modes', default='memory,mmap,shm', help='comma-separated modes (default: memory,mmap,shm)')
+    parser.add_argument('--lookups', type=int, default=100000, help='random lookups per process (default: 100000)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.database, args.child, args.lookups)
+        return
+
+    print('database: {:.1f} MiB, {} processes'.format(os.path.getsize(args.database) / 2 ** 20, args.processes))
+    print('{:<8} {:>14} {:>14} {:>14} {:>16}'.format('mode', 'rss (MiB)', 'pss (MiB)', 'shmem (MiB)', 'pss/process'))
+    for mode in args.modes.split(','):
+        (rss, pss, shared) = measure(args.database, mode, args.processes, args.lookups)
+        print('{:<8} {:>14.1f} {:>14.1f} {:>14.1f} {:>16.1f}'.format(mode, rss, pss, shared, pss / args.processes))
+
+
+if __name__ == '__main__':
+    main()
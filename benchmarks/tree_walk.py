@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for the search tree walk of the pure Python MaxMind DB reader.
+
+Compares the per-lookup latency of the current walk (maxminddb.Reader._find_address_in_tree) with the walk it
+replaced, which extracted one bit at a time from the packed address and sliced and unpacked every node from the
+buffer. Only the tree walk is timed; the address parsing and record decoding are the same for both.
+
+Usage:
+    python benchmarks/tree_walk.py [--lookups N] [--ipv6] data/databases/*.mmdb
+
+Pass databases with different record sizes (e.g. GeoLite2-ASN is 24 bits, GeoIP2-City is 28 bits) to compare
+each node reader.
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+import maxminddb  # noqa: E402
+from maxminddb.errors import InvalidDatabaseError  # noqa: E402
+
+
+def legacy_read_node(reader, node_number, index):
+    ''' The node reader from before the table-driven walk. '''
+    base_offset = node_number * reader._metadata.node_byte_size
+
+    record_size = reader._metadata.record_size
+    if record_size == 24:
+        offset = base_offset + index * 3
+        node_bytes = b"\x00" + reader._buffer[offset : offset + 3]
+    elif record_size == 28:
+        offset = base_offset + 3 * index
+        node_bytes = bytearray(reader._buffer[offset : offset + 4])
+        if index:
+            node_bytes[0] = 0x0F & node_bytes[0]
+        else:
+            middle = (0xF0 & node_bytes.pop()) >> 4
+            node_bytes.insert(0, middle)
+    elif record_size == 32:
+        offset = base_offset + index * 4
+        node_bytes = reader._buffer[offset : offset + 4]
+    else:
+        raise InvalidDatabaseError(f"Unknown record size: {record_size}")
+    return struct.unpack(b"!I", node_bytes)[0]
+
+
+def legacy_find_address_in_tree(reader, packed):
+    ''' The tree walk from before the table-driven walk. '''
+    bit_count = len(packed) * 8
+    node = reader._start_node(bit_count)
+    node_count = reader._metadata.node_count
+
+    i = 0
+    while i < bit_count and node < node_count:
+        bit = 1 & (packed[i >> 3] >> 7 - (i % 8))
+        node = legacy_read_node(reader, node, bit)
+        i = i + 1
+
+    if node == node_count:
+        return 0, i
+    if node > node_count:
+        return node, i
+
+    raise InvalidDatabaseError("Invalid node in search tree")
+
+
+def random_addresses(count, ipv6):
+    rng = random.Random(0)
+    size = 16 if ipv6 else 4
+    return [bytearray(rng.getrandbits(8) for _ in range(size)) for _ in range(count)]
+
+
+def best_of(function, addresses, repeat):
+    ''' Returns the best time per lookup, in microseconds, of walking the tree for every address. '''
+    def run():
+        for packed in addresses:
+            function(packed)
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(addresses) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the legacy and current search tree walks.')
+    parser.add_argument('databases', nargs='+', help='MaxMind DB files to look addresses up in')
+    parser.add_argument('--lookups', type=int, default=20000, help='number of random addresses (default: 20000)')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per walk, best is reported (default: 5)')
+    parser.add_argument('--ipv6', action='store_true', help='look up IPv6 instead of IPv4 addresses')
+    args = parser.parse_args()
+
+    print('{:<40} {:>6} {:>12} {:>12} {:>8}'.format('database', 'record', 'legacy (us)', 'current (us)', 'speedup'))
+    for path in args.databases:
+        reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+        if args.ipv6 and reader.metadata().ip_version == 4:
+            reader.close()
+            continue
+        addresses = random_addresses(args.lookups, args.ipv6)
+        for packed in addresses:
+            if legacy_find_address_in_tree(reader, packed) != reader._find_address_in_tree(packed):
+                sys.exit('{}: the walks disagree for {}'.format(path, bytes(packed).hex()))
+
+        legacy = best_of(lambda packed: legacy_find_address_in_tree(reader, packed), addresses, args.repeat)
+        current = best_of(reader._find_address_in_tree, addresses, args.repeat)
+        print('{:<40} {:>6} {:>12.2f} {:>12.2f} {:>7.2f}x'.format(
+            os.path.basename(path), reader.metadata().record_size, legacy, current, legacy / current))
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
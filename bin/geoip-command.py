@@ -2,14 +2,21 @@
 
 import sys
 import os
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
 
 from splunklib.searchcommands import \
-    dispatch, StreamingCommand, Configuration, Option, validators 
+    dispatch, StreamingCommand, Configuration, Option, validators, SearchMetric
 
 import geoip2.database
-from geoip2.errors import AddressNotFoundError
+
+from geoip_daemon import DaemonClient, DaemonError, daemon_settings, format_histogram
+from geoip_fields import compile_plan, extra_field_names
+from geoip_lookup import LookupCache, LookupPool, MultiReader, WorkerError, worker_settings
+from geoip_readers import DATABASES, ReaderManager, find_database, is_requested, reader_options
 
 
 @Configuration(distributed=True)
@@ -33,6 +40,18 @@ class GeoIPCommand(StreamingCommand):
         default="ip",
         validate=validators.Fieldname())
 
+    integer = Option(
+        doc='''
+            **Syntax:** **integer=***<bool>*
+            **Description:** Specify whether the IP address field holds addresses as decimal integers (e.g. 3232235777
+                for 192.168.1.1), such as the output of an earlier conversion. Integers below 2^32 are IPv4 addresses,
+                and larger ones IPv6 addresses. The addresses are looked up from the integers directly, and the
+                network and ip_address fields are added in the standard notation.
+            **Default:** false''',
+        require=False,
+        default=False,
+        validate=validators.Boolean())
+
     fillnull = Option(
         doc='''
             **Syntax:** **fillnull=***<string>*
@@ -41,17 +60,485 @@ class GeoIPCommand(StreamingCommand):
         require=False,
         default=None)
 
+    extra_fields = Option(
+        doc='''
+            **Syntax:** **extra_fields=***<field>,...*
+            **Description:** Specify additional fields to add to events from the databases that have them, e.g.
+                time_zone,accuracy_radius for the city database. See the usage documentation for the fields of each
+                database.
+            **Default:** none''',
+        require=False,
+        default=None,
+        validate=validators.List())
+
+    locale = Option(
+        doc='''
+            **Syntax:** **locale=***<locale>,...*
+            **Description:** Specify the languages of the names of countries, regions, cities and continents, in order
+                of preference, e.g. de,en. Each name is taken in the first language that the database has it in. Only
+                the names in these languages are decoded. Valid locales are de, en, es, fr, ja, pt-BR, ru and zh-CN.
+            **Default:** en''',
+        require=False,
+        default=None,
+        validate=validators.List())
+
+    cache_size = Option(
+        doc='''
+            **Syntax:** **cache_size=***<int>*
+            **Description:** Specify the number of IP addresses whose results are cached for the rest of the search.
+                Repeated addresses are answered from the cache without querying the databases. Set to 0 to disable the
+                cache.
+            **Default:** 10000''',
+        require=False,
+        default=10000,
+        validate=validators.Integer(minimum=0))
+
+    network_cache_size = Option(
+        doc='''
+            **Syntax:** **network_cache_size=***<int>*
+            **Description:** Specify the number of networks cached for each database. A cached network answers the
+                lookup of any address within it (e.g. every address in a /24) without querying the database. Set to
+                0 to disable the cache.
+            **Default:** 4096''',
+        require=False,
+        default=4096,
+        validate=validators.Integer(minimum=0))
+
+    record_cache_size = Option(
+        doc='''
+            **Syntax:** **record_cache_size=***<int>*
+            **Description:** Specify the number of decoded records cached for each database. Networks that share a
+                record (e.g. every network of one ISP) are answered without decoding the record again. Set to 0 to
+                disable the cache.
+            **Default:** 1024''',
+        require=False,
+        default=1024,
+        validate=validators.Integer(minimum=0))
+
+    ipv4_table_bits = Option(
+        doc='''
+            **Syntax:** **ipv4_table_bits=***<int>*
+            **Description:** Specify the number of leading bits of IPv4 addresses to resolve with a jump table that
+                is built for each database when it is opened. Lookups skip that many levels of the database search
+                tree. Each table uses 5 * 2^ipv4_table_bits bytes of memory (e.g. 320 KiB for 16 bits or 5 MiB for
+                20 bits). Set to 0 to disable the tables.
+            **Default:** 0''',
+        require=False,
+        default=0,
+        validate=validators.Integer(minimum=0, maximum=24))
+
+    ipv4_index = Option(
+        doc='''
+            **Syntax:** **ipv4_index=***<bool>*
+            **Description:** Specify whether to index the IPv4 networks of each database so that an IPv4 lookup is a
+                binary search instead of a walk of the database search tree. The index is saved next to the database
+                (as <database>.mmdb.ipv4idx) and rebuilt when the database is updated. It uses 9 bytes of memory per
+                IPv4 network and replaces ipv4_table_bits.
+            **Default:** false''',
+        require=False,
+        default=False,
+        validate=validators.Boolean())
+
+    shared_memory = Option(
+        doc='''
+            **Syntax:** **shared_memory=***<bool>*
+            **Description:** Specify whether to read the databases from copies in shared memory (/dev/shm) that are
+                shared by every search process on the server. The first search to open a database copies it there,
+                and later searches map the copy instead of reading the file, so each database is held in memory once
+                however many searches run at a time. Copies of older builds are removed when a database is updated.
+                Requires Linux, or another system with a /dev/shm file system.
+            **Default:** false''',
+        require=False,
+        default=False,
+        validate=validators.Boolean())
+
+    prefetch = Option(
+        doc='''
+            **Syntax:** **prefetch=***<bool>*
+            **Description:** Specify whether to ask the operating system to read the search tree of each database
+                ahead when it is opened, and not to read ahead around the records that are looked up. On a cold page
+                cache (e.g. after a restart) the tree is then read from disk in large sequential reads instead of a
+                page at a time by the first lookups. Requires Python 3.8 or later; ignored otherwise.
+            **Default:** false''',
+        require=False,
+        default=False,
+        validate=validators.Boolean())
+
+    lock_tree = Option(
+        doc='''
+            **Syntax:** **lock_tree=***<bool>*
+            **Description:** Specify whether to lock the search tree of each database in memory while the search
+                runs, so that it is read in when the database is opened and is never evicted from the page cache.
+                Locking is limited by the memory locking limit of the Splunk process (ulimit -l, or LimitMEMLOCK for
+                systemd); a database whose tree could not be locked is still searched, with a warning.
+            **Default:** false''',
+        require=False,
+        default=False,
+        validate=validators.Boolean())
+
+    batch = Option(
+        doc='''
+            **Syntax:** **batch=***<bool>*
+            **Description:** Specify whether to enrich each chunk of events as a batch. Each distinct IP address in
+                the chunk is looked up once, in bulk, before the results are added to the events. Set to false to
+                look up and emit events one at a time.
+            **Default:** true''',
+        require=False,
+        default=True,
+        validate=validators.Boolean())
+
+    workers = Option(
+        doc='''
+            **Syntax:** **workers=***<int>*
+            **Description:** Specify the number of worker processes that look up the distinct IP addresses of large
+                chunks of events in parallel with the search process. Each worker opens the databases itself; the
+                database files are memory-mapped, so their pages are shared. The number of workers is capped by
+                max_workers in geoip.conf, and chunks with fewer distinct addresses than twice batch_size in
+                geoip.conf are looked up in the search process alone. Requires batch=true. Set to 0 to disable the
+                workers.
+            **Default:** 0''',
+        require=False,
+        default=0,
+        validate=validators.Integer(minimum=0))
+
+    threads = Option(
+        doc='''
+            **Syntax:** **threads=***<bool>*
+            **Description:** Specify whether to query the requested databases concurrently, on one thread per
+                database, when more than one database is requested. The fields of each database are merged in the
+                usual order afterwards. Threads only speed up the lookups on Python builds that run them in parallel,
+                such as free-threaded builds; otherwise the databases are effectively queried one after another. The
+                mode used for each batch (geoip.lookup_threads or geoip.lookup_serial) is reported in the search job
+                inspector. Requires batch=true.
+            **Default:** false''',
+        require=False,
+        default=False,
+        validate=validators.Boolean())
+
+    reload = Option(
+        doc='''
+            **Syntax:** **reload=***<bool>*
+            **Description:** Specify whether to reload a database when its file is updated (e.g. by geoipupdate) while
+                the search is running. The database files are checked before each chunk of events, and only those that
+                have been replaced or modified are reopened. The new database is used from the next chunk on, and the
+                cached results of the old one are discarded.
+            **Default:** true''',
+        require=False,
+        default=True,
+        validate=validators.Boolean())
+
+    daemon = Option(
+        doc='''
+            **Syntax:** **daemon=***<bool>*
+            **Description:** Specify whether to look up addresses in the lookup daemon (bin/geoip_daemon.py), which
+                keeps the databases open and caches their results across searches. The search connects to the socket
+                of the daemon set in geoip.conf and sends it the distinct IP addresses of each chunk of events. If the
+                daemon is not running, or stops answering, the search opens the databases and looks the addresses up
+                itself. The workers and threads options only apply then. Requires batch=true.
+            **Default:** false''',
+        require=False,
+        default=False,
+        validate=validators.Boolean())
+
+    # The databases that can be queried, in the order their fields are added to events.
+    _database_order = DATABASES
+
+
+    # Database readers are shared by every chunk processed by this search process (see stream() and _close_databases()).
+    _database_readers = None
+    _database_open_time = 0.0
+    _database_reuse_count = 0
+    _database_reload_time = 0.0
+    _result_cache = None
+    _field_plans = None
+    _database_options = None
+    _lookup_pool = None
+    _thread_pool = None
+    _multi_reader = None
+    _reader_manager = None
+    _daemon_client = None
+    _input_databases = None
+    _locales_checked = False
+
 
     def stream(self, events):
         ''' Generator function that processes and yields event records to the Splunk stream pipeline.
         '''
         self.logger.info('GeoIPCommand: %s', self)  # logs command line
         
-        ip_field=self.field
         prefix = '' if not self.prefix else self.prefix
 
         input_databases = [database.lower() for database in self.fieldnames] if self.fieldnames else ["city"]
 
+        # Open the database readers (or connect to the lookup daemon) on the first chunk only. Later chunks (SCP v2
+        #   calls stream() once per chunk) reuse them; they are closed after the last chunk (see below).
+        if self._database_readers is None and self._daemon_client is None:
+            atexit.register(self._close_databases)
+            self._input_databases = input_databases
+            self._field_plans = self._compile_field_plans()
+            self._check_database_names(input_databases)
+            if self.daemon and self.batch:
+                self._daemon_client = self._connect_daemon(input_databases)
+            if self._daemon_client is None:
+                self._open_in_process(input_databases)
+            if self.cache_size:
+                self._result_cache = LookupCache(self.cache_size)
+        else:
+            self._database_reuse_count += 1
+            self.write_metric('geoip.database_reuse', SearchMetric(
+                self._database_open_time * self._database_reuse_count, self._database_reuse_count, None, None))
+            if self.reload and self._reader_manager is not None:
+                self._reload_databases()
+        result_cache = self._result_cache
+
+        if self.batch:
+            # Materialise the whole chunk so that each distinct address is looked up only once, in bulk.
+            start_time = time.perf_counter()
+            events = list(events)
+            ips = [self._get_ip(event) for event in events]
+            resolved = self._resolve(list(dict.fromkeys(ips)), prefix)
+            self.write_metric('geoip.batch', SearchMetric(
+                time.perf_counter() - start_time, 1, len(events), len(resolved)))
+
+            for event, ip in zip(events, ips):
+                event.update(resolved[ip])
+                yield event
+        else:
+            for event in events:
+                ip = self._get_ip(event)
+                event.update(self._resolve([ip], prefix)[ip])
+                yield event
+
+        if result_cache is not None:
+            self.write_metric('geoip.cache_hits', SearchMetric(None, result_cache.hits, None, None))
+            self.write_metric('geoip.cache_misses', SearchMetric(None, result_cache.misses, None, None))
+            self.write_metric('geoip.cache_evictions', SearchMetric(None, result_cache.evictions, None, None))
+
+        daemon_client = self._daemon_client
+        if daemon_client is not None:
+            self.write_metric('geoip.daemon', SearchMetric(
+                daemon_client.seconds, daemon_client.requests, daemon_client.addresses, None))
+            histogram = daemon_client.histogram
+            self.write_metric('geoip.daemon_latency', SearchMetric(
+                histogram.seconds, histogram.count, daemon_client.addresses, None))
+
+        # The databases are open in this process unless the lookup daemon answers the lookups.
+        if self._multi_reader is not None:
+            self._write_reader_metrics()
+
+        # SCP v2 calls finish() only when the command exits early, not at the end of the input, so the databases, any
+        #   workers and the connection to the daemon are released after the last chunk (or at exit, if the last chunk
+        #   has no events and stream() is not called for it).
+        if self._finished:
+            self._close_databases()
+
+    def _write_reader_metrics(self):
+        ''' Reports the lookup times and cache statistics of the databases open in the search process.
+        '''
+        multi_reader = self._multi_reader
+        database_readers = self._database_readers
+        for database, (seconds, addresses) in multi_reader.timings.items():
+            self.write_metric('geoip.lookup.' + database.lower().replace('-','_'),
+                SearchMetric(seconds, None, addresses, None))
+
+        network_caches = [reader.network_cache for reader in database_readers.values()
+            if reader is not None and reader.network_cache is not None]
+        if network_caches:
+            self.write_metric('geoip.network_cache_hits',
+                SearchMetric(None, sum(cache.hits for cache in network_caches), None, None))
+            self.write_metric('geoip.network_cache_misses',
+                SearchMetric(None, sum(cache.misses for cache in network_caches), None, None))
+        statistics = [reader.statistics() for reader in database_readers.values() if reader is not None]
+        self.write_metric('geoip.pointer_cache_hits',
+            SearchMetric(None, sum(stat.get('pointer_cache_hits', 0) for stat in statistics), None, None))
+        self.write_metric('geoip.pointer_cache_misses',
+            SearchMetric(None, sum(stat.get('pointer_cache_misses', 0) for stat in statistics), None, None))
+        if self.record_cache_size:
+            self.write_metric('geoip.record_cache_hits',
+                SearchMetric(None, sum(stat.get('record_cache_hits', 0) for stat in statistics), None, None))
+            self.write_metric('geoip.record_cache_misses',
+                SearchMetric(None, sum(stat.get('record_cache_misses', 0) for stat in statistics), None, None))
+
+    def _get_ip(self, event):
+        ''' Returns the value of the IP address field of an event.
+        '''
+        # Terminate if the IP field does not exist
+        try:
+            ip = event[self.field]
+        except KeyError as error:
+            self.error_exit(error, 
+                'Error in \'geoip\': Invalid option value. The \'{}\' field could not be found.'.format(self.field))
+        # Multivalue fields are read as lists; use a tuple so the value can be used as a key (it will not parse).
+        return tuple(ip) if isinstance(ip, list) else ip
+
+    def _resolve(self, ips, prefix):
+        ''' Looks up distinct IP addresses in each requested database, in the lookup daemon or with the MultiReader of
+            the search. Returns a dictionary of the fields to be added to events, keyed by IP address.
+        '''
+        # Reuse the fields of a previous lookup of the same address where possible.
+        result_cache = self._result_cache
+        resolved = {}
+        missing = []
+        for ip in ips:
+            new_fields = result_cache.get(ip) if result_cache is not None else None
+            if new_fields is None:
+                missing.append(ip)
+            else:
+                resolved[ip] = new_fields
+        if not missing:
+            return resolved
+
+        # Look up the addresses in the lookup daemon if there is one, or else in the search process.
+        looked_up = None
+        if self._daemon_client is not None:
+            looked_up = self._lookup_daemon(missing)
+        if looked_up is None:
+            looked_up = self._lookup_in_process(missing)
+        (results, invalid) = looked_up
+        for ip in invalid:
+            self.logger.error('The IP address is invalid: %s', ip)
+
+        # Add the fields from each database to a dictionary to be added into the event all at once.
+        for ip, new_fields in zip(missing, results):
+            if self.prefix:
+                new_fields = {prefix + field: value for field,value in new_fields.items()}
+            resolved[ip] = new_fields
+            if result_cache is not None:
+                result_cache.put(ip, new_fields)
+        return resolved
+
+    def _lookup_in_process(self, ips):
+        ''' Looks up distinct IP addresses in each requested database, in worker processes if the batch is large
+            enough. With the threads option, the databases are queried concurrently if there is more than one.
+        '''
+        multi_reader = self._multi_reader
+        executor = self._thread_pool if len(multi_reader) > 1 else None
+        start_time = time.perf_counter()
+        looked_up = None
+        if self._lookup_pool is not None:
+            try:
+                looked_up = self._lookup_pool.lookup_many(multi_reader, ips, executor)
+            except WorkerError as error:
+                self.write_warning('Warning in \'geoip\': The worker processes failed ({}); looking up addresses in '
+                    'the search process.'.format(error))
+                self._lookup_pool.terminate()
+                self._lookup_pool = None
+            if looked_up is not None:
+                self.write_metric('geoip.workers', SearchMetric(
+                    time.perf_counter() - start_time, 1, len(ips), None))
+        if looked_up is None:
+            looked_up = multi_reader.lookup_many(ips, executor)
+        if self.threads and self.batch:
+            self.write_metric('geoip.lookup_threads' if executor is not None else 'geoip.lookup_serial', SearchMetric(
+                time.perf_counter() - start_time, 1, len(ips), len(multi_reader)))
+        return looked_up
+
+    def _lookup_daemon(self, ips):
+        ''' Looks up distinct IP addresses in the lookup daemon. If the daemon fails to answer, the databases are
+            opened in the search process and None is returned, so that this and later lookups are made there.
+        '''
+        try:
+            return self._daemon_client.lookup_many(ips)
+        except (OSError, DaemonError, EOFError, ValueError, TypeError) as error:
+            self.logger.warning('GeoIPCommand: the lookup daemon failed (%s); looking up addresses in the search '
+                'process', error)
+        self._daemon_client.close()
+        self._daemon_client = None
+        self._open_in_process(self._input_databases)
+        return None
+
+    def _compile_field_plans(self):
+        ''' Compiles the plan of the fields added to events from each database, including any extra fields.
+        '''
+        extra_fields = self.extra_fields or []
+        valid_fields = extra_field_names()
+        for field in extra_fields:
+            if field not in valid_fields:
+                self.write_warning('\'{}\' is not a valid extra field. Valid fields are: {}.'
+                    .format(field, ', '.join(valid_fields)))
+        locales = self.locale or ['en']
+        return {database: compile_plan(database, extra_fields, locales) for database in self._database_order}
+
+    def _check_database_names(self, input_databases):
+        ''' Validates the input database names; prints a non-terminating warning if any are invalid.
+        '''
+        database_names = [database.lower().replace('-','_') for database in self._database_order]
+        for database in input_databases:
+            if database not in database_names and database!="all":
+                self.write_warning('\'{}\' is not a valid GeoIP2 database.'.format(database))
+
+    def _databases_path(self):
+        return os.path.join(os.path.dirname(__file__), "..", "data", "databases")
+
+    def _warn_missing_database(self, database, input_databases):
+        ''' Warns that a requested database could not be found, unless it was only requested with 'all'.
+        '''
+        if database.lower().replace('-','_') in input_databases:
+            self.write_warning('Warning in \'geoip\': No \'{0}\' database could be found in \'{1}\'.'
+                .format(database, os.path.abspath(self._databases_path())))
+
+    def _open_in_process(self, input_databases):
+        ''' Opens the requested databases in the search process, reports on them, and starts any worker processes
+            and threads. This is also how a search falls back from the lookup daemon.
+        '''
+        start_time = time.perf_counter()
+        self._database_readers = self._open_databases(input_databases)
+        self._database_open_time = time.perf_counter() - start_time
+        self._check_locales(self._database_languages())
+        self._write_ipv4_metrics()
+        self._check_lock_tree()
+        self._multi_reader = self._open_multi_reader()
+        if self.workers and self.batch:
+            self._lookup_pool = self._start_workers()
+        if self.threads and self.batch:
+            self._thread_pool = self._start_threads()
+
+    def _connect_daemon(self, input_databases):
+        ''' Connects to the lookup daemon and opens the requested databases in it. Returns the client, or None if the
+            daemon is not running or could not open the databases.
+        '''
+        try:
+            (socket_path, timeout, _, _) = daemon_settings(os.path.join(os.path.dirname(__file__), '..'))
+        except DaemonError as error:
+            self.write_warning('Warning in \'geoip\': The lookup daemon can not be used: {} Looking up addresses in '
+                'the search process.'.format(error))
+            return None
+        start_time = time.perf_counter()
+        try:
+            client = DaemonClient(socket_path, timeout)
+        except (OSError, DaemonError) as error:
+            self.logger.warning('GeoIPCommand: the lookup daemon is not available on %s (%s); looking up addresses '
+                'in the search process', socket_path, error)
+            return None
+        options = dict(network_cache_size=self.network_cache_size, record_cache_size=self.record_cache_size,
+            ipv4_table_bits=self.ipv4_table_bits, ipv4_index=self.ipv4_index, shared_memory=self.shared_memory,
+            prefetch=self.prefetch, lock_tree=self.lock_tree)
+        try:
+            (databases, languages) = client.open(input_databases, self.extra_fields or [], self.locale or ['en'],
+                self.integer, self.fillnull, options)
+        except (OSError, DaemonError, EOFError, ValueError, TypeError) as error:
+            # E.g. a database that can not be opened, which is reported when the search opens it itself.
+            self.logger.warning('GeoIPCommand: the lookup daemon could not open the databases (%s); looking up '
+                'addresses in the search process', error)
+            client.close()
+            return None
+        self._database_open_time = time.perf_counter() - start_time
+        for database in self._database_order:
+            if is_requested(database, input_databases) and database not in databases:
+                self._warn_missing_database(database, input_databases)
+        if not databases:
+            client.close()
+            self.error_exit(None, 'Error in \'geoip\': No databases were loaded.')
+        self._check_locales(languages)
+        self.logger.info('GeoIPCommand: looking up addresses in the lookup daemon on %s', socket_path)
+        return client
+
+    def _open_databases(self, input_databases):
+        ''' Opens a reader for each requested MaxMind DB. Returns a dictionary of readers keyed by database name.
+        '''
+        self._database_options = {}
+        self._reader_manager = ReaderManager(self._open_reader)
+
         # Store the database reader object for each MaxMind DB
         database_readers = {
             'Anonymous-IP': None,
@@ -63,211 +550,174 @@ class GeoIPCommand(StreamingCommand):
             'ISP': None
         }
 
-        # Validate the input database names; print a non-terminating warning if any are invalid.
-        database_names = [database.lower().replace('-','_') for database in database_readers]
-        for database in input_databases:
-            if database not in database_names and database!="all":
-                self.write_warning('\'{}\' is not a valid GeoIP2 database.'.format(database))
-
         # Load any requested databases (checks both the paid and free DBs). Warn if a DB can not be found.
-        databases_path=os.path.join(os.path.dirname(__file__), "..", "data", "databases")
         for database in database_readers.keys():
-            if database.lower().replace('-','_') in input_databases or "all" in input_databases:
-                paid_db_path = os.path.join(databases_path, 'GeoIP2-' + database + '.mmdb')
-                free_db_path = os.path.join(databases_path, 'GeoLite2-' + database + '.mmdb')
-
-                if os.path.isfile(paid_db_path):
+            if is_requested(database, input_databases):
+                db_path = find_database(self._databases_path(), database)
+                if db_path is not None:
                     try:
-                        database_readers[database] = geoip2.database.Reader(paid_db_path)
+                        database_readers[database] = self._reader_manager.open(database, db_path)
                     except:
                         self.error_exit(None, 
-                            'Error in \'geoip\': There was an issue with the "{}" database.'.format(paid_db_path))
-                elif os.path.isfile(free_db_path):
-                    try:
-                        database_readers[database] = geoip2.database.Reader(free_db_path)
-                    except:
-                        self.error_exit(None, 
-                            'Error in \'geoip\': There was an issue with the "{}" database.'.format(free_db_path))
-                elif database.lower().replace('-','_') in input_databases:
-                    self.write_warning('Warning in \'geoip\': No \'{0}\' database could be found in \'{1}\'.'
-                        .format(database, os.path.abspath(databases_path)))
+                            'Error in \'geoip\': There was an issue with the "{}" database.'.format(db_path))
+                else:
+                    self._warn_missing_database(database, input_databases)
 
         # Terminate if no databases were loaded (no readers were assigned).
         if not len(list((reader for reader in database_readers.values() if reader is not None))) :
             self.error_exit(None, 'Error in \'geoip\': No databases were loaded.')
 
-        for event in events:
-            # Terminate if the IP field does not exist
-            try:
-                ip = event[ip_field]
-            except KeyError as error:
-                self.error_exit(error, 
-                    'Error in \'geoip\': Invalid option value. The \'{}\' field could not be found.'.format(self.field))
-
-            # Look up the IP in each requested database. Adds additional fields to a dictionary to be added into the event all at once.
-            new_fields = {}
-            anonymous_ip_reader = database_readers.get('Anonymous-IP')
-            if anonymous_ip_reader:
-                try:
-                    response = anonymous_ip_reader.anonymous_ip(ip)
-                except AddressNotFoundError:    # Expected behaviour; the entry was not in the database
-                    response = None
-                except ValueError:
-                    self.logger.error('The IP address is invalid: %s', event[ip_field])
-                finally:
-                    anonymous_ip_fields = {
-                        'is_anonymous': response.is_anonymous if response else self.fillnull,
-                        'is_anonymous_vpn': response.is_anonymous_vpn if response else self.fillnull,
-                        'is_hosting_provider': response.is_hosting_provider if response else self.fillnull,
-                        'is_public_proxy': response.is_public_proxy if response else self.fillnull,
-                        'is_residential_proxy': response.is_residential_proxy if response else self.fillnull,
-                        'is_tor_exit_node': response.is_tor_exit_node if response else self.fillnull,
-                        'network': response.network if response else self.fillnull}
-
-                    if self.prefix:
-                        anonymous_ip_fields = {prefix + field: value for field,value in anonymous_ip_fields.items()}
-                    new_fields.update(anonymous_ip_fields)
-
-
-            asn_reader = database_readers.get('ASN')
-            if asn_reader:
-                try:
-                    response = asn_reader.asn(ip)
-                except AddressNotFoundError:    # Expected behaviour; the entry was not in the database
-                    response = None
-                except ValueError:
-                    self.logger.error('The IP address is invalid: %s', event[ip_field])
-                finally:
-                    asn_fields = {
-                        'autonomous_system_number': response.autonomous_system_number if response else self.fillnull,
-                        'autonomous_system_organization': response.autonomous_system_organization if response else self.fillnull,
-                        'network': response.network if response else self.fillnull}
-
-                    if self.prefix:
-                        asn_fields = {prefix + field: value for field,value in asn_fields.items()}
-                    new_fields.update(asn_fields)
-                    
-
-            connection_type_reader = database_readers.get('Connection-Type')
-            if connection_type_reader:
-                try:
-                    response = connection_type_reader.connection_type(ip)
-                except AddressNotFoundError:    # Expected behaviour; the entry was not in the database
-                    response = None
-                except ValueError:
-                    self.logger.error('The IP address is invalid: %s', event[ip_field])
-                finally:
-                    connection_type_fields = {
-                        'connection_type': response.connection_type if response else self.fillnull,
-                        'network': response.network if response else self.fillnull}
-
-                    if self.prefix:
-                        connection_type_fields = {prefix + field: value 
-                            for field,value in connection_type_fields.items()}
-                    new_fields.update(connection_type_fields)
-
-
-            domain_reader = database_readers.get('Domain')
-            if domain_reader:
-                try:
-                    response = domain_reader.domain(ip)
-                except AddressNotFoundError:    # Expected behaviour; the entry was not in the database
-                    response = None
-                except ValueError:
-                    self.logger.error('The IP address is invalid: %s', event[ip_field])
-                finally:
-                    domain_fields = {
-                        'domain': response.domain if response else self.fillnull}
-
-                    if self.prefix:
-                        domain_fields = {prefix + field: value for field,value in domain_fields.items()}
-                    new_fields.update(domain_fields)
-
-
-            isp_reader = database_readers.get('ISP')
-            if isp_reader:
-                try:
-                    response = isp_reader.isp(ip)
-                except AddressNotFoundError:    # Expected behaviour; the entry was not in the database
-                    response = None
-                except ValueError:
-                    self.logger.error('The IP address is invalid: %s', event[ip_field])
-                finally:
-                    isp_fields = {
-                        'autonomous_system_number': response.autonomous_system_number if response else self.fillnull,
-                        'autonomous_system_organization': response.autonomous_system_organization if response else self.fillnull,
-                        'isp': response.isp if response else self.fillnull,
-                        'organization': response.organization if response else self.fillnull,
-                        'network': response.network if response else self.fillnull}
-
-                    if self.prefix:
-                        isp_fields = {prefix + field: value for field,value in isp_fields.items()}
-                    new_fields.update(isp_fields)
-
-
-            city_reader = database_readers.get('City')
-            if city_reader:
-                
-
-                try:
-                    response = city_reader.city(ip)
-                    # Show the registered country where the represented (user) country is not available.
-                    #   This may not reflect the users' country.
-                    country = response.country.name
-                    country_code = response.country.iso_code
-                    if country is None and response.registered_country.name is not None:
-                        country = response.registered_country.name + ' (registered)'
-                        country_code = response.registered_country.iso_code + ' (registered)'
-                except AddressNotFoundError:    # Expected behaviour; the entry was not in the database
-                    response = None
-                except ValueError:
-                    self.logger.error('The IP address is invalid: %s', event[ip_field])
-                finally:
-                    city_fields = {
-                        'Country': country if response else self.fillnull,
-                        'Region': response.subdivisions.most_specific.name if response else self.fillnull,
-                        'City': response.city.name if response else self.fillnull,
-                        'lat': response.location.latitude if response else self.fillnull,
-                        'lon': response.location.longitude if response else self.fillnull,
-                        'Region.code': response.subdivisions.most_specific.iso_code if response else self.fillnull,
-                        'Postal.code': response.postal.code if response else self.fillnull,
-                        'Country.code': country_code if response else self.fillnull,
-                        'network': response.traits.network if response else self.fillnull}
-
-                    if self.prefix:
-                        city_fields = {prefix + field: value for field,value in city_fields.items()}
-                    new_fields.update(city_fields)
-
-            enterprise_reader = database_readers.get('Enterprise')
-            if enterprise_reader:
-                try:
-                    response = enterprise_reader.enterprise(ip)
-                except AddressNotFoundError:    # Expected behaviour; the entry was not in the database
-                    response = None
-                except ValueError:
-                    self.logger.error('The IP address is invalid: %s', event[ip_field])
-                finally:
-                    enterprise_fields = {
-                        'ip_address': response.traits.ip_address if response else self.fillnull,
-                        'country': (f"{response.country.name} ({response.country.iso_code})") if response else self.fillnull,
-                        'city': response.city.name if response else self.fillnull,
-                        'postal_code': response.postal.code if response else self.fillnull,
-                        'latitude': response.location.latitude if response else self.fillnull,
-                        'longitude': response.location.longitude if response else self.fillnull,
-                        'accuracy_radius': response.location.accuracy_radius if response else self.fillnull,
-                        'autonomous_system_number': response.traits.autonomous_system_number if response else self.fillnull,
-                        'autonomous_system_organization': response.traits.autonomous_system_organization if response else self.fillnull,
-                        'isp': response.traits.isp if response else self.fillnull,
-                        'organization': response.traits.organization if response else self.fillnull,
-                        'domain': response.traits.domain if response else self.fillnull,
-                        'user_type': response.traits.user_type if response else self.fillnull,
-                        'connection_type': response.traits.connection_type if response else self.fillnull}
-
-                    if self.prefix:
-                        enterprise_fields = {prefix + field: value for field,value in enterprise_fields.items()}
-                    new_fields.update(enterprise_fields)
-
-            event.update(new_fields)
-            yield event
+        return database_readers
+
+    def _open_multi_reader(self):
+        ''' Returns a MultiReader over the open databases, in the order their fields are added to events.
+        '''
+        return MultiReader(
+            [(database, self._database_readers[database], self._field_plans[database])
+                for database in self._database_order if self._database_readers[database] is not None],
+            self.integer, self.fillnull)
+
+    def _reload_databases(self):
+        ''' Swaps in new readers for the databases whose files have been updated since they were opened. The cached
+            results of the old databases are discarded, and any worker processes are restarted on the new databases.
+        '''
+        start_time = time.perf_counter()
+        (reloaded, failed) = self._reader_manager.refresh()
+        for database, path, error in failed:
+            self.logger.warning('GeoIPCommand: could not reload "%s": %s', path, error)
+        if reloaded:
+            for database in reloaded:
+                reader = self._database_readers[database] = self._reader_manager.readers[database]
+                if reader is None:
+                    # Modified in place and not yet readable; its fields are left out until it can be reopened.
+                    self.write_warning('Warning in \'geoip\': The \'{}\' database is being updated and is unavailable '
+                        'until its file can be opened again.'.format(database))
+                else:
+                    self.logger.info('GeoIPCommand: reloaded the updated %s database', database)
+            self._multi_reader = self._open_multi_reader()
+            if self._result_cache is not None:
+                self._result_cache.clear()
+            if self._lookup_pool is not None:
+                self._lookup_pool.close()
+                self._lookup_pool = self._start_workers()
+            self._database_reload_time += time.perf_counter() - start_time
+        if self._reader_manager.reloads:
+            self.write_metric('geoip.database_reload', SearchMetric(
+                self._database_reload_time, self._reader_manager.reloads, None, None))
+
+    def _database_languages(self):
+        ''' Returns the languages that the open databases have names in.
+        '''
+        languages = set()
+        for reader in self._database_readers.values():
+            if reader is not None:
+                languages.update(reader.metadata().languages)
+        return languages
+
+    def _check_locales(self, languages):
+        ''' Warns about any requested locale that is not one of the languages of the open databases. The locales
+            are checked once, so a search that falls back from the lookup daemon does not warn again.
+        '''
+        if not self.locale or self._locales_checked:
+            return
+        self._locales_checked = True
+        for locale in self.locale:
+            if locale not in languages:
+                self.write_warning('\'{}\' is not a locale of the open databases. Valid locales are: {}.'
+                    .format(locale, ', '.join(sorted(languages))))
+
+    def _check_lock_tree(self):
+        ''' Warns about any open database whose search tree could not be locked in memory with lock_tree=true.
+        '''
+        if not self.lock_tree:
+            return
+        for database, reader in self._database_readers.items():
+            error = reader.statistics().get('search_tree_lock_error') if reader is not None else None
+            if error:
+                self.write_warning('Warning in \'geoip\': The search tree of the \'{}\' database could not be locked '
+                    'in memory: {}'.format(database, error))
+
+    def _write_ipv4_metrics(self):
+        ''' Reports the time taken to build (or load) the IPv4 index or jump tables of the open databases.
+        '''
+        statistics = [reader.statistics() for reader in self._database_readers.values() if reader is not None]
+        if self.ipv4_index:
+            self.write_metric('geoip.ipv4_index_build', SearchMetric(
+                sum(stat.get('ipv4_index_build_seconds', 0.0) for stat in statistics), len(statistics), None, None))
+            self.logger.info('GeoIPCommand: IPv4 indexes hold %d networks in %d bytes (%d loaded from disk)',
+                sum(stat.get('ipv4_index_networks', 0) for stat in statistics),
+                sum(stat.get('ipv4_index_bytes', 0) for stat in statistics),
+                sum(1 for stat in statistics if stat.get('ipv4_index_loaded')))
+        elif self.ipv4_table_bits:
+            self.write_metric('geoip.ipv4_table_build', SearchMetric(
+                sum(stat.get('ipv4_table_build_seconds', 0.0) for stat in statistics), len(statistics), None, None))
+            self.logger.info('GeoIPCommand: IPv4 jump tables use %d bytes',
+                sum(stat.get('ipv4_table_bytes', 0) for stat in statistics))
+
+
+    def _open_reader(self, db_path, database):
+        ''' Returns a geoip2 database reader for db_path, configured by the command options.
+        '''
+        options = reader_options(db_path, self.network_cache_size, self.record_cache_size, self.ipv4_table_bits,
+            self.ipv4_index, self.shared_memory, self.prefetch, self.lock_tree)
+        # The workers (see _start_workers()) open the same databases with the same options.
+        self._database_options[database] = (db_path, options)
+        return geoip2.database.Reader(db_path, fields=self._field_plans[database].paths, **options)
+
+    def _start_workers(self):
+        ''' Starts the worker processes that look up large batches of addresses, capped by max_workers in geoip.conf.
+            Returns the pool of workers, or None if workers are disabled.
+        '''
+        (max_workers, batch_size, timeout) = worker_settings(os.path.join(os.path.dirname(__file__), '..'))
+        workers = self.workers
+        if max_workers <= 0:
+            self.write_warning('The workers option is disabled by max_workers in geoip.conf.')
+            return None
+        if workers > max_workers:
+            self.write_warning('\'workers={}\' exceeds max_workers in geoip.conf; using {} workers.'
+                .format(workers, max_workers))
+            workers = max_workers
+        databases = [(database,) + self._database_options[database]
+            for database in self._database_order if self._database_readers.get(database)]
+        return LookupPool(workers, max(batch_size, 1), timeout, databases, self.extra_fields or [], self.locale or ['en'],
+            self.integer, self.fillnull)
+
+
+    def _start_threads(self):
+        ''' Returns a pool of threads to query the open databases on concurrently, one thread per database, or None
+            if only one database is open.
+        '''
+        databases = len(self._multi_reader)
+        if databases < 2:
+            return None
+        return ThreadPoolExecutor(databases, thread_name_prefix='geoip')
+
+    def _close_databases(self):
+        ''' Closes any open database readers and returns their resources to the system.
+        '''
+        if self._lookup_pool is not None:
+            self._lookup_pool.close()
+            self._lookup_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown()
+            self._thread_pool = None
+        if self._daemon_client is not None:
+            if self._daemon_client.requests:
+                self.logger.info('GeoIPCommand: latency of the requests in the lookup daemon:\n%s',
+                    '\n'.join(format_histogram(self._daemon_client.histogram.snapshot())))
+            self._daemon_client.close()
+            self._daemon_client = None
+        if self._database_readers is None:
+            return
+        self._reader_manager.close()
+        self._database_readers = None
+        self._multi_reader = None
+
+    def finish(self):
+        ''' Closes the database readers, then flushes the output buffer and signals that this command has finished
+            processing data.
+        '''
+        self._close_databases()
+        super().finish()
 
 dispatch(GeoIPCommand, sys.argv, sys.stdin, sys.stdout, __name__)
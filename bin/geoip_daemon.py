@@ -0,0 +1,601 @@
+#!/usr/bin/env python
+'''
+A long-lived lookup daemon for the geoip command, and the client that the command connects to it with.
+
+The daemon keeps the databases open, with their caches and any IPv4 indexes, for as long as it runs. Searches with the
+daemon option connect to it over a Unix domain socket and send it the distinct IP addresses of each chunk of events. It
+looks them up with a MultiReader and answers repeated addresses from a result cache that is kept across searches. If
+the daemon is not running, or stops answering, the command opens the databases and looks the addresses up itself.
+
+Each message is a 5-byte header (the type of the message, 1 byte, and the length of its body, 4 bytes, big-endian)
+followed by the body, a value serialised with marshal. A search sends OPEN once, with its databases and options, and
+then LOOKUP with each batch of addresses. The daemon replies to each message with OK or ERROR. The fields of a batch
+are sent as the list of field names and a list of values per address, with networks as (packed address, prefix
+length), followed by the addresses that could not be looked up and the latency of the request. Only the user that runs the daemon can connect to it: marshal data must come from a trusted source.
+
+The latency of each LOOKUP request, from receiving the addresses to having their fields ready to send, is returned
+with its reply, so that the command reports it in the search job inspector, and is counted in a histogram (see
+LATENCY_BUCKETS). The histogram is returned by STATS, logged when the daemon stops, and printed by:
+
+    $SPLUNK_HOME/bin/splunk cmd python3 bin/geoip_daemon.py --stats
+
+Start the daemon with the geoip_daemon.py scripted input in default/inputs.conf, or with:
+
+    $SPLUNK_HOME/bin/splunk cmd python3 bin/geoip_daemon.py
+'''
+
+import argparse
+import bisect
+import configparser
+import ipaddress
+import logging
+import marshal
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+import geoip2.database  # noqa: E402
+
+from geoip_fields import compile_plan  # noqa: E402
+from geoip_lookup import LookupCache, MultiReader  # noqa: E402
+from geoip_readers import DATABASES, ReaderManager, find_database, is_requested, reader_options  # noqa: E402
+
+PROTOCOL_VERSION = 1
+
+# Message types. OPEN, LOOKUP and STATS are sent to the daemon, which replies with OK or ERROR.
+OPEN = 1
+LOOKUP = 2
+STATS = 3
+OK = 0
+ERROR = 255
+
+_HEADER = struct.Struct('!BI')
+_MAX_BODY = 1 << 30
+
+# The upper bounds of the buckets of the latency histogram, in milliseconds. The last bucket has no upper bound.
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# The field that holds the network of an address, which is sent in packed form.
+_NETWORK_FIELD = 'network'
+_NETWORK_TYPES = (ipaddress.IPv4Network, ipaddress.IPv6Network)
+
+logger = logging.getLogger('geoip_daemon')
+
+
+class DaemonError(Exception):
+    ''' The daemon could not be reached, or could not handle a request.
+    '''
+
+
+def default_socket_path(app_path):
+    ''' Returns the path of the socket of the daemon when geoip.conf does not set one: var/run/splunk/geoip.sock in
+        $SPLUNK_HOME, or else in the Splunk installation that the app is installed in (<SPLUNK_HOME>/etc/apps/<app>),
+        so that the daemon and the searches agree on it whatever environment they run in. Raises DaemonError if
+        neither is known.
+    '''
+    splunk_home = os.environ.get('SPLUNK_HOME')
+    if not splunk_home:
+        app_path = os.path.abspath(app_path)
+        apps_path = os.path.dirname(app_path)
+        if os.path.basename(os.path.dirname(apps_path)) == 'etc':
+            splunk_home = os.path.dirname(os.path.dirname(apps_path))
+    if not splunk_home:
+        raise DaemonError('SPLUNK_HOME is not set and the app is not installed in Splunk; set socket in the [daemon] '
+            'stanza of geoip.conf.')
+    return os.path.join(splunk_home, 'var', 'run', 'splunk', 'geoip.sock')
+
+
+def daemon_settings(app_path, socket_path=None):
+    ''' Returns the socket, timeout, cache_size and max_contexts settings of the [daemon] stanza of geoip.conf, from
+        the default and local directories of the app; socket_path overrides the socket. Raises DaemonError if the
+        socket is not set and can not be derived (see default_socket_path()).
+    '''
+    parser = configparser.ConfigParser()
+    parser.read([os.path.join(app_path, 'default', 'geoip.conf'), os.path.join(app_path, 'local', 'geoip.conf')])
+    return (socket_path or parser.get('daemon', 'socket', fallback='') or default_socket_path(app_path),
+            parser.getfloat('daemon', 'timeout', fallback=30.0),
+            parser.getint('daemon', 'cache_size', fallback=100000),
+            parser.getint('daemon', 'max_contexts', fallback=8))
+
+
+def send_message(sock, kind, value):
+    ''' Sends a message of a type, with a value that marshal can serialise.
+    '''
+    body = marshal.dumps(value)
+    sock.sendall(_HEADER.pack(kind, len(body)))
+    sock.sendall(body)
+
+
+def receive_message(sock):
+    ''' Returns the type and value of the next message, or None if the connection was closed between messages.
+    '''
+    header = _receive(sock, _HEADER.size)
+    if header is None:
+        return None
+    (kind, size) = _HEADER.unpack(header)
+    if size > _MAX_BODY:
+        raise DaemonError('A message of {} bytes is too large.'.format(size))
+    body = _receive(sock, size)
+    if body is None:
+        raise DaemonError('The connection was closed in the middle of a message.')
+    return kind, marshal.loads(body)
+
+
+def _receive(sock, size):
+    ''' Returns the next size bytes from a socket, or None if it was closed before any of them were received.
+    '''
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            if not received:
+                return None
+            raise DaemonError('The connection was closed in the middle of a message.')
+        received += count
+    return buffer
+
+
+class DaemonClient(object):
+    ''' The connection of a search to the lookup daemon.
+    '''
+    def __init__(self, path, timeout):
+        ''' Connects to the daemon listening on the socket at path. Requests that take more than timeout seconds
+            fail with socket.timeout.
+        '''
+        if not hasattr(socket, 'AF_UNIX'):
+            raise DaemonError('Unix domain sockets are not supported on this system.')
+        # Only talk to a daemon run by the same user (see the module documentation).
+        if hasattr(os, 'getuid') and os.stat(path).st_uid != os.getuid():
+            raise DaemonError('The socket {} belongs to another user.'.format(path))
+        self.requests = 0
+        self.addresses = 0
+        self.seconds = 0.0
+        # The latency of the requests of this connection in the daemon, i.e. without sending the messages.
+        self.histogram = LatencyHistogram()
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(path)
+        except OSError:
+            self._socket.close()
+            raise
+
+    def open(self, databases, extra_fields, locales, integer, fillnull, options):
+        ''' Opens the databases of a search in the daemon: databases are the lower-case names given to the command
+            (e.g. ['city', 'asn'] or ['all']), and options the options of its readers (see reader_options()). Returns
+            the names of the databases that were opened, in the order their fields are added to events, and the
+            languages that they have names in.
+        '''
+        settings = dict(options, version=PROTOCOL_VERSION, databases=list(databases),
+            extra_fields=list(extra_fields), locales=list(locales), integer=bool(integer), fillnull=fillnull)
+        reply = self._request(OPEN, settings)
+        return reply['databases'], reply['languages']
+
+    def lookup_many(self, ips):
+        ''' Looks up distinct IP addresses like geoip_lookup.MultiReader.lookup_many().
+        '''
+        start_time = time.perf_counter()
+        (names, rows, invalid, latency) = self._request(LOOKUP, ips)
+        self.seconds += time.perf_counter() - start_time
+        self.requests += 1
+        self.addresses += len(ips)
+        self.histogram.observe(latency)
+        return _decode_fields(names, rows), invalid
+
+    def stats(self):
+        ''' Returns the statistics of the daemon, including its latency histogram.
+        '''
+        return self._request(STATS, None)
+
+    def close(self):
+        ''' Closes the connection. The daemon keeps the databases open for other searches.
+        '''
+        self._socket.close()
+
+    def _request(self, kind, value):
+        send_message(self._socket, kind, value)
+        reply = receive_message(self._socket)
+        if reply is None:
+            raise DaemonError('The daemon closed the connection.')
+        (reply_kind, reply_value) = reply
+        if reply_kind == ERROR:
+            raise DaemonError(reply_value)
+        return reply_value
+
+
+def _decode_fields(names, rows):
+    ''' Returns the fields of each address from the field names and rows of values of a LOOKUP reply.
+    '''
+    results = [dict(zip(names, row)) for row in rows]
+    if _NETWORK_FIELD in names:
+        # Addresses in the same network share its object.
+        networks = {}
+        for fields in results:
+            value = fields[_NETWORK_FIELD]
+            if type(value) is tuple:
+                network = networks.get(value)
+                if network is None:
+                    network = networks[value] = ipaddress.ip_network(value)
+                fields[_NETWORK_FIELD] = network
+    return results
+
+
+class LatencyHistogram(object):
+    ''' Counts the latency of requests in buckets (see LATENCY_BUCKETS).
+    '''
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        ''' Counts a request that took seconds.
+        '''
+        index = bisect.bisect_left(self.bounds, seconds * 1000)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.seconds += seconds
+
+    def snapshot(self):
+        ''' Returns the bucket bounds (in milliseconds), the count of each bucket, and the number and total seconds of
+            the requests.
+        '''
+        with self._lock:
+            return dict(bounds=list(self.bounds), counts=list(self.counts), count=self.count, seconds=self.seconds)
+
+
+def format_histogram(histogram):
+    ''' Returns the lines of a table of a latency histogram snapshot.
+    '''
+    lines = ['{:<16} {:>12}'.format('latency (ms)', 'requests')]
+    for bound, count in zip(histogram['bounds'], histogram['counts']):
+        lines.append('{:<16} {:>12}'.format('<= {:g}'.format(bound), count))
+    lines.append('{:<16} {:>12}'.format('> {:g}'.format(histogram['bounds'][-1]), histogram['counts'][-1]))
+    if histogram['count']:
+        lines.append('mean: {:.3f} ms'.format(histogram['seconds'] * 1000 / histogram['count']))
+    return lines
+
+
+class _Context(object):
+    ''' The open databases and result cache of one combination of the databases and options of a search. They are
+        shared by every search with the same databases and options, one request at a time.
+    '''
+    def __init__(self, databases_path, settings, cache_size):
+        self.users = 0
+        self.evicted = False
+        self.lock = threading.Lock()
+        self.cache = LookupCache(cache_size) if cache_size > 0 else None
+        self._integer = settings['integer']
+        self._fillnull = settings['fillnull']
+        self._options = {name: settings[name] for name in
+            ('network_cache_size', 'record_cache_size', 'ipv4_table_bits', 'ipv4_index', 'shared_memory', 'prefetch',
+                'lock_tree')}
+        self._plans = {database: compile_plan(database, settings['extra_fields'], settings['locales'])
+            for database in DATABASES}
+        self._manager = ReaderManager(self._open_reader)
+        try:
+            for database in DATABASES:
+                if is_requested(database, settings['databases']):
+                    path = find_database(databases_path, database)
+                    if path is not None:
+                        self._manager.open(database, path)
+        except Exception:
+            self._manager.close()
+            raise
+        for database, reader in self._manager.readers.items():
+            error = reader.statistics().get('search_tree_lock_error')
+            if error:
+                logger.warning('could not lock the search tree of the %s database in memory: %s', database, error)
+        self._build()
+
+    def _open_reader(self, path, database):
+        return geoip2.database.Reader(path, fields=self._plans[database].paths, **reader_options(path, **self._options))
+
+    def _build(self):
+        ''' Builds the MultiReader over the open databases.
+        '''
+        readers = self._manager.readers
+        self.multi_reader = MultiReader(
+            [(database, readers[database], self._plans[database])
+                for database in DATABASES if readers.get(database) is not None],
+            self._integer, self._fillnull)
+        # Every address gets the fields of every database, in the same order.
+        self.names = list(dict.fromkeys(
+            name for (_, _, plan, _) in self.multi_reader.databases for name in plan.names))
+        self._network = self.names.index(_NETWORK_FIELD) if _NETWORK_FIELD in self.names else None
+
+    def description(self):
+        ''' Returns the reply to OPEN: the names of the open databases and the languages that they have names in.
+        '''
+        languages = set()
+        for (_, reader, _, _) in self.multi_reader.databases:
+            languages.update(reader.metadata().languages)
+        return dict(databases=[name for (name, _, _, _) in self.multi_reader.databases],
+            languages=sorted(languages))
+
+    def lookup_many(self, ips):
+        ''' Returns the reply to LOOKUP: the field names, the values of the fields of each address, and the addresses
+            that could not be looked up.
+        '''
+        with self.lock:
+            self._refresh()
+            cache = self.cache
+            entries = {}
+            missing = []
+            for ip in ips:
+                entry = cache.get(ip) if cache is not None else None
+                if entry is None:
+                    missing.append(ip)
+                else:
+                    entries[ip] = entry
+            if missing:
+                (results, invalid) = self.multi_reader.lookup_many(missing)
+                # Cache how often each address was invalid, so that hits are reported like fresh lookups.
+                invalid_counts = Counter(invalid)
+                network = self._network
+                for ip, fields in zip(missing, results):
+                    row = list(fields.values())
+                    if network is not None and isinstance(row[network], _NETWORK_TYPES):
+                        row[network] = (row[network].network_address.packed, row[network].prefixlen)
+                    entry = entries[ip] = (row, invalid_counts.get(ip, 0))
+                    if cache is not None:
+                        cache.put(ip, entry)
+            rows = []
+            invalid = []
+            for ip in ips:
+                (row, invalid_count) = entries[ip]
+                rows.append(row)
+                invalid.extend([ip] * invalid_count)
+            return self.names, rows, invalid
+
+    def _refresh(self):
+        ''' Reopens the databases whose files have been updated, and discards the cached results of the old ones.
+        '''
+        (reloaded, failed) = self._manager.refresh()
+        for database, path, error in failed:
+            logger.warning('could not reload "%s": %s', path, error)
+        if reloaded:
+            logger.info('reloaded the updated databases: %s', ', '.join(reloaded))
+            self._build()
+            if self.cache is not None:
+                self.cache.clear()
+
+    def close(self):
+        self._manager.close()
+
+
+class LookupDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    ''' Serves lookups to searches over a Unix domain socket, one thread per connection.
+    '''
+    daemon_threads = True
+
+    def __init__(self, path, databases_path, cache_size, max_contexts):
+        ''' Listens on the socket at path. Databases are opened from databases_path. Each combination of the
+            databases and options of searches keeps its readers and a cache of cache_size addresses; the least
+            recently used is closed when there are more than max_contexts.
+        '''
+        self.databases_path = databases_path
+        self.cache_size = cache_size
+        self.max_contexts = max(max_contexts, 1)
+        self.histogram = LatencyHistogram()
+        self.requests = 0
+        self.addresses = 0
+        self._start_time = time.time()
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+        _remove_stale_socket(path)
+        # Only the user that runs the daemon can connect to the socket.
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def acquire(self, settings):
+        ''' Returns the context of the databases and options of a search, opening them if needed. Release it with
+            release() when the search is done with it.
+        '''
+        if settings.get('version') != PROTOCOL_VERSION:
+            raise DaemonError('The daemon speaks version {} of the protocol, not {}.'.format(
+                PROTOCOL_VERSION, settings.get('version')))
+        key = tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+            for name, value in settings.items()))
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is None:
+                context = _Context(self.databases_path, settings, self.cache_size)
+                self._contexts[key] = context
+                logger.info('opened %s for %s', ', '.join(context.description()['databases']) or 'no databases',
+                    ', '.join('{}={}'.format(name, value) for name, value in key if name != 'version'))
+            else:
+                self._contexts.move_to_end(key)
+            context.users += 1
+            while len(self._contexts) > self.max_contexts:
+                (_, evicted) = self._contexts.popitem(last=False)
+                evicted.evicted = True
+                if not evicted.users:
+                    evicted.close()
+            return context
+
+    def release(self, context):
+        ''' Releases a context acquired with acquire(), and closes it if it has been evicted.
+        '''
+        with self._lock:
+            context.users -= 1
+            if context.evicted and not context.users:
+                context.close()
+
+    def record(self, seconds, addresses):
+        ''' Counts a LOOKUP request of a number of addresses that took seconds.
+        '''
+        self.histogram.observe(seconds)
+        with self._lock:
+            self.requests += 1
+            self.addresses += addresses
+
+    def stats(self):
+        ''' Returns the reply to STATS.
+        '''
+        with self._lock:
+            caches = [context.cache for context in self._contexts.values() if context.cache is not None]
+            return dict(uptime=time.time() - self._start_time, requests=self.requests, addresses=self.addresses,
+                contexts=len(self._contexts), cache_hits=sum(cache.hits for cache in caches),
+                cache_misses=sum(cache.misses for cache in caches), latency=self.histogram.snapshot())
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+        with self._lock:
+            for context in self._contexts.values():
+                if not context.users:
+                    context.close()
+            self._contexts.clear()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    ''' Handles the messages of one search.
+    '''
+    def handle(self):
+        server = self.server
+        if not _same_user(self.request):
+            logger.warning('refused a connection from another user')
+            return
+        context = None
+        try:
+            while True:
+                message = receive_message(self.request)
+                if message is None:
+                    return
+                (kind, value) = message
+                start_time = time.perf_counter()
+                try:
+                    if kind == OPEN:
+                        opened = server.acquire(value)
+                        if context is not None:
+                            server.release(context)
+                        context = opened
+                        reply = context.description()
+                    elif kind == LOOKUP:
+                        if context is None:
+                            raise DaemonError('No databases are open.')
+                        reply = context.lookup_many(value)
+                        latency = time.perf_counter() - start_time
+                        reply += (latency,)
+                    elif kind == STATS:
+                        reply = server.stats()
+                    else:
+                        raise DaemonError('Unknown message type {}.'.format(kind))
+                except Exception as error:  # pylint: disable=broad-except
+                    logger.warning('request failed: %s', error)
+                    send_message(self.request, ERROR, str(error))
+                    continue
+                send_message(self.request, OK, reply)
+                if kind == LOOKUP:
+                    server.record(latency, len(value))
+        except (OSError, DaemonError, EOFError, ValueError, TypeError) as error:
+            logger.info('closed a connection: %s', error)
+        finally:
+            if context is not None:
+                server.release(context)
+
+
+def _same_user(sock):
+    ''' Returns whether the peer of a connection runs as the same user as this process, where the system tells.
+    '''
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return True
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    (_, uid, _) = struct.unpack('3i', credentials)
+    return uid == os.getuid()
+
+
+def _remove_stale_socket(path):
+    ''' Removes the socket left at path by a daemon that is no longer running.
+    '''
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise DaemonError('{} exists and is not a socket.'.format(path))
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise DaemonError('A daemon is already listening on {}.'.format(path))
+
+
+def _print_stats(path, timeout):
+    client = DaemonClient(path, timeout)
+    try:
+        stats = client.stats()
+    finally:
+        client.close()
+    print('uptime: {:.0f} s, requests: {}, addresses: {}, open contexts: {}'.format(
+        stats['uptime'], stats['requests'], stats['addresses'], stats['contexts']))
+    print('cache hits: {}, cache misses: {}'.format(stats['cache_hits'], stats['cache_misses']))
+    print('\n'.join(format_histogram(stats['latency'])))
+
+
+def _stop(signum, frame):
+    raise SystemExit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve geoip lookups to searches over a Unix domain socket.')
+    parser.add_argument('--socket', help='the socket to listen on (default: socket in geoip.conf)')
+    parser.add_argument('--stats', action='store_true', help='print the statistics of the running daemon and exit')
+    args = parser.parse_args()
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    try:
+        (path, timeout, cache_size, max_contexts) = daemon_settings(app_path, args.socket)
+    except DaemonError as error:
+        sys.exit('Could not find the socket of the daemon: {}'.format(error))
+    if args.stats:
+        try:
+            _print_stats(path, timeout)
+        except (OSError, DaemonError) as error:
+            sys.exit('The daemon is not running on {}: {}'.format(path, error))
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s geoip_daemon: %(message)s')
+    try:
+        server = LookupDaemon(path, os.path.join(app_path, 'data', 'databases'), cache_size, max_contexts)
+    except (OSError, DaemonError) as error:
+        sys.exit('Could not listen on {}: {}'.format(path, error))
+    signal.signal(signal.SIGTERM, _stop)
+    logger.info('listening on %s', path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info('stopped after %d requests; request latency:\n%s', server.requests,
+            '\n'.join(format_histogram(server.histogram.snapshot())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+'''
+The fields the geoip command adds to events from each GeoIP2 database.
+
+Each database has a plan: an ordered list of (output field name, getter) pairs. A getter is either a path into the
+raw record decoded from the database (see path()), or a function that computes the value from the record, the IP
+address and the prefix length of its network (see reads()). Getters of names are built for the preferred locales
+(see localized()). Plans are compiled once, into a FieldPlan that builds the fields of an event from the raw record
+directly, and that knows which parts of the record have to be decoded.
+'''
+
+import ipaddress
+
+
+_EMPTY = {}
+
+
+def path(dotted, default=None):
+    ''' Returns a getter for the value at a dotted path (e.g. 'location.latitude') in a raw record, or default if
+        any part of the path is missing.
+    '''
+    keys = dotted.split('.')
+    if len(keys) == 1:
+        key = keys[0]
+
+        def get(record, ip_address, prefix_len):
+            return record.get(key, default)
+    elif len(keys) == 2:
+        (first, key) = keys
+
+        def get(record, ip_address, prefix_len):
+            return record.get(first, _EMPTY).get(key, default)
+    elif len(keys) == 3:
+        (first, second, key) = keys
+
+        def get(record, ip_address, prefix_len):
+            return record.get(first, _EMPTY).get(second, _EMPTY).get(key, default)
+    else:
+        def get(record, ip_address, prefix_len):
+            value = record
+            for key in keys:
+                value = value.get(key)
+                if value is None:
+                    return default
+            return value
+    get.paths = (dotted,)
+    return get
+
+
+def reads(*paths):
+    ''' Declares the parts of the raw record that a computed getter reads, so that they are decoded.
+    '''
+    def decorate(get):
+        get.paths = paths
+        return get
+    return decorate
+
+
+@reads()
+def network(record, ip_address, prefix_len):
+    return ipaddress.ip_network('{}/{}'.format(ip_address, prefix_len), False)
+
+
+@reads()
+def ip_address(record, ip_address, prefix_len):
+    return ip_address
+
+
+def localized(build):
+    ''' Marks a getter factory: a function that takes the locale preference (e.g. ('de', 'en')) and returns the
+        getter. Factories are replaced by their getters when a plan is compiled (see compile_plan()).
+    '''
+    build.localized = True
+    return build
+
+
+def _pick(locales):
+    ''' Returns a function that picks the name in the first of locales that a names map has.
+    '''
+    if len(locales) == 1:
+        locale = locales[0]
+
+        def pick(names):
+            return names.get(locale)
+    else:
+        def pick(names):
+            for locale in locales:
+                if locale in names:
+                    return names[locale]
+            return None
+    return pick
+
+
+def place_name(dotted):
+    ''' Returns a getter factory for the name of the record at a dotted path (e.g. 'city'), in the preferred locale.
+    '''
+    @localized
+    def build(locales):
+        if len(locales) == 1:
+            return path('{}.names.{}'.format(dotted, locales[0]))
+        pick = _pick(locales)
+        names = path(dotted + '.names', _EMPTY)
+
+        @reads(*('{}.names.{}'.format(dotted, locale) for locale in locales))
+        def get(record, ip_address, prefix_len):
+            return pick(names(record, ip_address, prefix_len))
+        return get
+    return build
+
+
+def _most_specific_subdivision(record):
+    subdivisions = record.get('subdivisions')
+    return subdivisions[-1] if subdivisions else _EMPTY
+
+
+def _names(locales, *records):
+    ''' Returns the paths of the names of records (e.g. 'country') in locales.
+    '''
+    return tuple('{}.names.{}'.format(record, locale) for record in records for locale in locales)
+
+
+@localized
+def region(locales):
+    pick = _pick(locales)
+
+    @reads(*_names(locales, 'subdivisions'))
+    def get(record, ip_address, prefix_len):
+        return pick(_most_specific_subdivision(record).get('names', _EMPTY))
+    return get
+
+
+@reads('subdivisions.iso_code')
+def region_code(record, ip_address, prefix_len):
+    return _most_specific_subdivision(record).get('iso_code')
+
+
+# Show the registered country where the represented (user) country is not available.
+#   This may not reflect the users' country.
+@localized
+def country_or_registered(locales):
+    pick = _pick(locales)
+
+    @reads(*_names(locales, 'country', 'registered_country'))
+    def get(record, ip_address, prefix_len):
+        country = pick(record.get('country', _EMPTY).get('names', _EMPTY))
+        if country is None:
+            registered = pick(record.get('registered_country', _EMPTY).get('names', _EMPTY))
+            if registered is not None:
+                return registered + ' (registered)'
+        return country
+    return get
+
+
+@localized
+def country_code_or_registered(locales):
+    pick = _pick(locales)
+
+    @reads('country.iso_code', 'registered_country.iso_code', *_names(locales, 'country', 'registered_country'))
+    def get(record, ip_address, prefix_len):
+        country = record.get('country', _EMPTY)
+        if pick(country.get('names', _EMPTY)) is None:
+            registered = record.get('registered_country', _EMPTY)
+            if pick(registered.get('names', _EMPTY)) is not None:
+                code = registered.get('iso_code')
+                return code + ' (registered)' if code is not None else None
+        return country.get('iso_code')
+    return get
+
+
+@localized
+def country_with_code(locales):
+    pick = _pick(locales)
+
+    @reads('country.iso_code', *_names(locales, 'country'))
+    def get(record, ip_address, prefix_len):
+        country = record.get('country', _EMPTY)
+        return '{} ({})'.format(pick(country.get('names', _EMPTY)), country.get('iso_code'))
+    return get
+
+
+# The fields added to events by default, in order.
+PLANS = {
+    'Anonymous-IP': [
+        ('is_anonymous', path('is_anonymous', False)),
+        ('is_anonymous_vpn', path('is_anonymous_vpn', False)),
+        ('is_hosting_provider', path('is_hosting_provider', False)),
+        ('is_public_proxy', path('is_public_proxy', False)),
+        ('is_residential_proxy', path('is_residential_proxy', False)),
+        ('is_tor_exit_node', path('is_tor_exit_node', False)),
+        ('network', network)],
+    'ASN': [
+        ('autonomous_system_number', path('autonomous_system_number')),
+        ('autonomous_system_organization', path('autonomous_system_organization')),
+        ('network', network)],
+    'Connection-Type': [
+        ('connection_type', path('connection_type')),
+        ('network', network)],
+    'Domain': [
+        ('domain', path('domain'))],
+    'ISP': [
+        ('autonomous_system_number', path('autonomous_system_number')),
+        ('autonomous_system_organization', path('autonomous_system_organization')),
+        ('isp', path('isp')),
+        ('organization', path('organization')),
+        ('network', network)],
+    'City': [
+        ('Country', country_or_registered),
+        ('Region', region),
+        ('City', place_name('city')),
+        ('lat', path('location.latitude')),
+        ('lon', path('location.longitude')),
+        ('Region.code', region_code),
+        ('Postal.code', path('postal.code')),
+        ('Country.code', country_code_or_registered),
+        ('network', network)],
+    'Enterprise': [
+        ('ip_address', ip_address),
+        ('country', country_with_code),
+        ('city', place_name('city')),
+        ('postal_code', path('postal.code')),
+        ('latitude', path('location.latitude')),
+        ('longitude', path('location.longitude')),
+        ('accuracy_radius', path('location.accuracy_radius')),
+        ('autonomous_system_number', path('traits.autonomous_system_number')),
+        ('autonomous_system_organization', path('traits.autonomous_system_organization')),
+        ('isp', path('traits.isp')),
+        ('organization', path('traits.organization')),
+        ('domain', path('traits.domain')),
+        ('user_type', path('traits.user_type')),
+        ('connection_type', path('traits.connection_type'))],
+}
+
+# The fields that can be added to events on request (see the extra_fields option of the geoip command).
+EXTRA_FIELDS = {
+    'Anonymous-IP': [],
+    'ASN': [],
+    'Connection-Type': [],
+    'Domain': [],
+    'ISP': [
+        ('mobile_country_code', path('mobile_country_code')),
+        ('mobile_network_code', path('mobile_network_code'))],
+    'City': [
+        ('accuracy_radius', path('location.accuracy_radius')),
+        ('time_zone', path('location.time_zone')),
+        ('metro_code', path('location.metro_code')),
+        ('continent', place_name('continent')),
+        ('continent_code', path('continent.code')),
+        ('is_in_european_union', path('country.is_in_european_union', False)),
+        ('registered_country', place_name('registered_country')),
+        ('registered_country_code', path('registered_country.iso_code')),
+        ('geoname_id', path('city.geoname_id'))],
+    'Enterprise': [
+        ('time_zone', path('location.time_zone')),
+        ('metro_code', path('location.metro_code')),
+        ('continent', place_name('continent')),
+        ('continent_code', path('continent.code')),
+        ('is_in_european_union', path('country.is_in_european_union', False)),
+        ('registered_country', place_name('registered_country')),
+        ('registered_country_code', path('registered_country.iso_code')),
+        ('geoname_id', path('city.geoname_id')),
+        ('city_confidence', path('city.confidence')),
+        ('country_confidence', path('country.confidence')),
+        ('postal_confidence', path('postal.confidence')),
+        ('static_ip_score', path('traits.static_ip_score')),
+        ('user_count', path('traits.user_count')),
+        ('mobile_country_code', path('traits.mobile_country_code')),
+        ('mobile_network_code', path('traits.mobile_network_code'))],
+}
+
+
+class FieldPlan(object):
+    ''' The compiled plan of the fields added to events from one database.
+    '''
+    def __init__(self, getters):
+        self.names = tuple(name for name, _ in getters)
+        # The parts of the record to decode; the rest can be skipped (see geoip2.database.Reader).
+        self.paths = sorted({dotted for _, get in getters for dotted in get.paths})
+        self._getters = tuple(getters)
+
+    def fields(self, record, ip_address, prefix_len):
+        ''' Returns the fields for a raw record, found for ip_address in a network of prefix_len bits.
+        '''
+        return {name: get(record, ip_address, prefix_len) for name, get in self._getters}
+
+    def null_fields(self, fillnull):
+        ''' Returns the fields for an address that was not found.
+        '''
+        return dict.fromkeys(self.names, fillnull)
+
+
+def extra_field_names():
+    ''' Returns the names of every field that can be requested with extra_fields.
+    '''
+    return sorted({name for getters in EXTRA_FIELDS.values() for name, _ in getters})
+
+
+def compile_plan(database, extra_fields=(), locales=('en',)):
+    ''' Returns the FieldPlan for a database (e.g. 'City'), with the default fields followed by any of extra_fields
+        that the database has. Names are taken from the first of locales that a record has a name in.
+    '''
+    locales = tuple(locales)
+    extra = dict(EXTRA_FIELDS[database])
+    getters = list(PLANS[database])
+    names = {name for name, _ in getters}
+    for name in extra_fields:
+        if name in extra and name not in names:
+            getters.append((name, extra[name]))
+            names.add(name)
+    return FieldPlan([(name, get(locales) if getattr(get, 'localized', False) else get) for name, get in getters])
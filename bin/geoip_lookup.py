@@ -0,0 +1,252 @@
+'''
+Looks up the IP addresses of the geoip command, in the search process or in a pool of worker processes.
+
+A MultiReader looks up a batch of distinct addresses in the open databases and builds the fields of each, querying the
+databases one after another or concurrently on a pool of threads. A LookupPool splits large batches into slices that
+are looked up by a MultiReader in each of its worker processes. Each worker opens the same databases; they are
+memory-mapped, so the workers share the pages of the database files with each other and with the search process.
+A LookupCache keeps the fields of recently looked up addresses.
+'''
+
+import configparser
+import ipaddress
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+
+import geoip2.database
+import maxminddb
+
+from geoip_fields import compile_plan
+
+
+class LookupCache(object):
+    ''' A bounded, least-recently-used cache of the fields added to events for an IP address.
+    '''
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        ''' Returns the cached value for key (marking it as most recently used), or None on a miss.
+        '''
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        ''' Adds a value to the cache, evicting the least recently used entry once the cache is full.
+        '''
+        self._entries[key] = value
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        ''' Removes every entry from the cache.
+        '''
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MultiReader(object):
+    ''' Looks up IP addresses in several databases at once, and merges the fields from each database into one flat
+        dictionary per address.
+
+        Each address is parsed once for all of the databases (see maxminddb.parse_addresses()) and looked up in the
+        search tree of each database from its parsed form. The time spent looking up addresses in each database is
+        recorded in timings.
+    '''
+    def __init__(self, databases, integer=False, fillnull=None):
+        ''' databases is a list of (database name, geoip2.database.Reader, field plan) in the order the fields of the
+            databases are added to events. With integer, addresses are decimal integers (see
+            maxminddb.parse_integers()). Fields of databases that do not have an address are set to fillnull.
+        '''
+        self.databases = [(name, reader, plan, plan.null_fields(fillnull)) for (name, reader, plan) in databases]
+        self.integer = integer
+        # The seconds spent looking up addresses in each database, and the number of addresses, keyed by name.
+        self.timings = {name: [0.0, 0] for (name, reader, plan) in databases}
+
+    def __len__(self):
+        return len(self.databases)
+
+    def lookup_many(self, ips, executor=None):
+        ''' Looks up distinct IP addresses in every database. Returns the fields of each address, in order, and the
+            addresses that could not be looked up (an IPv6 address is listed again for each IPv4-only database). If an
+            executor (e.g. a concurrent.futures.ThreadPoolExecutor) is given, the databases are queried concurrently
+            on it.
+        '''
+        # Parse the addresses once for every database. Invalid addresses get the fillnull value for every field.
+        if self.integer:
+            addresses = maxminddb.parse_integers(ips)
+            texts = [address_text(key) for key in addresses.keys]
+        else:
+            addresses = maxminddb.parse_addresses(ips)
+            texts = ips
+        invalid = [ip for ip, valid in zip(ips, addresses.valid) if not valid]
+
+        # Look up the addresses in each database, one batch per database. Each reader is used by one thread only.
+        if executor is not None and len(self.databases) > 1:
+            database_fields = list(executor.map(
+                lambda database: self._lookup_database(database, ips, texts, addresses), self.databases))
+        else:
+            database_fields = [self._lookup_database(database, ips, texts, addresses) for database in self.databases]
+
+        # Add the fields from each database to those of each address, in database order.
+        results = [{} for _ in ips]
+        for fields, database_invalid in database_fields:
+            for new_fields, added_fields in zip(results, fields):
+                new_fields.update(added_fields)
+            invalid.extend(database_invalid)
+        return results, invalid
+
+    def _lookup_database(self, database, ips, texts, addresses):
+        ''' Looks up parsed IP addresses in one database. Returns the fields of each address, and the valid addresses
+            that could not be looked up.
+        '''
+        (name, reader, plan, null_fields) = database
+        start_time = time.perf_counter()
+        build = plan.fields
+        fields = []
+        invalid = []
+        for ip, text, valid, result in zip(ips, texts, addresses.valid, reader.raw_many(addresses)):
+            if result is None:
+                if valid:   # An IPv6 address in an IPv4-only database
+                    invalid.append(ip)
+                fields.append(null_fields)
+            elif result[0] is None:
+                fields.append(null_fields)
+            else:
+                fields.append(build(result[0], text, result[1]))
+        timing = self.timings[name]
+        timing[0] += time.perf_counter() - start_time
+        timing[1] += len(ips)
+        return fields, invalid
+
+
+def address_text(key):
+    ''' Returns a parsed address (see maxminddb.parse_integers()) in the standard notation, or None if it is not valid.
+    '''
+    if key is None:
+        return None
+    (bit_count, value) = key
+    return str(ipaddress.IPv4Address(value) if bit_count == 32 else ipaddress.IPv6Address(value))
+
+
+def worker_settings(app_path):
+    ''' Returns the max_workers, batch_size and timeout settings of the [workers] stanza of geoip.conf, from the
+        default and local directories of the app.
+    '''
+    parser = configparser.ConfigParser()
+    parser.read([os.path.join(app_path, 'default', 'geoip.conf'), os.path.join(app_path, 'local', 'geoip.conf')])
+    return (parser.getint('workers', 'max_workers', fallback=0),
+            parser.getint('workers', 'batch_size', fallback=5000),
+            parser.getfloat('workers', 'timeout', fallback=60.0))
+
+
+class WorkerError(Exception):
+    ''' The worker processes could not look up a batch: they failed to open the databases, raised an error, or did
+        not answer in time.
+    '''
+
+
+class LookupPool(object):
+    ''' A pool of worker processes that look up slices of large batches of IP addresses, each with a MultiReader.
+    '''
+    def __init__(self, workers, batch_size, timeout, databases, extra_fields, locales, integer, fillnull):
+        ''' Starts the workers. databases is a list of (database name, path, reader options) in the order the fields of
+            the databases are added to events; each worker opens a geoip2.database.Reader for every database, with the
+            field plan compiled for extra_fields and locales, and looks up addresses with a MultiReader over them.
+            The workers have timeout seconds to look up the slices of a batch.
+        '''
+        self.workers = workers
+        self.batch_size = batch_size
+        self.timeout = timeout
+        # Spawn rather than fork the workers, so that they do not inherit the state of the search process, such as its
+        #   buffered output to Splunk.
+        self._pool = multiprocessing.get_context('spawn').Pool(
+            workers, _start_worker, (databases, extra_fields, locales, integer, fillnull))
+
+    def lookup_many(self, reader, ips, executor=None):
+        ''' Looks up distinct IP addresses like MultiReader.lookup_many(). The addresses are split into slices of at
+            least batch_size addresses; the search process looks up the first slice with reader while the workers look
+            up the rest. The time the workers spend in each database is added to the timings of reader. Returns None,
+            without looking anything up, if there are too few addresses to split. Raises WorkerError if the workers
+            fail, or take longer than timeout seconds.
+        '''
+        slices = min(self.workers + 1, len(ips) // self.batch_size)
+        if slices < 2:
+            return None
+        size = -(-len(ips) // slices)
+        pending = self._pool.map_async(_lookup_slice, [ips[start:start + size] for start in range(size, len(ips), size)])
+        (results, invalid) = reader.lookup_many(ips[:size], executor)
+        try:
+            looked_up = pending.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            raise WorkerError('no answer within {:g} seconds'.format(self.timeout))
+        except Exception as error:  # pylint: disable=broad-except
+            raise WorkerError(str(error) or type(error).__name__)
+        for slice_results, slice_invalid, slice_timings in looked_up:
+            results.extend(slice_results)
+            invalid.extend(slice_invalid)
+            for name, (seconds, addresses) in slice_timings.items():
+                timing = reader.timings[name]
+                timing[0] += seconds
+                timing[1] += addresses
+        return results, invalid
+
+    def close(self):
+        ''' Stops the workers once they have finished any pending lookups.
+        '''
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        ''' Stops the workers straight away, e.g. after they failed or timed out.
+        '''
+        self._pool.terminate()
+        self._pool.join()
+
+
+# The databases of a worker process, or the error that they could not be opened with (see _start_worker()).
+_worker_reader = None
+_worker_error = None
+
+
+def _start_worker(databases, extra_fields, locales, integer, fillnull):
+    ''' Opens the databases of a worker process. An error is kept and raised by each lookup, so that it reaches the
+        search process; if it was raised here, the pool would replace the worker over and over again.
+    '''
+    global _worker_reader, _worker_error
+    try:
+        readers = []
+        for (database, path, options) in databases:
+            plan = compile_plan(database, extra_fields, locales)
+            readers.append((database, geoip2.database.Reader(path, fields=plan.paths, **options), plan))
+        _worker_reader = MultiReader(readers, integer, fillnull)
+    except Exception as error:  # pylint: disable=broad-except
+        _worker_error = 'the databases could not be opened: {}'.format(error)
+
+
+def _lookup_slice(ips):
+    ''' Looks up a slice of a batch of IP addresses in a worker process. Returns the fields and invalid addresses
+        like MultiReader.lookup_many(), and the seconds and addresses spent on the slice in each database.
+    '''
+    if _worker_error is not None:
+        raise WorkerError(_worker_error)
+    before = {name: tuple(timing) for name, timing in _worker_reader.timings.items()}
+    (results, invalid) = _worker_reader.lookup_many(ips)
+    timings = {name: (timing[0] - before[name][0], timing[1] - before[name][1])
+        for name, timing in _worker_reader.timings.items()}
+    return results, invalid, timings
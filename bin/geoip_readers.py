@@ -0,0 +1,128 @@
+'''
+Opens the database readers of the geoip command, and reopens a database when its file is updated (e.g. by a weekly
+geoipupdate) while a search is running.
+
+The identity of each open database file (its device, inode, size and modification time) is recorded when it is opened.
+ReaderManager.refresh() compares it with the file on disk, which costs one stat() per database, and only reopens the
+files that have changed. The new reader is swapped in once it has opened; until then, and if it fails to open (e.g.
+while the file is still being written), the old reader stays in use where that is safe (see ReaderManager.refresh()).
+'''
+
+import os
+
+import geoip2.database
+
+# The databases that can be queried, in the order their fields are added to events.
+DATABASES = ('Anonymous-IP', 'ASN', 'Connection-Type', 'Domain', 'ISP', 'City', 'Enterprise')
+
+
+def is_requested(database, input_databases):
+    ''' Returns whether a database (e.g. 'Connection-Type') is one of the lower-case input_databases of a search
+        (e.g. ['connection_type', 'city']), or 'all' is.
+    '''
+    return database.lower().replace('-','_') in input_databases or 'all' in input_databases
+
+
+def find_database(databases_path, database):
+    ''' Returns the path of the file of a database in databases_path, preferring the paid GeoIP2 database to the free
+        GeoLite2 one, or None if there is neither.
+    '''
+    for edition in ('GeoIP2-', 'GeoLite2-'):
+        path = os.path.join(databases_path, edition + database + '.mmdb')
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def reader_options(path, network_cache_size, record_cache_size, ipv4_table_bits, ipv4_index, shared_memory,
+                   prefetch=False, lock_tree=False):
+    ''' Returns the keyword arguments of geoip2.database.Reader for the database file at path, from the options of
+        the geoip command.
+    '''
+    return dict(
+        mode=geoip2.database.MODE_SHM if shared_memory else geoip2.database.MODE_AUTO,
+        network_cache_size=network_cache_size, record_cache_size=record_cache_size,
+        ipv4_table_bits=ipv4_table_bits, ipv4_index=ipv4_index,
+        ipv4_index_path=path + '.ipv4idx' if ipv4_index else None, prefetch=prefetch, lock_tree=lock_tree)
+
+
+def file_identity(path):
+    ''' Returns the identity of a file: its device, inode, size and modification time.
+    '''
+    stat = os.stat(path)
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class ReaderManager(object):
+    ''' Keeps a reader open for each database of a search, and reopens the databases whose files have changed.
+    '''
+    def __init__(self, open_reader):
+        ''' open_reader(path, database) returns a new reader for a database file.
+        '''
+        self.readers = {}
+        self.reloads = 0
+        self._open_reader = open_reader
+        self._files = {}
+
+    def open(self, database, path):
+        ''' Opens the reader of a database, and records the identity of its file.
+        '''
+        # Take the identity first: if the file is replaced while it is being opened, the next refresh reopens it.
+        identity = file_identity(path)
+        reader = self._open_reader(path, database)
+        self.readers[database] = reader
+        self._files[database] = (path, identity)
+        return reader
+
+    def refresh(self):
+        ''' Reopens each database whose file has changed since it was opened, and swaps the new reader in. The old
+            reader is closed, so this must only be called between lookups (e.g. between chunks of events). Returns the
+            names of the databases whose readers were replaced, and a list of (database, path, error) for the files
+            that could not be opened; those are tried again on the next refresh.
+
+            A file that could not be opened keeps its old reader if it was replaced, as the old reader still has the
+            old file open. If it was modified in place (e.g. truncated while it is copied over), the old reader is no
+            longer safe to use: it is closed and replaced with None until the file can be opened again.
+        '''
+        reloaded = []
+        failed = []
+        for database, (path, identity) in list(self._files.items()):
+            try:
+                current = file_identity(path)
+            except OSError:
+                continue    # Being replaced; the old reader keeps the old file open until the new one is in place.
+            if current == identity:
+                continue
+            old_reader = self.readers[database]
+            in_place = current[:2] == identity[:2]
+            try:
+                reader = self._open_reader(path, database)
+            except Exception as error:  # pylint: disable=broad-except
+                failed.append((database, path, error))
+                if in_place and old_reader is not None:
+                    old_reader.close()
+                    self.readers[database] = None
+                    reloaded.append(database)
+                continue
+            self._files[database] = (path, current)
+            # A file with the same build (build_epoch) as the open database, e.g. one that was only touched or was
+            #   restored from a copy, is not swapped in, unless it was resized in place under the old reader.
+            if (old_reader is not None and reader.metadata().build_epoch == old_reader.metadata().build_epoch
+                    and not (in_place and current[2] != identity[2])):
+                reader.close()
+                continue
+            self.readers[database] = reader
+            if old_reader is not None:
+                old_reader.close()
+            self.reloads += 1
+            reloaded.append(database)
+        return reloaded, failed
+
+    def close(self):
+        ''' Closes every open reader.
+        '''
+        for reader in self.readers.values():
+            if reader is not None:
+                reader.close()
+        self.readers = {}
+        self._files = {}
@@ -0,0 +1,143 @@
+"""
+=============
+Network Cache
+=============
+
+"""
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from ipaddress import IPv4Address, IPv6Address
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+class NetworkCache:
+    """A bounded cache of lookup results keyed by the network they belong to.
+
+    A MaxMind DB lookup returns the record together with the prefix length of
+    the network that contains the address. This cache stores each result
+    under the integer range ``(start, end)`` of that network, so a single
+    lookup answers every later address in the same network without walking
+    the search tree or decoding the record again. This is more effective than
+    a per-address cache on data where many distinct addresses share a
+    network, such as scans or CDN traffic.
+
+    The networks returned by one database never overlap, so each address
+    version keeps its ranges in sorted lists and looks them up with a binary
+    search. When the cache is full, the least recently used network is
+    evicted, so the networks that many addresses hit stay cached while those
+    of one-off addresses, such as in a scan, make way for new ones.
+
+    Addresses are given either as ``ipaddress`` objects (:py:meth:`get` and
+    :py:meth:`put`) or as the ``(bit count, integer value)`` keys of
+    :py:func:`maxminddb.parse_addresses` (:py:meth:`get_key` and
+    :py:meth:`put_key`).
+
+    Cached values are shared between hits and must not be modified.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        """Create a NetworkCache.
+
+        :param maxsize: The maximum number of networks to cache.
+
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Keyed by the number of bits in an address, 32 or 128.
+        self._starts: Dict[int, List[int]] = {32: [], 128: []}
+        self._ends: Dict[int, List[int]] = {32: [], 128: []}
+        self._values: Dict[int, List[Any]] = {32: [], 128: []}
+        # The networks as (bit count, start), least recently used first.
+        self._order: "OrderedDict[Tuple[int, int], None]" = OrderedDict()
+
+    def get(self, address: Union[IPv4Address, IPv6Address]) -> Optional[Any]:
+        """Return the value cached for the network containing the address.
+
+        :param address: The address as an ``ipaddress`` object.
+
+        :returns: The cached value, or ``None`` if no cached network contains
+          the address.
+
+        """
+        return self.get_key((address.max_prefixlen, int(address)))
+
+    def get_key(self, key: Tuple[int, int]) -> Optional[Any]:
+        """Return the value cached for the network containing an address key.
+
+        :param key: The bit count (32 or 128) and integer value of the
+          address.
+
+        :returns: The cached value, or ``None`` if no cached network contains
+          the address.
+
+        """
+        (bit_count, value) = key
+        index = bisect_right(self._starts[bit_count], value) - 1
+        if index >= 0 and value <= self._ends[bit_count][index]:
+            self.hits += 1
+            self._order.move_to_end((bit_count, self._starts[bit_count][index]))
+            return self._values[bit_count][index]
+        self.misses += 1
+        return None
+
+    def put(
+        self, address: Union[IPv4Address, IPv6Address], prefix_len: int, value: Any
+    ) -> None:
+        """Cache a value for the network containing the address.
+
+        :param address: An address in the network as an ``ipaddress`` object.
+        :param prefix_len: The prefix length of the network.
+        :param value: The value to cache.
+
+        """
+        self.put_key((address.max_prefixlen, int(address)), prefix_len, value)
+
+    def put_key(self, key: Tuple[int, int], prefix_len: int, value: Any) -> None:
+        """Cache a value for the network containing an address key.
+
+        :param key: The bit count (32 or 128) and integer value of an address
+          in the network.
+        :param prefix_len: The prefix length of the network.
+        :param value: The value to cache.
+
+        """
+        (bit_count, address) = key
+        host_bits = bit_count - prefix_len
+        start = address >> host_bits << host_bits
+        starts = self._starts[bit_count]
+        index = bisect_right(starts, start)
+        if index and starts[index - 1] == start:
+            return
+        starts.insert(index, start)
+        self._ends[bit_count].insert(index, start | ((1 << host_bits) - 1))
+        self._values[bit_count].insert(index, value)
+        self._order[(bit_count, start)] = None
+        if len(self._order) > self.maxsize:
+            self._evict()
+
+    def clear(self) -> None:
+        """Remove every cached network."""
+        for bit_count in (32, 128):
+            self._starts[bit_count].clear()
+            self._ends[bit_count].clear()
+            self._values[bit_count].clear()
+        self._order.clear()
+
+    def _evict(self) -> None:
+        ((bit_count, start), _) = self._order.popitem(last=False)
+        starts = self._starts[bit_count]
+        index = bisect_left(starts, start)
+        del starts[index]
+        del self._ends[bit_count][index]
+        del self._values[bit_count][index]
+        self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._order)
+
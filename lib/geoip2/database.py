@@ -5,8 +5,21 @@ GeoIP2 Database Reader
 
 """
 import inspect
+import ipaddress
 import os
-from typing import Any, AnyStr, cast, IO, List, Optional, Type, Union
+from typing import (
+    Any,
+    AnyStr,
+    cast,
+    Dict,
+    IO,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 import maxminddb
 
@@ -17,11 +30,15 @@ from maxminddb import (
     MODE_FILE,
     MODE_MEMORY,
     MODE_FD,
+    MODE_SHM,
+    ParsedAddresses,
 )
+from maxminddb.addresses import integer_key, parse_address
 
 import geoip2
 import geoip2.models
 import geoip2.errors
+from geoip2.cache import NetworkCache
 from geoip2.types import IPAddress
 from geoip2.models import (
     ASN,
@@ -41,6 +58,7 @@ __all__ = [
     "MODE_FILE",
     "MODE_MEMORY",
     "MODE_FD",
+    "MODE_SHM",
     "Reader",
 ]
 
@@ -68,11 +86,33 @@ class Reader:
     be thrown.
     """
 
+    # The model class, database type and whether the model is flat for each
+    # lookup method, as used by get_many().
+    _METHODS = {
+        "anonymous_ip": (AnonymousIP, "GeoIP2-Anonymous-IP", True),
+        "asn": (ASN, "GeoLite2-ASN", True),
+        "city": (City, "City", False),
+        "connection_type": (ConnectionType, "GeoIP2-Connection-Type", True),
+        "country": (Country, "Country", False),
+        "domain": (Domain, "GeoIP2-Domain", True),
+        "enterprise": (Enterprise, "Enterprise", False),
+        "isp": (ISP, "GeoIP2-ISP", True),
+    }
+
     def __init__(
         self,
         fileish: Union[AnyStr, int, os.PathLike, IO],
         locales: Optional[List[str]] = None,
         mode: int = MODE_AUTO,
+        network_cache_size: int = 0,
+        ipv4_table_bits: int = 0,
+        ipv4_index: bool = False,
+        ipv4_index_path: Optional[Union[str, os.PathLike]] = None,
+        record_cache_size: int = 0,
+        fields: Optional[List[str]] = None,
+        filter_locales: bool = False,
+        prefetch: bool = False,
+        lock_tree: bool = False,
     ) -> None:
         """Create GeoIP2 Reader.
 
@@ -110,15 +150,78 @@ class Reader:
           * MODE_MEMORY - load database into memory. Pure Python.
           * MODE_FD - the param passed via fileish is a file descriptor, not a
              path. This mode implies MODE_MEMORY. Pure Python.
+          * MODE_SHM - map a copy of the database in shared memory
+             (/dev/shm), which every process of the same user that opens the
+             database in this mode shares. Pure Python.
           * MODE_AUTO - try MODE_MMAP_EXT, MODE_MMAP, MODE_FILE in that order.
              Default.
+        :param network_cache_size: The number of networks to keep in a
+          :py:class:`geoip2.cache.NetworkCache`. Each cached network answers
+          later lookups of any address within it without querying the
+          database. The default value is 0, which disables the cache.
+        :param ipv4_table_bits: The number of leading IPv4 address bits to
+          resolve with a precomputed jump table instead of walking the search
+          tree. The table uses 5 bytes per entry, i.e. 5 * 2 **
+          ipv4_table_bits bytes, and is built when the database is opened.
+          The default value is 0, which disables the table. Setting it
+          requires a pure Python mode.
+        :param ipv4_index: If True, the IPv4 networks of the database are
+          flattened into a sorted index when it is opened, so that an IPv4
+          lookup is a binary search instead of a walk of the search tree. The
+          index uses 9 bytes per IPv4 network and replaces the jump table.
+          Setting it requires a pure Python mode.
+        :param ipv4_index_path: A file to cache the IPv4 index in, e.g. next
+          to the database. The index is loaded from it if it was saved for the
+          same build of the database, and otherwise built and saved to it.
+        :param record_cache_size: The number of decoded database records to
+          keep. Networks that share a record, such as the networks of one
+          ISP, then decode it only once. The default value is 0, which
+          disables the cache. Setting it requires a pure Python mode.
+        :param fields: The parts of each database record to decode, as dotted
+          key paths such as ``"country.names.en"`` or ``"location"``. The
+          other parts of a record are skipped, and the attributes of the
+          models that depend on them are ``None``. A path through a list
+          applies to each element, e.g. ``"subdivisions.iso_code"``. The
+          default value is None, which decodes the whole record. The C
+          extension always decodes whole records.
+        :param filter_locales: If True, only the names in ``locales`` are
+          decoded, and the ``names`` dicts of the records hold no other
+          locales. This saves decoding the names in every locale of the
+          database when only a few are used. The default value is False.
+          Setting it requires a pure Python mode.
+        :param prefetch: If True, the kernel is asked to read the search tree
+          of a memory-mapped database ahead when it is opened, and not to read
+          ahead around the records it looks up, which speeds up the first
+          lookups on a cold page cache. The default value is False. Setting it
+          requires a pure Python mode.
+        :param lock_tree: If True, the search tree of a memory-mapped database
+          is locked in memory while it is open, subject to the memory locking
+          limit of the process (``ulimit -l``). The default value is False.
+          Setting it requires a pure Python mode.
 
         """
         if locales is None:
             locales = ["en"]
-        self._db_reader = maxminddb.open_database(fileish, mode)
+        self._db_reader = maxminddb.open_database(
+            fileish,
+            mode,
+            ipv4_table_bits=ipv4_table_bits,
+            ipv4_index=ipv4_index,
+            ipv4_index_path=ipv4_index_path,
+            record_cache_size=record_cache_size,
+            locales=locales if filter_locales else None,
+            prefetch=prefetch,
+            lock_tree=lock_tree,
+        )
         self._db_type = self._db_reader.metadata().database_type
         self._locales = locales
+        # Only the pure Python reader can decode part of a record.
+        self._fields = (
+            fields if isinstance(self._db_reader, maxminddb.Reader) else None
+        )
+        self._network_cache = (
+            NetworkCache(network_cache_size) if network_cache_size > 0 else None
+        )
 
     def __enter__(self) -> "Reader":
         return self
@@ -229,19 +332,202 @@ class Reader:
             ISP, self._flat_model_for(geoip2.models.ISP, "GeoIP2-ISP", ip_address)
         )
 
+    def get_many(self, method: str, ip_addresses: Iterable[IPAddress]) -> List[Any]:
+        """Look up many IP addresses at once.
+
+        This is equivalent to calling the method named by ``method`` for each
+        address, but the addresses are looked up in a single batch (see
+        :py:meth:`maxminddb.reader.Reader.get_many_with_prefix_len`), which is
+        considerably faster for large numbers of addresses.
+
+        :param method: The name of the lookup method to use, e.g. ``"city"``
+          or ``"asn"``.
+        :param ip_addresses: IPv4 or IPv6 addresses as strings.
+
+        :returns: A list with the model object for each address, in input
+          order. The entry for an address that is not in the database is
+          ``None``.
+
+        """
+        try:
+            (model_class, types, flat) = self._METHODS[method]
+        except KeyError as ex:
+            raise ValueError(f"Unknown lookup method: {method}") from ex
+        if types not in self._db_type:
+            raise TypeError(
+                f"The {method} method cannot be used with the {self._db_type} database",
+            )
+        ip_addresses = list(ip_addresses)
+        build = self._build_flat_model if flat else self._build_model
+        return [
+            None if record is None else build(model_class, record, prefix_len, ip)
+            for ip, (record, prefix_len) in zip(
+                ip_addresses, self._lookup_many(ip_addresses)
+            )
+        ]
+
+    def raw(self, ip_address: IPAddress) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Get the decoded database record for the IP address.
+
+        This skips the construction of model and record objects, for callers
+        that only read a few values from each record. It works with every
+        database type, and uses the network cache and ``fields`` of the
+        reader like the model methods do.
+
+        :param ip_address: IPv4 or IPv6 address as a string.
+
+        :returns: A tuple of the record as returned by
+          :py:meth:`maxminddb.reader.Reader.get` (``None`` if the address is
+          not in the database) and the prefix length of its network. The
+          record may be shared with other lookups and must not be modified.
+
+        """
+        return self._lookup(ip_address)
+
+    def raw_int(
+        self, value: Union[int, bytes], version: int = 4
+    ) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Get the decoded database record for an IP address given as an integer.
+
+        This is :py:meth:`raw` for callers that already hold addresses as
+        numbers, such as ``src_ip_int`` fields. The address is looked up
+        from the integer directly (see
+        :py:meth:`maxminddb.reader.Reader.get_int_with_prefix_len`).
+
+        :param value: The address as an integer, or packed into 4 or 16
+          bytes.
+        :param version: The IP version (4 or 6) of an integer address. A
+          packed address has the version of its length.
+
+        :returns: A tuple of the record and the prefix length of its
+          network. See :py:meth:`raw`.
+
+        """
+        key = integer_key(value, version)
+        cache = self._network_cache
+        if cache is None:
+            return self._get_key_with_prefix_len(key)
+        result = cache.get_key(key)
+        if result is None:
+            result = self._get_key_with_prefix_len(key)
+            cache.put_key(key, result[1], result)
+        return result
+
+    def raw_many(
+        self, ip_addresses: Union[Iterable[IPAddress], ParsedAddresses]
+    ) -> List[Optional[Tuple[Optional[Dict[str, Any]], int]]]:
+        """Get the decoded database records for many IP addresses at once.
+
+        This is to :py:meth:`raw` what :py:meth:`get_many` is to the model
+        methods.
+
+        :param ip_addresses: IPv4 or IPv6 addresses as strings, or the
+          result of :py:func:`maxminddb.parse_addresses`. Parsing the
+          addresses once saves parsing them again for each database they are
+          looked up in.
+
+        :returns: A list with a (record, prefix length) tuple for each
+          address, in input order. See :py:meth:`raw`. When the addresses
+          are passed parsed, the entry for an address that is not valid, or
+          that is an IPv6 address and the database is IPv4-only, is ``None``.
+
+        """
+        if isinstance(ip_addresses, ParsedAddresses):
+            return self._lookup_parsed(ip_addresses)
+        return self._lookup_many(list(ip_addresses))
+
     def _get(self, database_type: str, ip_address: IPAddress) -> Any:
         if database_type not in self._db_type:
             caller = inspect.stack()[2][3]
             raise TypeError(
                 f"The {caller} method cannot be used with the {self._db_type} database",
             )
-        (record, prefix_len) = self._db_reader.get_with_prefix_len(ip_address)
+        (record, prefix_len) = self._lookup(ip_address)
         if record is None:
             raise geoip2.errors.AddressNotFoundError(
                 f"The address {ip_address} is not in the database.",
             )
         return record, prefix_len
 
+    def _lookup(self, ip_address: IPAddress) -> Any:
+        cache = self._network_cache
+        if cache is None:
+            return self._get_with_prefix_len(ip_address)
+        key = parse_address(ip_address)
+        result = cache.get_key(key)
+        if result is None:
+            result = self._get_with_prefix_len(ip_address)
+            cache.put_key(key, result[1], result)
+        return result
+
+    def _lookup_many(self, ip_addresses: List[IPAddress]) -> List[Any]:
+        # Raise the usual errors for addresses that can not be looked up.
+        results = self._lookup_parsed(
+            ParsedAddresses([parse_address(ip) for ip in ip_addresses])
+        )
+        for ip_address, result in zip(ip_addresses, results):
+            if result is None:
+                self._get_with_prefix_len(ip_address)
+        return results
+
+    def _lookup_parsed(self, addresses: ParsedAddresses) -> List[Any]:
+        cache = self._network_cache
+        if cache is None:
+            return self._get_many_with_prefix_len(addresses)
+
+        keys = addresses.keys
+        results = [None if key is None else cache.get_key(key) for key in keys]
+        missing = [
+            i for i, key in enumerate(keys) if key is not None and results[i] is None
+        ]
+        found = self._get_many_with_prefix_len(
+            ParsedAddresses([keys[i] for i in missing])
+        )
+        for i, result in zip(missing, found):
+            results[i] = result
+            if result is not None:
+                cache.put_key(keys[i], result[1], result)
+        return results
+
+    def _get_with_prefix_len(self, ip_address: IPAddress) -> Any:
+        if self._fields is None:
+            return self._db_reader.get_with_prefix_len(ip_address)
+        return self._db_reader.get_with_prefix_len(ip_address, self._fields)
+
+    def _get_many_with_prefix_len(self, addresses: ParsedAddresses) -> List[Any]:
+        get_many = getattr(self._db_reader, "get_many_with_prefix_len", None)
+        if get_many is None:
+            # The C extension reader has no batch lookup.
+            return [self._get_parsed_with_prefix_len(key) for key in addresses.keys]
+        if self._fields is None:
+            return get_many(addresses)
+        return get_many(addresses, self._fields)
+
+    def _get_parsed_with_prefix_len(self, key: Optional[Tuple[int, int]]) -> Any:
+        if key is None:
+            return None
+        try:
+            return self._get_key_with_prefix_len(key)
+        except ValueError:
+            # An IPv6 address in an IPv4-only database
+            return None
+
+    def _get_key_with_prefix_len(self, key: Tuple[int, int]) -> Any:
+        (bit_count, value) = key
+        get_int = getattr(self._db_reader, "get_int_with_prefix_len", None)
+        if get_int is None:
+            # The C extension reader only looks up addresses.
+            address = (
+                ipaddress.IPv4Address(value)
+                if bit_count == 32
+                else ipaddress.IPv6Address(value)
+            )
+            return self._get_with_prefix_len(address)
+        version = 4 if bit_count == 32 else 6
+        if self._fields is None:
+            return get_int(value, version)
+        return get_int(value, version, self._fields)
+
     def _model_for(
         self,
         model_class: Union[Type[Country], Type[Enterprise], Type[City]],
@@ -249,7 +535,19 @@ class Reader:
         ip_address: IPAddress,
     ) -> Union[Country, Enterprise, City]:
         (record, prefix_len) = self._get(types, ip_address)
-        traits = record.setdefault("traits", {})
+        return self._build_model(model_class, record, prefix_len, ip_address)
+
+    def _build_model(
+        self,
+        model_class: Union[Type[Country], Type[Enterprise], Type[City]],
+        record: Dict[str, Any],
+        prefix_len: int,
+        ip_address: IPAddress,
+    ) -> Union[Country, Enterprise, City]:
+        # The record may be shared with the network cache or with other
+        # addresses in a batch, so copy the parts that are modified below.
+        record = dict(record)
+        traits = record["traits"] = dict(record.get("traits", {}))
         traits["ip_address"] = ip_address
         traits["prefix_len"] = prefix_len
         return model_class(record, locales=self._locales)
@@ -263,6 +561,18 @@ class Reader:
         ip_address: IPAddress,
     ) -> Union[ConnectionType, ISP, AnonymousIP, Domain, ASN]:
         (record, prefix_len) = self._get(types, ip_address)
+        return self._build_flat_model(model_class, record, prefix_len, ip_address)
+
+    def _build_flat_model(  # pylint: disable=no-self-use
+        self,
+        model_class: Union[
+            Type[Domain], Type[ISP], Type[ConnectionType], Type[ASN], Type[AnonymousIP]
+        ],
+        record: Dict[str, Any],
+        prefix_len: int,
+        ip_address: IPAddress,
+    ) -> Union[ConnectionType, ISP, AnonymousIP, Domain, ASN]:
+        record = dict(record)
         record["ip_address"] = ip_address
         record["prefix_len"] = prefix_len
         return model_class(record)
@@ -276,6 +586,24 @@ class Reader:
         """
         return self._db_reader.metadata()
 
+    def statistics(self) -> Dict[str, Any]:
+        """Statistics about the lookup accelerations of the open database.
+
+        :returns: A dict as returned by
+          :py:meth:`maxminddb.reader.Reader.statistics`, or an empty dict
+          when the database is read with the C extension.
+        """
+        statistics = getattr(self._db_reader, "statistics", None)
+        return statistics() if statistics is not None else {}
+
+    @property
+    def network_cache(self) -> Optional[NetworkCache]:
+        """The network cache used by this reader, if it is enabled.
+
+        :type: :py:class:`geoip2.cache.NetworkCache`
+        """
+        return self._network_cache
+
     def close(self) -> None:
         """Closes the GeoIP2 database."""
 
@@ -1,14 +1,55 @@
 """This package contains utility mixins"""
 # pylint: disable=too-few-public-methods
 from abc import ABCMeta
-from typing import Any
+from typing import Any, Dict, Tuple, Type
+
+_SLOT_NAMES: Dict[type, Tuple[str, ...]] = {}
+
+
+def _slot_names(cls: Type) -> Tuple[str, ...]:
+    """The ``__slots__`` of a class and its bases, most derived class first.
+
+    This is the order in which the ``__init__`` methods of the records and
+    models assign their attributes, as they call ``super().__init__`` last.
+    Slots listed in ``_derived_slots``, which are computed from the other
+    attributes, are left out.
+    """
+    names = _SLOT_NAMES.get(cls)
+    if names is None:
+        derived = getattr(cls, "_derived_slots", ())
+        names = tuple(
+            name
+            for klass in cls.__mro__
+            for name in klass.__dict__.get("__slots__", ())
+            if name not in ("__dict__", "__weakref__") and name not in derived
+        )
+        _SLOT_NAMES[cls] = names
+    return names
 
 
 class SimpleEquality(metaclass=ABCMeta):
-    """Naive __dict__ equality mixin"""
+    """Naive attribute equality mixin
+
+    The attributes are read from ``__slots__`` and, for subclasses that do
+    not declare ``__slots__``, from ``__dict__``.
+    """
+
+    __slots__ = ()
+
+    def _attributes(self) -> Dict[str, Any]:
+        attributes = {
+            name: getattr(self, name)
+            for name in _slot_names(self.__class__)
+            if hasattr(self, name)
+        }
+        attributes.update(getattr(self, "__dict__", ()))
+        return attributes
 
     def __eq__(self, other: Any) -> bool:
-        return isinstance(other, self.__class__) and self.__dict__ == other.__dict__
+        return (
+            isinstance(other, self.__class__)
+            and self._attributes() == other._attributes()
+        )
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -74,6 +74,17 @@ class Country(SimpleEquality):
     represented_country: geoip2.records.RepresentedCountry
     traits: geoip2.records.Traits
 
+    __slots__ = (
+        "_locales",
+        "continent",
+        "country",
+        "registered_country",
+        "represented_country",
+        "maxmind",
+        "traits",
+        "raw",
+    )
+
     def __init__(
         self, raw_response: Dict[str, Any], locales: Optional[List[str]] = None
     ) -> None:
@@ -180,10 +191,13 @@ class City(Country):
     postal: geoip2.records.Postal
     subdivisions: geoip2.records.Subdivisions
 
+    __slots__ = ("city", "location", "postal", "subdivisions")
+
     def __init__(
         self, raw_response: Dict[str, Any], locales: Optional[List[str]] = None
     ) -> None:
         super().__init__(raw_response, locales)
+        locales = self._locales
         self.city = geoip2.records.City(locales, **raw_response.get("city", {}))
         self.location = geoip2.records.Location(**raw_response.get("location", {}))
         self.postal = geoip2.records.Postal(**raw_response.get("postal", {}))
@@ -255,6 +269,8 @@ class Insights(City):
 
     """
 
+    __slots__ = ()
+
 
 class Enterprise(City):
     """Model for the GeoIP2 Enterprise database.
@@ -319,6 +335,8 @@ class Enterprise(City):
 
     """
 
+    __slots__ = ()
+
 
 class SimpleModel(SimpleEquality, metaclass=ABCMeta):
     """Provides basic methods for non-location models"""
@@ -326,6 +344,8 @@ class SimpleModel(SimpleEquality, metaclass=ABCMeta):
     raw: Dict[str, Union[bool, str, int]]
     ip_address: str
 
+    __slots__ = ("raw", "_network", "_prefix_len", "ip_address")
+
     def __init__(self, raw: Dict[str, Union[bool, str, int]]) -> None:
         self.raw = raw
         self._network = None
@@ -422,6 +442,15 @@ class AnonymousIP(SimpleModel):
     is_residential_proxy: bool
     is_tor_exit_node: bool
 
+    __slots__ = (
+        "is_anonymous",
+        "is_anonymous_vpn",
+        "is_hosting_provider",
+        "is_public_proxy",
+        "is_residential_proxy",
+        "is_tor_exit_node",
+    )
+
     def __init__(self, raw: Dict[str, bool]) -> None:
         super().__init__(raw)  # type: ignore
         self.is_anonymous = raw.get("is_anonymous", False)
@@ -468,6 +497,8 @@ class ASN(SimpleModel):
     autonomous_system_number: Optional[int]
     autonomous_system_organization: Optional[str]
 
+    __slots__ = ("autonomous_system_number", "autonomous_system_organization")
+
     # pylint:disable=too-many-arguments
     def __init__(self, raw: Dict[str, Union[str, int]]) -> None:
         super().__init__(raw)
@@ -514,6 +545,8 @@ class ConnectionType(SimpleModel):
 
     connection_type: Optional[str]
 
+    __slots__ = ("connection_type",)
+
     def __init__(self, raw: Dict[str, Union[str, int]]) -> None:
         super().__init__(raw)
         self.connection_type = cast(Optional[str], raw.get("connection_type"))
@@ -548,6 +581,8 @@ class Domain(SimpleModel):
 
     domain: Optional[str]
 
+    __slots__ = ("domain",)
+
     def __init__(self, raw: Dict[str, Union[str, int]]) -> None:
         super().__init__(raw)
         self.domain = cast(Optional[str], raw.get("domain"))
@@ -601,6 +636,8 @@ class ISP(ASN):
     isp: Optional[str]
     organization: Optional[str]
 
+    __slots__ = ("isp", "organization")
+
     # pylint:disable=too-many-arguments
     def __init__(self, raw: Dict[str, Union[str, int]]) -> None:
         super().__init__(raw)
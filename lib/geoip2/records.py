@@ -10,16 +10,43 @@ import ipaddress
 
 # pylint:disable=R0903
 from abc import ABCMeta
-from typing import Dict, List, Optional, Type, Union
+from typing import Callable, Dict, List, Optional, Type, Union
 
 from geoip2.mixins import SimpleEquality
 
 
+def _name_resolver(locales: List[str]) -> Callable[[Dict[str, str]], Optional[str]]:
+    """Return a function that picks the name for the preferred locale.
+
+    The function returns the value of the first of ``locales`` that is in
+    the ``names`` dict passed to it. A record builds it once, when it is
+    created, rather than on each access to ``name``.
+    """
+    if len(locales) == 1:
+        locale = locales[0]
+
+        def resolver(names: Dict[str, str]) -> Optional[str]:
+            return names.get(locale)
+
+    else:
+        preference = tuple(locales)
+
+        def resolver(names: Dict[str, str]) -> Optional[str]:
+            for locale in preference:
+                if locale in names:
+                    return names[locale]
+            return None
+
+    return resolver
+
+
 class Record(SimpleEquality, metaclass=ABCMeta):
     """All records are subclasses of the abstract class ``Record``."""
 
+    __slots__ = ()
+
     def __repr__(self) -> str:
-        args = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items())
+        args = ", ".join(f"{k}={v!r}" for k, v in self._attributes().items())
         return f"{self.__module__}.{self.__class__.__name__}({args})"
 
 
@@ -28,6 +55,11 @@ class PlaceRecord(Record, metaclass=ABCMeta):
 
     names: Dict[str, str]
     _locales: List[str]
+    _resolve_name: Callable[[Dict[str, str]], Optional[str]]
+
+    __slots__ = ("_locales", "_resolve_name", "names")
+    # The resolver is derived from the locales, so it is not compared.
+    _derived_slots = ("_resolve_name",)
 
     def __init__(
         self,
@@ -37,6 +69,7 @@ class PlaceRecord(Record, metaclass=ABCMeta):
         if locales is None:
             locales = ["en"]
         self._locales = locales
+        self._resolve_name = _name_resolver(locales)
         if names is None:
             names = {}
         self.names = names
@@ -45,7 +78,7 @@ class PlaceRecord(Record, metaclass=ABCMeta):
     def name(self) -> Optional[str]:
         """Dict with locale codes as keys and localized name as value."""
         # pylint:disable=E1101
-        return next((self.names.get(x) for x in self._locales if x in self.names), None)
+        return self._resolve_name(self.names)
 
 
 class City(PlaceRecord):
@@ -90,6 +123,8 @@ class City(PlaceRecord):
     confidence: Optional[int]
     geoname_id: Optional[int]
 
+    __slots__ = ("confidence", "geoname_id")
+
     def __init__(
         self,
         locales: Optional[List[str]] = None,
@@ -144,6 +179,8 @@ class Continent(PlaceRecord):
     code: Optional[str]
     geoname_id: Optional[int]
 
+    __slots__ = ("code", "geoname_id")
+
     def __init__(
         self,
         locales: Optional[List[str]] = None,
@@ -214,6 +251,8 @@ class Country(PlaceRecord):
     is_in_european_union: bool
     iso_code: Optional[str]
 
+    __slots__ = ("confidence", "geoname_id", "is_in_european_union", "iso_code")
+
     def __init__(
         self,
         locales: Optional[List[str]] = None,
@@ -295,6 +334,8 @@ class RepresentedCountry(Country):
 
     type: Optional[str]
 
+    __slots__ = ("type",)
+
     def __init__(
         self,
         locales: Optional[List[str]] = None,
@@ -388,6 +429,16 @@ class Location(Record):
     population_density: Optional[int]
     time_zone: Optional[str]
 
+    __slots__ = (
+        "average_income",
+        "accuracy_radius",
+        "latitude",
+        "longitude",
+        "metro_code",
+        "population_density",
+        "time_zone",
+    )
+
     def __init__(
         self,
         average_income: Optional[int] = None,
@@ -424,6 +475,8 @@ class MaxMind(Record):
 
     queries_remaining: Optional[int]
 
+    __slots__ = ("queries_remaining",)
+
     def __init__(self, queries_remaining: Optional[int] = None, **_) -> None:
         self.queries_remaining = queries_remaining
 
@@ -459,6 +512,8 @@ class Postal(Record):
     code: Optional[str]
     confidence: Optional[int]
 
+    __slots__ = ("code", "confidence")
+
     def __init__(
         self, code: Optional[str] = None, confidence: Optional[int] = None, **_
     ) -> None:
@@ -518,6 +573,8 @@ class Subdivision(PlaceRecord):
     geoname_id: Optional[int]
     iso_code: Optional[str]
 
+    __slots__ = ("confidence", "geoname_id", "iso_code")
+
     def __init__(
         self,
         locales: Optional[List[str]] = None,
@@ -815,6 +872,30 @@ class Traits(Record):
     _network: Optional[str]
     _prefix_len: Optional[int]
 
+    __slots__ = (
+        "autonomous_system_number",
+        "autonomous_system_organization",
+        "connection_type",
+        "domain",
+        "is_anonymous",
+        "is_anonymous_proxy",
+        "is_anonymous_vpn",
+        "is_hosting_provider",
+        "is_legitimate_proxy",
+        "is_public_proxy",
+        "is_residential_proxy",
+        "is_satellite_provider",
+        "is_tor_exit_node",
+        "isp",
+        "organization",
+        "static_ip_score",
+        "user_type",
+        "user_count",
+        "ip_address",
+        "_network",
+        "_prefix_len",
+    )
+
     def __init__(
         self,
         autonomous_system_number: Optional[int] = None,
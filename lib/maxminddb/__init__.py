@@ -1,6 +1,6 @@
 # pylint:disable=C0111
 import os
-from typing import IO, AnyStr, Union, cast
+from typing import IO, AnyStr, Optional, Sequence, Union, cast
 
 from .const import (
     MODE_AUTO,
@@ -9,7 +9,9 @@ from .const import (
     MODE_MEMORY,
     MODE_MMAP,
     MODE_MMAP_EXT,
+    MODE_SHM,
 )
+from .addresses import ParsedAddresses, parse_addresses, parse_integers
 from .decoder import InvalidDatabaseError
 from .reader import Reader
 
@@ -28,14 +30,25 @@ __all__ = [
     "MODE_MEMORY",
     "MODE_MMAP",
     "MODE_MMAP_EXT",
+    "MODE_SHM",
+    "ParsedAddresses",
     "Reader",
     "open_database",
+    "parse_addresses",
+    "parse_integers",
 ]
 
 
 def open_database(
     database: Union[AnyStr, int, os.PathLike, IO],
     mode: int = MODE_AUTO,
+    ipv4_table_bits: int = 0,
+    ipv4_index: bool = False,
+    ipv4_index_path: Optional[Union[str, os.PathLike]] = None,
+    record_cache_size: int = 0,
+    locales: Optional[Sequence[str]] = None,
+    prefetch: bool = False,
+    lock_tree: bool = False,
 ) -> Reader:
     """Open a MaxMind DB database
 
@@ -49,8 +62,30 @@ def open_database(
             * MODE_MEMORY - load database into memory. Pure Python.
             * MODE_FD - the param passed via database is a file descriptor, not
                         a path. This mode implies MODE_MEMORY.
+            * MODE_SHM - map a copy of the database in shared memory, which
+                         is shared by every process that opens the database
+                         in this mode. Pure Python.
             * MODE_AUTO - tries MODE_MMAP_EXT, MODE_MMAP, MODE_FILE in that
                           order. Default mode.
+        ipv4_table_bits -- the number of leading IPv4 address bits to resolve
+                           with a precomputed jump table (see Reader). Only
+                           supported by the pure Python reader; MODE_AUTO
+                           skips the C extension when it is set.
+        ipv4_index -- if True, build (or load from ipv4_index_path) an interval
+                      index of the IPv4 networks (see Reader). Only supported
+                      by the pure Python reader, like ipv4_table_bits.
+        ipv4_index_path -- a file to cache the IPv4 index in
+        record_cache_size -- the number of decoded records to cache (see
+                             Reader). Only supported by the pure Python
+                             reader, like ipv4_table_bits.
+        locales -- the locales to keep in "names" maps (see Reader). Only
+                   supported by the pure Python reader, like ipv4_table_bits.
+        prefetch -- if True, give the kernel access hints for the memory map
+                    of the database (see Reader). Only supported by the pure
+                    Python reader, like ipv4_table_bits.
+        lock_tree -- if True, lock the search tree in memory (see Reader).
+                     Only supported by the pure Python reader, like
+                     ipv4_table_bits.
     """
     if mode not in (
         MODE_AUTO,
@@ -59,14 +94,43 @@ def open_database(
         MODE_MEMORY,
         MODE_MMAP,
         MODE_MMAP_EXT,
+        MODE_SHM,
     ):
         raise ValueError(f"Unsupported open mode: {mode}")
 
+    python_options = (
+        ipv4_table_bits != 0
+        or ipv4_index
+        or record_cache_size != 0
+        or locales is not None
+        or prefetch
+        or lock_tree
+    )
     has_extension = _extension and hasattr(_extension, "Reader")
-    use_extension = has_extension if mode == MODE_AUTO else mode == MODE_MMAP_EXT
+    use_extension = (
+        has_extension and not python_options
+        if mode == MODE_AUTO
+        else mode == MODE_MMAP_EXT
+    )
 
     if not use_extension:
-        return Reader(database, mode)
+        return Reader(
+            database,
+            mode,
+            ipv4_table_bits=ipv4_table_bits,
+            ipv4_index=ipv4_index,
+            ipv4_index_path=ipv4_index_path,
+            record_cache_size=record_cache_size,
+            locales=locales,
+            prefetch=prefetch,
+            lock_tree=lock_tree,
+        )
+
+    if python_options:
+        raise ValueError(
+            "ipv4_table_bits, ipv4_index, record_cache_size, locales, prefetch "
+            "and lock_tree are not supported by the MODE_MMAP_EXT reader"
+        )
 
     if not has_extension:
         raise ValueError(
@@ -0,0 +1,160 @@
+"""
+maxminddb.addresses
+~~~~~~~~~~~~~~~~~~~
+
+This module parses IP addresses for lookups, one at a time or in bulk.
+
+"""
+import ipaddress
+import socket
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+# An address as the number of bits in it (32 or 128) and its integer value.
+AddressKey = Tuple[int, int]
+
+# The number of bits in an address of each IP version.
+_BIT_COUNTS = {4: 32, 6: 128}
+_IPV4_END = 1 << 32
+_IPV6_END = 1 << 128
+
+_AF_INET = socket.AF_INET
+_inet_pton = socket.inet_pton
+_from_bytes = int.from_bytes
+
+
+def parse_address(ip_address: Any) -> AddressKey:
+    """Return the bit count and integer value of an IP address
+
+    Dotted IPv4 strings are parsed with inet_pton, which is an order of
+    magnitude faster than the ipaddress module and accepts the same strings.
+    IPv6 and anything else inet_pton rejects are left to the ipaddress
+    module, which raises the usual errors for invalid addresses.
+
+    Arguments:
+    ip_address -- an IP address in the standard string notation, as packed
+                  bytes (4 or 16 bytes) or as an ipaddress object
+    """
+    if isinstance(ip_address, str):
+        try:
+            return 32, _from_bytes(_inet_pton(_AF_INET, ip_address), "big")
+        except (OSError, ValueError):
+            address = ipaddress.ip_address(ip_address)
+    elif isinstance(ip_address, bytes):
+        if len(ip_address) not in (4, 16):
+            raise ValueError(
+                f"Packed addresses must be 4 or 16 bytes long, not {len(ip_address)}"
+            )
+        return len(ip_address) * 8, _from_bytes(ip_address, "big")
+    else:
+        address = ip_address
+    try:
+        return address.max_prefixlen, int(address)
+    except AttributeError as ex:
+        raise TypeError(
+            "addresses must be strings, bytes or ipaddress objects"
+        ) from ex
+
+
+def integer_key(value: Union[int, bytes], version: int = 4) -> AddressKey:
+    """Return the bit count and integer value of an address given as a number
+
+    Arguments:
+    value -- the address as an integer, or packed into 4 or 16 bytes
+    version -- the IP version (4 or 6) of an integer address. A packed
+               address has the version of its length.
+    """
+    if isinstance(value, bytes):
+        return parse_address(value)
+    try:
+        bit_count = _BIT_COUNTS[version]
+    except KeyError:
+        raise ValueError(f"version must be 4 or 6, not {version!r}") from None
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise TypeError("addresses must be integers or bytes")
+    if not 0 <= value < 1 << bit_count:
+        raise ValueError(f"{value} is not a valid IPv{version} address")
+    return bit_count, value
+
+
+class ParsedAddresses:
+    """A batch of IP addresses, parsed once for any number of lookups
+
+    Reader.get_many and Reader.get_many_with_prefix_len accept a
+    ParsedAddresses in place of a list of addresses. They then return None
+    for each address that could not be looked up, instead of raising.
+
+    Attributes:
+    keys -- the bit count and integer value of each address, or None for an
+            address that is not valid
+    valid -- a bytearray with 1 for each valid address and 0 for each
+             invalid one, in input order
+    """
+
+    __slots__ = ("keys", "valid")
+
+    def __init__(self, keys: List[Optional[AddressKey]]) -> None:
+        self.keys = keys
+        self.valid = bytearray(key is not None for key in keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def parse_addresses(ip_addresses: Iterable[Any]) -> ParsedAddresses:
+    """Parse IP addresses in bulk
+
+    This is the batch form of parse_address. Invalid addresses, and values
+    that are not addresses at all, are flagged in the valid mask of the
+    result rather than raising.
+
+    Arguments:
+    ip_addresses -- an iterable of IP addresses in the standard string
+                    notation, as packed bytes or as ipaddress objects
+    """
+    inet_pton = _inet_pton
+    af_inet = _AF_INET
+    from_bytes = _from_bytes
+    keys: List[Optional[AddressKey]] = []
+    append = keys.append
+    for ip_address in ip_addresses:
+        if type(ip_address) is str:  # pylint: disable=unidiomatic-typecheck
+            try:
+                append((32, from_bytes(inet_pton(af_inet, ip_address), "big")))
+                continue
+            except (OSError, ValueError):
+                pass
+        try:
+            append(parse_address(ip_address))
+        except (TypeError, ValueError):
+            append(None)
+    return ParsedAddresses(keys)
+
+
+def parse_integers(values: Iterable[Any]) -> ParsedAddresses:
+    """Parse IP addresses given as decimal integers in bulk
+
+    Values below 2**32 are IPv4 addresses, and larger ones up to 2**128 are
+    IPv6 addresses. Each value is an int or a string of decimal digits;
+    anything else is flagged in the valid mask of the result.
+
+    Arguments:
+    values -- an iterable of addresses as integers
+    """
+    keys: List[Optional[AddressKey]] = []
+    append = keys.append
+    for value in values:
+        if type(value) is str:  # pylint: disable=unidiomatic-typecheck
+            if not (value.isdigit() and value.isascii()):
+                append(None)
+                continue
+            value = int(value)
+        elif type(value) is not int:  # pylint: disable=unidiomatic-typecheck
+            append(None)
+            continue
+        if 0 <= value < _IPV4_END:
+            append((32, value))
+        elif _IPV4_END <= value < _IPV6_END:
+            append((128, value))
+        else:
+            append(None)
+    return ParsedAddresses(keys)
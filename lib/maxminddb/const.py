@@ -6,3 +6,4 @@ MODE_MMAP = 2
 MODE_FILE = 4
 MODE_MEMORY = 8
 MODE_FD = 16
+MODE_SHM = 32
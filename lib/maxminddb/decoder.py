@@ -6,7 +6,7 @@ This package contains code for decoding the MaxMind DB data section.
 
 """
 import struct
-from typing import cast, Dict, List, Tuple, Union
+from typing import Any, cast, Dict, List, Optional, Sequence, Tuple, Union
 
 try:
     # pylint: disable=unused-import
@@ -20,15 +20,26 @@ from maxminddb.errors import InvalidDatabaseError
 from maxminddb.file import FileBuffer
 from maxminddb.types import Record
 
+# A projection maps the keys of a map to keep to the projection of their
+# values, or to None to keep the whole value.
+Projection = Dict[str, Optional["Projection"]]  # type: ignore[misc]
+
 
 class Decoder:  # pylint: disable=too-few-public-methods
     """Decoder for the data section of the MaxMind DB"""
 
+    # The types of pointer targets that can be shared between records, and
+    # the longest string among them that is worth keeping.
+    _CACHEABLE_TYPES = (str, int, float, bool, bytes)
+    _CACHEABLE_STRING_LENGTH = 64
+
     def __init__(
         self,
         database_buffer: Union[FileBuffer, "mmap.mmap", bytes],
         pointer_base: int = 0,
         pointer_test: bool = False,
+        pointer_cache_size: int = 4096,
+        locales: Optional[Sequence[str]] = None,
     ) -> None:
         """Created a Decoder for a MaxMind DB
 
@@ -36,10 +47,48 @@ class Decoder:  # pylint: disable=too-few-public-methods
         database_buffer -- an mmap'd MaxMind DB file.
         pointer_base -- the base number to use when decoding a pointer
         pointer_test -- used for internal unit testing of pointer code
+        pointer_cache_size -- the number of pointer targets to keep decoded.
+                              Map keys such as "names" or "iso_code" and other
+                              short strings and numbers are stored once in the
+                              data section and reached through pointers, so
+                              the value decoded for the first pointer to an
+                              offset is kept and returned for every later one.
+                              Only immutable values are kept, and the cache
+                              stops growing when it is full. 0 disables it.
+        locales -- the locales to keep in "names" maps, e.g. ["de", "en"].
+                   The names in every other locale are skipped without being
+                   decoded, unless a projection keeps them explicitly (e.g.
+                   "city.names.ja"). None, the default, keeps every locale.
         """
         self._pointer_test = pointer_test
         self._buffer = database_buffer
         self._pointer_base = pointer_base
+        self._pointer_cache: Dict[int, Any] = {}
+        self._pointer_cache_size = pointer_cache_size
+        self._pointer_cache_hits = 0
+        self._pointer_cache_misses = 0
+        self._names_projection: Optional[Projection] = None
+        if locales is not None:
+            self._names_projection = dict.fromkeys(locales)
+            # Shadow the map decoder of the class for this instance only.
+            self._type_decoder = {  # type: ignore[misc]
+                **self._type_decoder,
+                7: Decoder._decode_map_filtering_names,
+            }
+
+    def statistics(self) -> Dict[str, int]:
+        """Return statistics about the pointer cache
+
+        The keys are:
+        pointer_cache_size -- the number of pointer targets in the cache
+        pointer_cache_hits -- the number of pointers resolved from the cache
+        pointer_cache_misses -- the number of pointers that were decoded
+        """
+        return {
+            "pointer_cache_size": len(self._pointer_cache),
+            "pointer_cache_hits": self._pointer_cache_hits,
+            "pointer_cache_misses": self._pointer_cache_misses,
+        }
 
     def _decode_array(self, size: int, offset: int) -> Tuple[List[Record], int]:
         array = []
@@ -90,7 +139,47 @@ class Decoder:  # pylint: disable=too-few-public-methods
             container[cast(str, key)] = value
         return container, offset
 
+    def _decode_map_filtering_names(
+        self, size: int, offset: int
+    ) -> Tuple[Dict[str, Record], int]:
+        container: Dict[str, Record] = {}
+        for _ in range(size):
+            (key, offset) = self.decode(offset)
+            if key == "names":
+                (value, offset) = self.decode_projection(
+                    offset, cast(Projection, self._names_projection)
+                )
+            else:
+                (value, offset) = self.decode(offset)
+            container[cast(str, key)] = value
+        return container, offset
+
     def _decode_pointer(self, size: int, offset: int) -> Tuple[Record, int]:
+        (pointer, new_offset) = self._read_pointer(size, offset)
+
+        if self._pointer_test:
+            return pointer, new_offset
+
+        cache = self._pointer_cache
+        value = cache.get(pointer)
+        if value is not None:
+            self._pointer_cache_hits += 1
+            return value, new_offset
+        self._pointer_cache_misses += 1
+
+        (value, _) = self.decode(pointer)
+        if (
+            isinstance(value, self._CACHEABLE_TYPES)
+            and len(cache) < self._pointer_cache_size
+            and not (
+                isinstance(value, str)
+                and len(value) > self._CACHEABLE_STRING_LENGTH
+            )
+        ):
+            cache[pointer] = value
+        return value, new_offset
+
+    def _read_pointer(self, size: int, offset: int) -> Tuple[int, int]:
         pointer_size = (size >> 3) + 1
 
         buf = self._buffer[offset : offset + pointer_size]
@@ -107,11 +196,7 @@ class Decoder:  # pylint: disable=too-few-public-methods
             pointer = struct.unpack(b"!I", buf)[0] + 526336 + self._pointer_base
         else:
             pointer = struct.unpack(b"!I", buf)[0] + self._pointer_base
-
-        if self._pointer_test:
-            return pointer, new_offset
-        (value, _) = self.decode(pointer)
-        return value, new_offset
+        return pointer, new_offset
 
     def _decode_uint(self, size: int, offset: int) -> Tuple[int, int]:
         new_offset = offset + size
@@ -161,6 +246,86 @@ class Decoder:  # pylint: disable=too-few-public-methods
         (size, new_offset) = self._size_from_ctrl_byte(ctrl_byte, new_offset, type_num)
         return decoder(self, size, new_offset)
 
+    def decode_projection(
+        self, offset: int, projection: Projection
+    ) -> Tuple[Record, int]:
+        """Decode a section of the data section, keeping only some map keys
+
+        Maps keep only the keys in the projection, and the values of the
+        other keys are skipped without being decoded. A projection applies
+        to each element of an array, and the value of any other type is
+        decoded in full.
+
+        Arguments:
+        offset -- the location of the data structure to decode
+        projection -- the keys to keep, see Projection
+        """
+        (type_num, size, new_offset) = self._read_control(offset)
+        if type_num == 1:
+            (pointer, new_offset) = self._read_pointer(size, new_offset)
+            (value, _) = self.decode_projection(pointer, projection)
+            return value, new_offset
+        if type_num == 7:
+            container: Dict[str, Record] = {}
+            for _ in range(size):
+                (key, new_offset) = self.decode(new_offset)
+                key = cast(str, key)
+                if key not in projection:
+                    new_offset = self._skip(new_offset)
+                    continue
+                key_projection = projection[key]
+                if key_projection is None and key == "names":
+                    key_projection = self._names_projection
+                if key_projection is None:
+                    (container[key], new_offset) = self.decode(new_offset)
+                else:
+                    (container[key], new_offset) = self.decode_projection(
+                        new_offset, key_projection
+                    )
+            return container, new_offset
+        if type_num == 11:
+            array = []
+            for _ in range(size):
+                (value, new_offset) = self.decode_projection(new_offset, projection)
+                array.append(value)
+            return array, new_offset
+        return self._type_decoder[type_num](self, size, new_offset)
+
+    def _skip(self, offset: int) -> int:
+        """Return the offset after the data structure at offset"""
+        (type_num, size, new_offset) = self._read_control(offset)
+        if type_num == 1:
+            return new_offset + (size >> 3) + 1
+        if type_num == 7:
+            for _ in range(size * 2):
+                new_offset = self._skip(new_offset)
+            return new_offset
+        if type_num == 11:
+            for _ in range(size):
+                new_offset = self._skip(new_offset)
+            return new_offset
+        if type_num == 14:
+            # The size of a boolean is its value
+            return new_offset
+        return new_offset + size
+
+    def _read_control(self, offset: int) -> Tuple[int, int, int]:
+        """Return the type, size and payload offset of the data at offset"""
+        new_offset = offset + 1
+        ctrl_byte = self._buffer[offset]
+        type_num = ctrl_byte >> 5
+        # Extended type
+        if not type_num:
+            (type_num, new_offset) = self._read_extended(new_offset)
+
+        if type_num not in self._type_decoder:
+            raise InvalidDatabaseError(
+                f"Unexpected type number ({type_num}) encountered"
+            )
+
+        (size, new_offset) = self._size_from_ctrl_byte(ctrl_byte, new_offset, type_num)
+        return type_num, size, new_offset
+
     def _read_extended(self, offset: int) -> Tuple[int, int]:
         next_byte = self._buffer[offset]
         type_num = next_byte + 7
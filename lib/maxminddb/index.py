@@ -0,0 +1,179 @@
+"""For internal use only. It provides an interval index of the IPv4 networks
+in a MaxMind DB."""
+
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from os import PathLike
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+from maxminddb.errors import InvalidDatabaseError
+
+# The array type code of an unsigned 32-bit integer, which the saved arrays
+# are made of: "I" on every common platform, but its size is not guaranteed.
+_UINT32 = next(code for code in ("I", "L") if array(code).itemsize == 4)
+
+
+class IPv4Index:
+    """The IPv4 part of a search tree, flattened into sorted intervals
+
+    Walking the IPv4 subtree once yields every IPv4 network in the database
+    (including the networks without data) in address order. Between them the
+    networks cover the whole IPv4 space, so the network containing an address
+    is the last one that starts at or before it, which a binary search over
+    the network starts finds without reading the search tree.
+
+    The index is made of three parallel arrays: the first address of each
+    network, the search tree record for it (the data pointer passed to
+    ``Reader._resolve_data_pointer``, or 0 for no data) and its prefix
+    length. It can be saved next to the database and loaded again as long as
+    the database has the same build epoch. The arrays are saved in the byte
+    order of the host, which is recorded in the header, so an index saved on
+    a host with the other byte order is rebuilt rather than misread.
+    """
+
+    _MAGIC = b"MMDBIPV4INDEX\x00\x00\x01"
+    # magic, build_epoch, node_count, record_size, number of networks, and
+    # the byte order of the arrays ("<" or ">")
+    _HEADER = struct.Struct("<16sQIIIc")
+    _BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+
+    def __init__(
+        self,
+        starts: "array[int]",
+        pointers: "array[int]",
+        prefix_lens: "array[int]",
+    ) -> None:
+        self.starts = starts
+        self.pointers = pointers
+        self.prefix_lens = prefix_lens
+
+    @classmethod
+    def build(
+        cls, start_node: int, node_count: int, read_node: Callable[[int, int], int]
+    ) -> "IPv4Index":
+        """Build the index by walking the IPv4 subtree
+
+        Arguments:
+        start_node -- the node for the first bit of an IPv4 address
+        node_count -- the number of nodes in the search tree
+        read_node -- a function returning the record for a node and a bit
+        """
+        starts = array(_UINT32)
+        pointers = array(_UINT32)
+        prefix_lens = array("B")
+        # (node, depth, network) with the network as the first depth bits of
+        # its addresses. Right children are pushed first so that networks
+        # come off the stack in address order.
+        stack: List[Tuple[int, int, int]] = [(start_node, 0, 0)]
+        while stack:
+            (node, depth, network) = stack.pop()
+            if node < node_count:
+                if depth == 32:
+                    raise InvalidDatabaseError("Invalid node in search tree")
+                stack.append((read_node(node, 1), depth + 1, network << 1 | 1))
+                stack.append((read_node(node, 0), depth + 1, network << 1))
+                continue
+            starts.append(network << (32 - depth))
+            pointers.append(node if node > node_count else 0)
+            prefix_lens.append(depth)
+        return cls(starts, pointers, prefix_lens)
+
+    @classmethod
+    def load(
+        cls,
+        path: Union[str, PathLike],
+        build_epoch: int,
+        node_count: int,
+        record_size: int,
+    ) -> Optional["IPv4Index"]:
+        """Load an index saved by ``save``
+
+        Returns None if the file cannot be read or was saved for a different
+        build of the database.
+        """
+        try:
+            with open(path, "rb") as index_file:
+                data = index_file.read()
+            (magic, epoch, nodes, size, count, byte_order) = cls._HEADER.unpack_from(
+                data
+            )
+        except (OSError, struct.error):
+            return None
+        if (magic, epoch, nodes, size, byte_order) != (
+            cls._MAGIC,
+            build_epoch,
+            node_count,
+            record_size,
+            cls._BYTE_ORDER,
+        ) or len(data) != cls._HEADER.size + count * 9:
+            return None
+
+        offset = cls._HEADER.size
+        starts = array(_UINT32)
+        starts.frombytes(data[offset : offset + count * 4])
+        offset += count * 4
+        pointers = array(_UINT32)
+        pointers.frombytes(data[offset : offset + count * 4])
+        offset += count * 4
+        prefix_lens = array("B", data[offset:])
+        return cls(starts, pointers, prefix_lens)
+
+    def save(
+        self,
+        path: Union[str, PathLike],
+        build_epoch: int,
+        node_count: int,
+        record_size: int,
+    ) -> None:
+        """Save the index for a database with the given metadata
+
+        The file is replaced atomically, so concurrent readers see either the
+        old or the new index. Raises OSError if it cannot be written.
+        """
+        temporary_path = f"{os.fspath(path)}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_path, "wb") as index_file:
+                index_file.write(
+                    self._HEADER.pack(
+                        self._MAGIC,
+                        build_epoch,
+                        node_count,
+                        record_size,
+                        len(self),
+                        self._BYTE_ORDER,
+                    )
+                )
+                index_file.write(self.starts.tobytes())
+                index_file.write(self.pointers.tobytes())
+                index_file.write(self.prefix_lens.tobytes())
+            os.replace(temporary_path, path)
+        except OSError:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            raise
+
+    def find(self, value: int) -> Tuple[int, int]:
+        """Return (pointer, prefix_len) for an IPv4 address as an integer"""
+        index = bisect_right(self.starts, value) - 1
+        return self.pointers[index], self.prefix_lens[index]
+
+    def find_sorted(self, values: List[int]) -> Iterable[Tuple[int, Tuple[int, int]]]:
+        """Yield (value, (pointer, prefix_len)) for sorted IPv4 addresses"""
+        starts = self.starts
+        index = 0
+        for value in values:
+            index = bisect_right(starts, value, index) - 1
+            yield value, (self.pointers[index], self.prefix_lens[index])
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the index arrays"""
+        return len(self) * 9
+
+    def __len__(self) -> int:
+        return len(self.starts)
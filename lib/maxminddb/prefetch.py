@@ -0,0 +1,110 @@
+"""For internal use only. It hints the kernel how mapped databases are read, and locks their search trees."""
+
+import ctypes
+import mmap
+import os
+
+
+def advise(buffer: mmap.mmap, tree_size: int, data_start: int) -> bool:
+    """Give the kernel access hints for a memory-mapped database
+
+    The search tree is read ahead (MADV_WILLNEED), so that the pages of a
+    cold database are read from disk in large sequential requests while it is
+    opened, instead of one page fault at a time by the first lookups. Reading
+    ahead around the records of the data section is turned off (MADV_RANDOM),
+    as each lookup reads one record at an unrelated offset. Returns whether
+    the hints were given: madvise() requires Python 3.8 and a system that
+    supports it.
+
+    Arguments:
+    buffer -- the memory map of a database
+    tree_size -- the size of the search tree, which starts the database
+    data_start -- the offset of the data section
+    """
+    if not hasattr(buffer, "madvise") or not hasattr(mmap, "MADV_WILLNEED"):
+        return False
+    size = buffer.size()
+    try:
+        buffer.madvise(mmap.MADV_WILLNEED, 0, min(tree_size, size))
+        # The start of a range must be aligned to a page.
+        start = -(-data_start // mmap.PAGESIZE) * mmap.PAGESIZE
+        if hasattr(mmap, "MADV_RANDOM") and start < size:
+            buffer.madvise(mmap.MADV_RANDOM, start, size - start)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def lock(descriptor: int, length: int) -> int:
+    """Lock the first length bytes of a database file in memory
+
+    The bytes are mapped again, read-only and shared, from the file that the
+    database is mapped from, and that mapping is locked (mlock). The pages
+    are read in, if they are not already, and are kept in memory until
+    unlock() is called, so lookups never wait for the disk to walk the
+    search tree. As the pages are those of the file, they are also the
+    pages of the database's own memory map. Returns the address of the
+    locked mapping. Raises OSError if the system refuses, e.g. when length
+    is more than RLIMIT_MEMLOCK (ulimit -l) allows an unprivileged process
+    to lock, or on a system without mmap() and mlock().
+
+    Arguments:
+    descriptor -- a file descriptor of the database file
+    length -- the number of bytes to lock, from the start of the file
+    """
+    libc = _libc()
+    address = libc.mmap(
+        None, length, mmap.PROT_READ, mmap.MAP_SHARED, descriptor, 0
+    )
+    if address is None or address == _MAP_FAILED:
+        raise _error()
+    if libc.mlock(address, length):
+        error = _error()
+        libc.munmap(address, length)
+        raise error
+    return address
+
+
+def unlock(address: int, length: int) -> None:
+    """Unlock and unmap bytes locked by lock()
+
+    Arguments:
+    address -- the address returned by lock()
+    length -- the number of bytes that were locked
+    """
+    libc = _libc()
+    libc.munlock(address, length)
+    libc.munmap(address, length)
+
+
+_MAP_FAILED = ctypes.c_void_p(-1).value
+_LIBC = None
+
+
+def _libc() -> ctypes.CDLL:
+    # The C library, with the signatures of the functions used here.
+    global _LIBC  # pylint: disable=global-statement
+    if _LIBC is None:
+        if os.name != "posix":
+            raise OSError("locking memory requires mmap() and mlock()")
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.mmap.restype = ctypes.c_void_p
+        libc.mmap.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_size_t,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_long,
+        ]
+        for name in ("munmap", "mlock", "munlock"):
+            function = getattr(libc, name)
+            function.restype = ctypes.c_int
+            function.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        _LIBC = libc
+    return _LIBC
+
+
+def _error() -> OSError:
+    errno = ctypes.get_errno()
+    return OSError(errno, os.strerror(errno))
@@ -11,18 +11,50 @@ except ImportError:
     # pylint: disable=invalid-name
     mmap = None  # type: ignore
 
-import ipaddress
+import os
 import struct
+import time
+from array import array
+from collections import OrderedDict
 from ipaddress import IPv4Address, IPv6Address
 from os import PathLike
-from typing import Any, AnyStr, IO, Optional, Tuple, Union
-
-from maxminddb.const import MODE_AUTO, MODE_MMAP, MODE_FILE, MODE_MEMORY, MODE_FD
-from maxminddb.decoder import Decoder
+from typing import (
+    Any,
+    AnyStr,
+    Dict,
+    Hashable,
+    IO,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from maxminddb.addresses import (
+    AddressKey,
+    ParsedAddresses,
+    integer_key,
+    parse_address,
+)
+from maxminddb.const import (
+    MODE_AUTO,
+    MODE_MMAP,
+    MODE_FILE,
+    MODE_MEMORY,
+    MODE_FD,
+    MODE_SHM,
+)
+from maxminddb.decoder import Decoder, Projection
 from maxminddb.errors import InvalidDatabaseError
 from maxminddb.file import FileBuffer
+from maxminddb.index import IPv4Index
 from maxminddb.types import Record
 
+_UINT32 = struct.Struct("!I")
+_UINT16_UINT8 = struct.Struct("!HB")
+
 
 class Reader:
     """
@@ -35,9 +67,33 @@ class Reader:
 
     _buffer: Union[bytes, FileBuffer, "mmap.mmap"]
     _ipv4_start: Optional[int] = None
+    _ipv4_table: Optional["array[int]"] = None
+    _ipv4_table_depths: Optional["array[int]"] = None
+    _ipv4_table_bits = 0
+    _ipv4_table_build_time = 0.0
+    _ipv4_index: Optional[IPv4Index] = None
+    _ipv4_index_build_time = 0.0
+    _ipv4_index_loaded = False
+    _record_cache: Optional["OrderedDict[Hashable, Record]"] = None
+    _search_tree_prefetched = False
+    _search_tree_locked = False
+    _search_tree_lock_error: Optional[str] = None
+    # A descriptor of the mapped file, kept until the search tree is locked,
+    # and the address and length of the locked mapping of the tree.
+    _lock_descriptor: Optional[int] = None
+    _locked_tree: Optional[Tuple[int, int]] = None
 
     def __init__(
-        self, database: Union[AnyStr, int, PathLike, IO], mode: int = MODE_AUTO
+        self,
+        database: Union[AnyStr, int, PathLike, IO],
+        mode: int = MODE_AUTO,
+        ipv4_table_bits: int = 0,
+        ipv4_index: bool = False,
+        ipv4_index_path: Optional[Union[str, PathLike]] = None,
+        record_cache_size: int = 0,
+        locales: Optional[Sequence[str]] = None,
+        prefetch: bool = False,
+        lock_tree: bool = False,
     ) -> None:
         """Reader for the MaxMind DB file format
 
@@ -51,12 +107,61 @@ class Reader:
             * MODE_AUTO - tries MODE_MMAP and then MODE_FILE. Default.
             * MODE_FD - the param passed via database is a file descriptor, not
                         a path. This mode implies MODE_MEMORY.
+            * MODE_SHM - map a copy of the database in shared memory
+                         (/dev/shm), which is made by the first process to
+                         open the database and mapped by every other process
+                         of the same user.
+        ipv4_table_bits -- the number of leading bits of an IPv4 address to
+                           resolve with a precomputed jump table rather than
+                           by walking the search tree. The table has
+                           2**ipv4_table_bits entries of 5 bytes each (e.g.
+                           320 KiB for 16 bits or 5 MiB for 20 bits) and is
+                           built when the database is opened. 0, the default,
+                           disables the table. At most 24.
+        ipv4_index -- if True, flatten the IPv4 part of the search tree into a
+                      sorted index of networks when the database is opened,
+                      so that an IPv4 lookup is a binary search. The index
+                      takes 9 bytes per IPv4 network in the database and
+                      replaces the jump table.
+        ipv4_index_path -- a file to cache the IPv4 index in. The index is
+                           loaded from it if it was saved for the same
+                           build_epoch, and otherwise built and saved to it.
+        record_cache_size -- the number of decoded data section records to
+                             keep, least recently used first out. Networks
+                             that point to a cached record are answered
+                             without decoding it again. Cached records are
+                             shared by every lookup that returns them and must
+                             not be modified. 0, the default, disables the
+                             cache.
+        locales -- the locales to keep in the "names" maps of records, e.g.
+                   ["de", "en"]. The names in the other locales of the
+                   database are never decoded. None, the default, keeps
+                   every locale.
+        prefetch -- if True, and the database is memory-mapped, ask the
+                    kernel to read the search tree ahead when the database is
+                    opened (MADV_WILLNEED), and not to read ahead around the
+                    records of the data section (MADV_RANDOM). This saves the
+                    first lookups on a cold page cache a page fault per node.
+                    Requires Python 3.8 or later; ignored otherwise.
+        lock_tree -- if True, and the database is memory-mapped, lock the
+                     search tree in memory (mlock) until the reader is
+                     closed, so that it is read in when the database is
+                     opened and never evicted. Locking is subject to
+                     RLIMIT_MEMLOCK (ulimit -l); whether the tree was locked
+                     is reported by ``statistics``.
         """
+        if not 0 <= ipv4_table_bits <= 24:
+            raise ValueError(
+                f"ipv4_table_bits must be between 0 and 24, not {ipv4_table_bits}"
+            )
+
         filename: Any
         if (mode == MODE_AUTO and mmap) or mode == MODE_MMAP:
             with open(database, "rb") as db_file:  # type: ignore
                 self._buffer = mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ)
                 self._buffer_size = self._buffer.size()
+                if lock_tree:
+                    self._lock_descriptor = os.dup(db_file.fileno())
             filename = database
         elif mode in (MODE_AUTO, MODE_FILE):
             self._buffer = FileBuffer(database)  # type: ignore
@@ -71,11 +176,27 @@ class Reader:
             self._buffer = database.read()  # type: ignore
             self._buffer_size = len(self._buffer)  # type: ignore
             filename = database.name  # type: ignore
+        elif mode == MODE_SHM and mmap:
+            # pylint: disable=import-outside-toplevel
+            from maxminddb.shm import open_shared
+
+            descriptor = open_shared(database)  # type: ignore
+            try:
+                self._buffer = mmap.mmap(descriptor, 0, access=mmap.ACCESS_READ)
+            except BaseException:
+                os.close(descriptor)
+                raise
+            self._buffer_size = self._buffer.size()
+            if lock_tree:
+                self._lock_descriptor = descriptor
+            else:
+                os.close(descriptor)
+            filename = database
         else:
             raise ValueError(
                 f"Unsupported open mode ({mode}). Only MODE_AUTO, MODE_FILE, "
-                "MODE_MEMORY and MODE_FD are supported by the pure Python "
-                "Reader"
+                "MODE_MEMORY, MODE_FD and MODE_SHM are supported by the pure "
+                "Python Reader"
             )
 
         metadata_start = self._buffer.rfind(
@@ -103,64 +224,340 @@ class Reader:
         self._decoder = Decoder(
             self._buffer,
             self._metadata.search_tree_size + self._DATA_SECTION_SEPARATOR_SIZE,
+            locales=locales,
         )
+        # Read nodes straight out of mmap'd or in-memory buffers, without
+        # slicing them into intermediate bytes objects.
+        if not isinstance(self._buffer, FileBuffer):
+            self._read_node = {  # type: ignore
+                24: self._read_node_24,
+                28: self._read_node_28,
+                32: self._read_node_32,
+            }.get(self._metadata.record_size, self._read_node)
         self.closed = False
 
+        self._projections: Dict[Hashable, Projection] = {}
+        self._record_cache_size = record_cache_size
+        self._record_cache_hits = 0
+        self._record_cache_misses = 0
+        self._record_cache_evictions = 0
+        if record_cache_size > 0:
+            self._record_cache = OrderedDict()
+
+        if prefetch or lock_tree:
+            self._prefetch(prefetch, lock_tree)
+
+        if ipv4_index:
+            self._open_ipv4_index(ipv4_index_path)
+        elif ipv4_table_bits:
+            self._build_ipv4_table(ipv4_table_bits)
+
     def metadata(self) -> "Metadata":
         """Return the metadata associated with the MaxMind DB file"""
         return self._metadata
 
-    def get(self, ip_address: Union[str, IPv6Address, IPv4Address]) -> Optional[Record]:
+    def statistics(self) -> Dict[str, Any]:
+        """Return statistics about the optional lookup accelerations
+
+        The keys are:
+        ipv4_table_bits -- the number of bits resolved by the IPv4 jump table
+                           (0 if there is no table)
+        ipv4_table_bytes -- the memory used by the IPv4 jump table
+        ipv4_table_build_seconds -- the time taken to build the IPv4 jump table
+        ipv4_index_networks -- the number of networks in the IPv4 index (0 if
+                               there is no index)
+        ipv4_index_bytes -- the memory used by the IPv4 index
+        ipv4_index_build_seconds -- the time taken to build or load the IPv4
+                                    index
+        ipv4_index_loaded -- whether the IPv4 index was loaded from its file
+        record_cache_size -- the number of records in the record cache
+        record_cache_hits -- the number of records returned from the cache
+        record_cache_misses -- the number of records decoded for the cache
+        record_cache_evictions -- the number of records evicted from the cache
+        search_tree_prefetched -- whether the kernel was asked to read the
+                                  search tree ahead (see prefetch)
+        search_tree_locked -- whether the search tree is locked in memory
+        search_tree_lock_error -- why the search tree could not be locked, or
+                                  None
+
+        The statistics of the data section decoder (see
+        ``Decoder.statistics``) are included as well.
+        """
+        index = self._ipv4_index
+        table_bytes = 0
+        if self._ipv4_table is not None and self._ipv4_table_depths is not None:
+            table_bytes = (
+                self._ipv4_table.itemsize + self._ipv4_table_depths.itemsize
+            ) * len(self._ipv4_table)
+        return {
+            "ipv4_table_bits": self._ipv4_table_bits,
+            "ipv4_table_bytes": table_bytes,
+            "ipv4_table_build_seconds": self._ipv4_table_build_time,
+            "ipv4_index_networks": len(index) if index is not None else 0,
+            "ipv4_index_bytes": index.nbytes if index is not None else 0,
+            "ipv4_index_build_seconds": self._ipv4_index_build_time,
+            "ipv4_index_loaded": self._ipv4_index_loaded,
+            "record_cache_size": (
+                len(self._record_cache) if self._record_cache is not None else 0
+            ),
+            "record_cache_hits": self._record_cache_hits,
+            "record_cache_misses": self._record_cache_misses,
+            "record_cache_evictions": self._record_cache_evictions,
+            "search_tree_prefetched": self._search_tree_prefetched,
+            "search_tree_locked": self._search_tree_locked,
+            "search_tree_lock_error": self._search_tree_lock_error,
+            **self._decoder.statistics(),
+        }
+
+    def get(
+        self,
+        ip_address: Union[str, IPv6Address, IPv4Address],
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[Record]:
         """Return the record for the ip_address in the MaxMind DB
 
 
         Arguments:
         ip_address -- an IP address in the standard string notation
+        fields -- the key paths to decode, see get_with_prefix_len
         """
-        (record, _) = self.get_with_prefix_len(ip_address)
+        (record, _) = self.get_with_prefix_len(ip_address, fields)
         return record
 
     def get_with_prefix_len(
-        self, ip_address: Union[str, IPv6Address, IPv4Address]
+        self,
+        ip_address: Union[str, IPv6Address, IPv4Address],
+        fields: Optional[Sequence[str]] = None,
     ) -> Tuple[Optional[Record], int]:
         """Return a tuple with the record and the associated prefix length
 
 
         Arguments:
         ip_address -- an IP address in the standard string notation
+        fields -- if given, a sequence of dotted key paths such as
+                  "country.names.en" or "location". Only these parts of the
+                  record are decoded; the rest of each map is skipped and
+                  left out of the result. A path through an array applies to
+                  each of its elements, e.g. "subdivisions.iso_code".
         """
-        if isinstance(ip_address, str):
-            address = ipaddress.ip_address(ip_address)
-        else:
-            address = ip_address
+        return self._get_key_with_prefix_len(self._address_key(ip_address), fields)
 
-        try:
-            packed_address = bytearray(address.packed)
-        except AttributeError as ex:
-            raise TypeError("argument 1 must be a string or ipaddress object") from ex
+    def get_int(
+        self,
+        value: Union[int, bytes],
+        version: int = 4,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[Record]:
+        """Return the record for an IP address given as an integer
+
+        Arguments:
+        value -- the address as an integer, or packed into 4 or 16 bytes
+        version -- the IP version (4 or 6) of an integer address
+        fields -- the key paths to decode, see get_with_prefix_len
+        """
+        (record, _) = self.get_int_with_prefix_len(value, version, fields)
+        return record
+
+    def get_int_with_prefix_len(
+        self,
+        value: Union[int, bytes],
+        version: int = 4,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[Optional[Record], int]:
+        """Return the record and prefix length for an IP address as an integer
+
+        This walks the search tree from the integer directly, without going
+        through a string or an ipaddress object, for callers that already
+        hold addresses as numbers.
+
+        Arguments:
+        value -- the address as an integer, or packed into 4 or 16 bytes
+        version -- the IP version (4 or 6) of an integer address. A packed
+                   address has the version of its length.
+        fields -- the key paths to decode, see get_with_prefix_len
+        """
+        key = integer_key(value, version)
+        self._check_key(key, value)
+        return self._get_key_with_prefix_len(key, fields)
+
+    def _get_key_with_prefix_len(
+        self, key: AddressKey, fields: Optional[Sequence[str]]
+    ) -> Tuple[Optional[Record], int]:
+        (pointer, prefix_len) = self._find_value_in_tree(key[1], key[0])
+        if pointer:
+            return (
+                self._resolve_data_pointer(pointer, self._projection(fields)),
+                prefix_len,
+            )
+        return None, prefix_len
+
+    def get_many(
+        self,
+        ip_addresses: Union[
+            Iterable[Union[str, bytes, IPv6Address, IPv4Address]], ParsedAddresses
+        ],
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Optional[Record]]:
+        """Return the records for many IP addresses, in input order
+
+        See ``get_many_with_prefix_len`` for details.
+
+        Arguments:
+        ip_addresses -- an iterable of IP addresses in the standard string
+                        notation, as packed bytes or as ipaddress objects,
+                        or a ParsedAddresses
+        fields -- the key paths to decode, see get_with_prefix_len
+        """
+        return [
+            result[0] if result is not None else None
+            for result in self.get_many_with_prefix_len(ip_addresses, fields)
+        ]
+
+    def get_many_with_prefix_len(
+        self,
+        ip_addresses: Union[
+            Iterable[Union[str, bytes, IPv6Address, IPv4Address]], ParsedAddresses
+        ],
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Optional[Tuple[Optional[Record], int]]]:
+        """Return a list of (record, prefix length) tuples, in input order
+
+        This is equivalent to calling ``get_with_prefix_len`` for each address
+        but is considerably faster for large batches. Each distinct address is
+        parsed once. The addresses are sorted so that each tree walk can
+        resume from the deepest node it shares with the previous address, and
+        each distinct record is decoded once. Addresses that resolve to the
+        same record share the same record object.
+
+        The addresses can also be passed already parsed, as returned by
+        maxminddb.addresses.parse_addresses. This saves parsing them again
+        for every database they are looked up in. The result is then None
+        for each address that is not valid or is an IPv6 address in an
+        IPv4-only database, instead of an error being raised.
 
-        if address.version == 6 and self._metadata.ip_version == 4:
+        Arguments:
+        ip_addresses -- an iterable of IP addresses in the standard string
+                        notation, as packed bytes (4 or 16 bytes) or as
+                        ipaddress objects, or a ParsedAddresses
+        fields -- the key paths to decode, see get_with_prefix_len
+        """
+        projection = self._projection(fields)
+        keys: List[Optional[AddressKey]]
+        if isinstance(ip_addresses, ParsedAddresses):
+            keys = ip_addresses.keys
+            if self._metadata.ip_version == 4:
+                keys = [key if key is None or key[0] == 32 else None for key in keys]
+        else:
+            keys = [self._address_key(ip_address) for ip_address in ip_addresses]
+
+        pointers: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        for bit_count in (32, 128):
+            values = sorted(
+                {key[1] for key in keys if key is not None and key[0] == bit_count}
+            )
+            if values:
+                for value, result in self._find_sorted_in_tree(values, bit_count):
+                    pointers[(bit_count, value)] = result
+
+        records: Dict[int, Optional[Record]] = {0: None}
+        results = {}
+        for key, (pointer, prefix_len) in pointers.items():
+            if pointer not in records:
+                records[pointer] = self._resolve_data_pointer(pointer, projection)
+            results[key] = (records[pointer], prefix_len)
+        return [results[key] if key is not None else None for key in keys]
+
+    def _address_key(
+        self, ip_address: Union[str, bytes, IPv6Address, IPv4Address]
+    ) -> AddressKey:
+        key = parse_address(ip_address)
+        self._check_key(key, ip_address)
+        return key
+
+    def _check_key(self, key: AddressKey, ip_address: Any) -> None:
+        if key[0] == 128 and self._metadata.ip_version == 4:
             raise ValueError(
                 f"Error looking up {ip_address}. You attempted to look up "
                 "an IPv6 address in an IPv4-only database."
             )
 
-        (pointer, prefix_len) = self._find_address_in_tree(packed_address)
+    def _find_sorted_in_tree(
+        self, values: List[int], bit_count: int
+    ) -> Iterable[Tuple[int, Tuple[int, int]]]:
+        """Yield (value, (pointer, prefix_len)) for sorted, distinct values
 
-        if pointer:
-            return self._resolve_data_pointer(pointer), prefix_len
-        return None, prefix_len
+        path holds the nodes reached after each of the first bits of the
+        previous value, so a walk only has to start at the first bit in which
+        it differs from the previous one.
+        """
+        if bit_count == 32 and self._ipv4_index is not None:
+            yield from self._ipv4_index.find_sorted(values)
+            return
+
+        node_count = self._metadata.node_count
+        table = self._ipv4_table if bit_count == 32 else None
+        # path[0] is the node at depth base: the start node, or an entry of
+        # the IPv4 jump table.
+        path: List[int] = []
+        base = 0
+        previous: Optional[int] = None
+        result = (0, 0)
+
+        for value in values:
+            if previous is not None:
+                common = bit_count - (previous ^ value).bit_length()
+                if common >= result[1]:
+                    # The previous walk ended in a network containing this
+                    # address as well.
+                    yield value, result
+                    continue
+                del path[max(common - base + 1, 0) :]
+            previous = value
+
+            if not path:
+                if table is None:
+                    path.append(self._start_node(bit_count))
+                else:
+                    index = value >> (32 - self._ipv4_table_bits)
+                    path.append(table[index])
+                    base = self._ipv4_table_depths[index]  # type: ignore
+
+            depth = base + len(path) - 1
+            node = path[-1]
+            while depth < bit_count and node < node_count:
+                node = self._read_node(node, (value >> (bit_count - 1 - depth)) & 1)
+                depth += 1
+                path.append(node)
+
+            if node == node_count:
+                # Record is empty
+                result = (0, depth)
+            elif node > node_count:
+                result = (node, depth)
+            else:
+                raise InvalidDatabaseError("Invalid node in search tree")
+            yield value, result
 
     def _find_address_in_tree(self, packed: bytearray) -> Tuple[int, int]:
-        bit_count = len(packed) * 8
-        node = self._start_node(bit_count)
+        return self._find_value_in_tree(int.from_bytes(packed, "big"), len(packed) * 8)
+
+    def _find_value_in_tree(self, value: int, bit_count: int) -> Tuple[int, int]:
         node_count = self._metadata.node_count
 
-        i = 0
+        if bit_count == 32 and self._ipv4_index is not None:
+            return self._ipv4_index.find(value)
+        if bit_count == 32 and self._ipv4_table is not None:
+            index = value >> (32 - self._ipv4_table_bits)
+            node = self._ipv4_table[index]
+            i = self._ipv4_table_depths[index]  # type: ignore
+        else:
+            node = self._start_node(bit_count)
+            i = 0
+
+        read_node = self._read_node
         while i < bit_count and node < node_count:
-            bit = 1 & (packed[i >> 3] >> 7 - (i % 8))
-            node = self._read_node(node, bit)
-            i = i + 1
+            node = read_node(node, (value >> (bit_count - 1 - i)) & 1)
+            i += 1
 
         if node == node_count:
             # Record is empty
@@ -187,7 +584,89 @@ class Reader:
         self._ipv4_start = node
         return node
 
+    def _build_ipv4_table(self, bits: int) -> None:
+        """Build the IPv4 jump table
+
+        Entry i of the table holds the node reached by walking the first bits
+        of the IPv4 addresses that start with i, and the depth at which it was
+        reached. The depth is only less than bits where the walk ended in a
+        data (or empty) record.
+        """
+        start_time = time.perf_counter()
+        node_count = self._metadata.node_count
+        nodes = [self._start_node(32)]
+        depths = [0]
+        for depth in range(1, bits + 1):
+            next_nodes = []
+            next_depths = []
+            for node, node_depth in zip(nodes, depths):
+                if node < node_count:
+                    next_nodes.append(self._read_node(node, 0))
+                    next_nodes.append(self._read_node(node, 1))
+                    next_depths += (depth, depth)
+                else:
+                    next_nodes += (node, node)
+                    next_depths += (node_depth, node_depth)
+            nodes = next_nodes
+            depths = next_depths
+
+        self._ipv4_table = array("I", nodes)
+        self._ipv4_table_depths = array("B", depths)
+        self._ipv4_table_bits = bits
+        self._ipv4_table_build_time = time.perf_counter() - start_time
+
+    def _prefetch(self, prefetch: bool, lock_tree: bool) -> None:
+        if not mmap or not isinstance(self._buffer, mmap.mmap):
+            if lock_tree:
+                self._search_tree_lock_error = "the database is not memory-mapped"
+            return
+        # pylint: disable=import-outside-toplevel
+        from maxminddb.prefetch import advise, lock
+
+        tree_size = self._metadata.search_tree_size
+        if prefetch:
+            self._search_tree_prefetched = advise(
+                self._buffer, tree_size, tree_size + self._DATA_SECTION_SEPARATOR_SIZE
+            )
+        if lock_tree:
+            length = min(tree_size, self._buffer_size)
+            try:
+                self._locked_tree = (lock(self._lock_descriptor, length), length)
+                self._search_tree_locked = True
+            except OSError as error:
+                self._search_tree_lock_error = str(error)
+            finally:
+                self._close_lock_descriptor()
+
+    def _close_lock_descriptor(self) -> None:
+        if self._lock_descriptor is not None:
+            os.close(self._lock_descriptor)
+            self._lock_descriptor = None
+
+    def _open_ipv4_index(self, path: Optional[Union[str, PathLike]]) -> None:
+        start_time = time.perf_counter()
+        metadata = self._metadata
+        key = (metadata.build_epoch, metadata.node_count, metadata.record_size)
+
+        index = IPv4Index.load(path, *key) if path is not None else None
+        self._ipv4_index_loaded = index is not None
+        if index is None:
+            index = IPv4Index.build(
+                self._start_node(32), metadata.node_count, self._read_node
+            )
+            if path is not None:
+                try:
+                    index.save(path, *key)
+                except OSError:
+                    # The index still works; it will be built again next time.
+                    pass
+
+        self._ipv4_index = index
+        self._ipv4_index_build_time = time.perf_counter() - start_time
+
     def _read_node(self, node_number: int, index: int) -> int:
+        # Only used with a FileBuffer, which cannot be unpacked from in place.
+        # Other buffers use one of the _read_node_* methods (see __init__).
         base_offset = node_number * self._metadata.node_byte_size
 
         record_size = self._metadata.record_size
@@ -209,17 +688,106 @@ class Reader:
             raise InvalidDatabaseError(f"Unknown record size: {record_size}")
         return struct.unpack(b"!I", node_bytes)[0]
 
-    def _resolve_data_pointer(self, pointer: int) -> Record:
+    def _read_node_24(self, node_number: int, index: int) -> int:
+        (high, low) = _UINT16_UINT8.unpack_from(
+            self._buffer, node_number * 6 + index * 3  # type: ignore
+        )
+        return high << 8 | low
+
+    def _read_node_28(self, node_number: int, index: int) -> int:
+        offset = node_number * 7
+        if index:
+            # The low nibble of the middle byte and the last three bytes
+            return (
+                _UINT32.unpack_from(self._buffer, offset + 3)[0]  # type: ignore
+                & 0x0FFFFFFF
+            )
+        # The first three bytes and the high nibble of the middle byte
+        value = _UINT32.unpack_from(self._buffer, offset)[0]  # type: ignore
+        return (value & 0xF0) << 20 | value >> 8
+
+    def _read_node_32(self, node_number: int, index: int) -> int:
+        return _UINT32.unpack_from(
+            self._buffer, node_number * 8 + index * 4  # type: ignore
+        )[0]
+
+    def _projection(
+        self, fields: Optional[Sequence[str]]
+    ) -> Optional[Tuple[Hashable, Projection]]:
+        """Return the cache key and the projection for a sequence of paths"""
+        if fields is None:
+            return None
+        key = tuple(fields)
+        try:
+            return key, self._projections[key]
+        except KeyError:
+            pass
+
+        projection: Projection = {}
+        for path in sorted(set(fields), key=lambda path: path.count(".")):
+            node: Optional[Projection] = projection
+            names = path.split(".")
+            for name in names[:-1]:
+                node = node.setdefault(name, {})  # type: ignore
+                if node is None:
+                    # A shorter path already keeps the whole value.
+                    break
+            else:
+                node[names[-1]] = None  # type: ignore
+        self._projections[key] = projection
+        return key, projection
+
+    def _resolve_data_pointer(
+        self,
+        pointer: int,
+        projection: Optional[Tuple[Hashable, Projection]] = None,
+    ) -> Record:
+        cache = self._record_cache
+        if cache is None:
+            return self._decode_data_pointer(pointer, projection)
+
+        cache_key = pointer if projection is None else (pointer, projection[0])
+        try:
+            record = cache[cache_key]
+        except KeyError:
+            self._record_cache_misses += 1
+        else:
+            self._record_cache_hits += 1
+            cache.move_to_end(cache_key)
+            return record
+
+        record = self._decode_data_pointer(pointer, projection)
+        cache[cache_key] = record
+        if len(cache) > self._record_cache_size:
+            cache.popitem(last=False)
+            self._record_cache_evictions += 1
+        return record
+
+    def _decode_data_pointer(
+        self,
+        pointer: int,
+        projection: Optional[Tuple[Hashable, Projection]] = None,
+    ) -> Record:
         resolved = pointer - self._metadata.node_count + self._metadata.search_tree_size
 
         if resolved >= self._buffer_size:
             raise InvalidDatabaseError("The MaxMind DB file's search tree is corrupt")
 
-        (data, _) = self._decoder.decode(resolved)
+        if projection is not None:
+            (data, _) = self._decoder.decode_projection(resolved, projection[1])
+        else:
+            (data, _) = self._decoder.decode(resolved)
         return data
 
     def close(self) -> None:
         """Closes the MaxMind DB file and returns the resources to the system"""
+        if self._locked_tree is not None:
+            # pylint: disable=import-outside-toplevel
+            from maxminddb.prefetch import unlock
+
+            unlock(*self._locked_tree)
+            self._locked_tree = None
+        self._close_lock_descriptor()
         try:
             self._buffer.close()  # type: ignore
         except AttributeError:
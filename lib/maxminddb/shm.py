@@ -0,0 +1,175 @@
+"""For internal use only. It shares database files between processes in shared memory.
+
+The copies persist after the processes that use them have exited: a copy is
+only removed when a newer build of its database replaces it, or when it is
+deleted by hand. Until then it takes up memory, counted as Shmem in
+/proc/meminfo.
+"""
+
+import os
+import stat
+import zlib
+from typing import Union
+
+# The directory that copies of databases are kept in. It must be on a
+# memory-backed file system (tmpfs).
+SHM_DIRECTORY = "/dev/shm"
+
+_PREFIX = "maxminddb-"
+
+
+def open_shared(database: Union[str, "os.PathLike[str]"]) -> int:
+    """Open a read-only copy of a database file in shared memory
+
+    The first process to open a build of a database copies it into a
+    directory of SHM_DIRECTORY that belongs to the user that runs it (e.g.
+    /dev/shm/maxminddb-1000), which no other user can read or write. Every
+    other process of that user that opens the same file maps that copy
+    instead of reading the file again, so each build of a database is held
+    in memory once however many processes use it. A copy is named after the
+    path of the database and the identity of the file (device, inode, size
+    and modification time), so an updated database gets a new copy, and the
+    copies of older builds of it are removed. Processes that have an old
+    copy mapped keep it until they close it. Returns a file descriptor of
+    the copy, which the caller maps and closes.
+
+    Arguments:
+    database -- the path of a MaxMind DB file
+    """
+    if not os.path.isdir(SHM_DIRECTORY):
+        raise ValueError(
+            f"MODE_SHM requires a shared memory directory ({SHM_DIRECTORY})"
+        )
+    directory = _private_directory()
+    _remove_abandoned(directory)
+    with open(database, "rb") as db_file:
+        source = os.fstat(db_file.fileno())
+        realpath = os.path.realpath(database).encode("utf-8", "surrogateescape")
+        prefix = f"{_PREFIX}{zlib.crc32(realpath):08x}-"
+        path = os.path.join(
+            directory,
+            f"{prefix}{source.st_dev:x}-{source.st_ino:x}-{source.st_size:x}-"
+            f"{source.st_mtime_ns:x}",
+        )
+        descriptor = _open_copy(path, source.st_size)
+        if descriptor is None:
+            _publish(db_file, path)
+            _remove_stale(directory, prefix, path)
+            descriptor = _open_copy(path, source.st_size)
+            if descriptor is None:
+                raise ValueError(f"The shared memory copy {path} is invalid")
+    return descriptor
+
+
+def _private_directory() -> str:
+    # The copies are kept in a directory that only this user can use, as the
+    # names of the copies can be guessed: another user could otherwise plant
+    # a database, or a symbolic link, under the name of a copy.
+    uid = os.getuid()
+    directory = os.path.join(SHM_DIRECTORY, f"{_PREFIX}{uid}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != uid
+        or stat.S_IMODE(info.st_mode) & 0o077
+    ):
+        raise ValueError(
+            f"MODE_SHM requires {directory} to be a directory that belongs to "
+            f"user {uid} and that only it can access"
+        )
+    return directory
+
+
+def _open_copy(path: str, size: int):
+    # Return a descriptor of a complete copy of the database, or None if
+    # there is none. A file that does not look like one of our copies is
+    # removed, so that it is copied again.
+    try:
+        descriptor = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        # ELOOP: a symbolic link.
+        _unlink(path)
+        return None
+    info = os.fstat(descriptor)
+    if (
+        stat.S_ISREG(info.st_mode)
+        and info.st_uid == os.getuid()
+        and not stat.S_IMODE(info.st_mode) & 0o277
+        and info.st_size == size
+    ):
+        return descriptor
+    os.close(descriptor)
+    _unlink(path)
+    return None
+
+
+def _publish(db_file, path: str) -> None:
+    # Copy to a private name and link it into place, so that other processes
+    # never see a partial copy. If another process got there first, its copy
+    # is kept and this one is dropped.
+    temporary = f"{path}.{os.getpid()}.tmp"
+    # Left behind by a process with the same ID that was killed.
+    _unlink(temporary)
+    descriptor = os.open(
+        temporary, os.O_CREAT | os.O_EXCL | os.O_WRONLY | os.O_NOFOLLOW, 0o400
+    )
+    try:
+        with open(descriptor, "wb") as shared_file:
+            db_file.seek(0)
+            while True:
+                chunk = db_file.read(1 << 20)
+                if not chunk:
+                    break
+                shared_file.write(chunk)
+        try:
+            os.link(temporary, path)
+        except FileExistsError:
+            pass
+    finally:
+        _unlink(temporary)
+
+
+def _remove_stale(directory: str, prefix: str, path: str) -> None:
+    name = os.path.basename(path)
+    uid = os.getuid()
+    for entry in os.listdir(directory):
+        if entry.startswith(prefix) and entry != name and not entry.endswith(".tmp"):
+            entry_path = os.path.join(directory, entry)
+            try:
+                if os.lstat(entry_path).st_uid == uid:
+                    os.unlink(entry_path)
+            except OSError:
+                pass
+
+
+def _remove_abandoned(directory: str) -> None:
+    # Remove the temporary copies of processes that were killed while making
+    # them; they are named after the ID of the process.
+    for entry in os.listdir(directory):
+        if not entry.endswith(".tmp"):
+            continue
+        try:
+            pid = int(entry[: -len(".tmp")].rsplit(".", 1)[1])
+        except (IndexError, ValueError):
+            continue
+        if pid == os.getpid():
+            continue
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            _unlink(os.path.join(directory, entry))
+        except OSError:
+            pass
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
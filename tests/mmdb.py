@@ -0,0 +1,386 @@
+"""
+A small MaxMind DB writer for the tests.
+
+It writes search trees with 24, 28 or 32-bit records. An IPv6 tree holds the
+IPv4 networks under ::/96 and aliases ::ffff:0:0/96 and 2002::/16 to them, as
+the MaxMind writers do. Strings of four characters or more and maps are stored
+once in the data section and reached through pointers from then on, so that
+records share their keys, names and nested maps like in the real databases.
+"""
+import ipaddress
+import os
+import random
+import struct
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple, Union
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+import maxminddb  # noqa: E402
+
+# A child of a node: another node, a record or nothing.
+Child = Union[int, Tuple[str, Any], None]
+
+LOCALES = ("de", "en", "es", "fr", "ja", "pt-BR", "ru", "zh-CN")
+
+_IPV4_ALIASES = (
+    ipaddress.ip_network("::ffff:0:0/96"),
+    ipaddress.ip_network("2002::/16"),
+)
+
+
+class DataSection:
+    """The data section of a database, with values shared through pointers"""
+
+    def __init__(self, share: bool = True) -> None:
+        self.data = bytearray()
+        self._share = share
+        self._offsets: Dict[bytes, int] = {}
+
+    def store(self, value: Any) -> int:
+        """Return the offset of a value, writing it if it is new"""
+        encoded = self.encode(value)
+        offset = self._offsets.get(encoded)
+        if offset is None:
+            offset = self._offsets[encoded] = len(self.data)
+            self.data += encoded
+        return offset
+
+    def encode(self, value: Any) -> bytes:
+        """Encode a value, with pointers to the parts that are shared"""
+        if isinstance(value, bool):
+            return _control(14, int(value))
+        if isinstance(value, str):
+            encoded = value.encode("utf-8")
+            return _control(2, len(encoded)) + encoded
+        if isinstance(value, bytes):
+            return _control(4, len(value)) + value
+        if isinstance(value, float):
+            return _control(3, 8) + struct.pack(">d", value)
+        if isinstance(value, int):
+            if value < 0:
+                return _control(8, 4) + struct.pack(">i", value)
+            encoded = value.to_bytes((value.bit_length() + 7) // 8, "big")
+            if value < 1 << 32:
+                return _control(6, len(encoded)) + encoded
+            if value < 1 << 64:
+                return _control(9, len(encoded)) + encoded
+            return _control(10, len(encoded)) + encoded
+        if isinstance(value, list):
+            return _control(11, len(value)) + b"".join(
+                self._child(item) for item in value
+            )
+        if isinstance(value, dict):
+            return _control(7, len(value)) + b"".join(
+                self._child(key) + self._child(item) for key, item in value.items()
+            )
+        raise TypeError(f"cannot encode {value!r}")
+
+    def _child(self, value: Any) -> bytes:
+        if self._share and (
+            isinstance(value, dict) or (isinstance(value, str) and len(value) >= 4)
+        ):
+            return _pointer(self.store(value))
+        return self.encode(value)
+
+
+def _control(type_num: int, size: int) -> bytes:
+    if size < 29:
+        extra = b""
+    elif size < 285:
+        (size, extra) = (29, bytes([size - 29]))
+    elif size < 65821:
+        (size, extra) = (30, (size - 285).to_bytes(2, "big"))
+    else:
+        (size, extra) = (31, (size - 65821).to_bytes(3, "big"))
+    if type_num > 7:
+        return bytes([size, type_num - 7]) + extra
+    return bytes([type_num << 5 | size]) + extra
+
+
+def _pointer(offset: int) -> bytes:
+    if offset < 2048:
+        return bytes([0x20 | offset >> 8, offset & 0xFF])
+    if offset < 526336:
+        offset -= 2048
+        return bytes([0x28 | offset >> 16]) + (offset & 0xFFFF).to_bytes(2, "big")
+    if offset < 134744064:
+        offset -= 526336
+        return bytes([0x30 | offset >> 24]) + (offset & 0xFFFFFF).to_bytes(3, "big")
+    return bytes([0x38]) + offset.to_bytes(4, "big")
+
+
+class SearchTree:
+    """A binary search tree of networks, built in memory"""
+
+    def __init__(self, bit_count: int) -> None:
+        self.bit_count = bit_count
+        self.nodes: List[List[Child]] = [[None, None]]
+
+    def insert(self, value: int, prefix_len: int, child: Child) -> int:
+        """Set the child for a network, adding the nodes above it
+
+        Returns the node the child was set in.
+        """
+        node = 0
+        for depth in range(prefix_len - 1):
+            bit = (value >> (self.bit_count - 1 - depth)) & 1
+            next_node = self.nodes[node][bit]
+            if not isinstance(next_node, int):
+                if next_node is not None:
+                    raise ValueError("networks overlap")
+                next_node = len(self.nodes)
+                self.nodes.append([None, None])
+                self.nodes[node][bit] = next_node
+            node = next_node
+        bit = (value >> (self.bit_count - prefix_len)) & 1
+        if self.nodes[node][bit] is not None:
+            raise ValueError("networks overlap")
+        self.nodes[node][bit] = child
+        return node
+
+    def node_at(self, value: int, prefix_len: int) -> int:
+        """Add an empty node for a network and return it"""
+        node = self.insert(value, prefix_len, None)
+        bit = (value >> (self.bit_count - prefix_len)) & 1
+        child = len(self.nodes)
+        self.nodes.append([None, None])
+        self.nodes[node][bit] = child
+        return child
+
+
+def write_database(
+    path: str,
+    networks: Sequence[Tuple[str, Any]],
+    ip_version: int = 6,
+    record_size: int = 28,
+    build_epoch: int = 1700000000,
+) -> None:
+    """Write a database of records for networks
+
+    Arguments:
+    path -- the file to write
+    networks -- (network, record) pairs of networks that do not overlap. In
+                an IPv6 tree, the IPv4 networks are stored under ::/96.
+    ip_version -- the IP version of the search tree, 4 or 6
+    record_size -- the size of the search tree records, 24, 28 or 32
+    build_epoch -- the build_epoch of the metadata
+    """
+    tree = SearchTree(32 if ip_version == 4 else 128)
+    if ip_version == 6:
+        ipv4_root = tree.node_at(0, 96)
+        for alias in _IPV4_ALIASES:
+            tree.insert(int(alias.network_address), alias.prefixlen, ipv4_root)
+
+    data = DataSection()
+    for network, record in networks:
+        parsed = ipaddress.ip_network(network)
+        value = int(parsed.network_address)
+        prefix_len = parsed.prefixlen
+        if ip_version == 6 and parsed.version == 4:
+            prefix_len += 96
+        tree.insert(value, prefix_len, ("data", data.store(record)))
+
+    node_count = len(tree.nodes)
+
+    def number(child: Child) -> int:
+        if child is None:
+            return node_count
+        if isinstance(child, int):
+            return child
+        return node_count + 16 + child[1]
+
+    search_tree = bytearray()
+    for (left, right) in tree.nodes:
+        search_tree += _node(number(left), number(right), record_size)
+
+    metadata = DataSection(share=False).encode(
+        {
+            "binary_format_major_version": 2,
+            "binary_format_minor_version": 0,
+            "build_epoch": build_epoch,
+            "database_type": "Test-Database",
+            "description": {"en": "A database for the tests"},
+            "ip_version": ip_version,
+            "languages": list(LOCALES),
+            "node_count": node_count,
+            "record_size": record_size,
+        }
+    )
+    with open(path, "wb") as database:
+        database.write(search_tree)
+        database.write(bytes(16))
+        database.write(data.data)
+        database.write(b"\xab\xcd\xefMaxMind.com")
+        database.write(metadata)
+
+
+def _node(left: int, right: int, record_size: int) -> bytes:
+    if record_size == 24:
+        return left.to_bytes(3, "big") + right.to_bytes(3, "big")
+    if record_size == 28:
+        middle = (left >> 24) << 4 | right >> 24
+        return (
+            (left & 0xFFFFFF).to_bytes(3, "big")
+            + bytes([middle])
+            + (right & 0xFFFFFF).to_bytes(3, "big")
+        )
+    if record_size == 32:
+        return left.to_bytes(4, "big") + right.to_bytes(4, "big")
+    raise ValueError(f"unsupported record size {record_size}")
+
+
+def city_record(number: int) -> Dict[str, Any]:
+    """Return a record shaped like a GeoIP2 City record"""
+
+    def names(name: str) -> Dict[str, str]:
+        return {locale: f"{name} ({locale})" for locale in LOCALES}
+
+    country = number % 7
+    return {
+        "city": {"geoname_id": 1000 + number, "names": names(f"City {number}")},
+        "continent": {"code": "EU", "geoname_id": 6255148, "names": names("Europe")},
+        "country": {
+            "geoname_id": 2000 + country,
+            "iso_code": f"C{country}",
+            "names": names(f"Country {country}"),
+        },
+        "location": {
+            "accuracy_radius": 100,
+            "latitude": number / 10.0,
+            "longitude": -number / 10.0,
+            "time_zone": "Europe/Berlin",
+        },
+        "postal": {"code": f"P{number}"},
+        "subdivisions": [
+            {
+                "geoname_id": 4000 + number,
+                "iso_code": f"S{number % 3}",
+                "names": names(f"Subdivision {number}"),
+            },
+        ],
+        "traits": {"is_anycast": number % 5 == 0, "network_id": -number},
+    }
+
+
+def random_networks(
+    seed: int, count: int, ip_version: int = 6
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Return (network, record) pairs for random networks that do not overlap
+
+    The IPv4 networks include the first and the last addresses of the IPv4
+    space. For an IPv6 tree there are IPv6 networks as well, under 2400::/6
+    and so away from ::/96 and the aliases. Some records are shared by
+    several networks.
+    """
+    rng = random.Random(seed)
+    candidates = [
+        ipaddress.ip_network("0.0.0.0/24"),
+        ipaddress.ip_network("255.255.255.240/28"),
+    ]
+    while len(candidates) < count:
+        prefix_len = rng.choice((8, 12, 16, 20, 24, 24, 24, 28, 31, 32))
+        value = rng.getrandbits(prefix_len) << (32 - prefix_len)
+        candidates.append(ipaddress.ip_network((value, prefix_len)))
+    if ip_version == 6:
+        for _ in range(count // 2):
+            prefix_len = rng.choice((32, 48, 48, 56, 64, 128))
+            value = (0x09 << 122 | rng.getrandbits(122)) >> (128 - prefix_len)
+            candidates.append(
+                ipaddress.ip_network((value << (128 - prefix_len), prefix_len))
+            )
+
+    networks: List[Any] = []
+    for network in candidates:
+        if not any(
+            network.version == other.version and network.overlaps(other)
+            for other in networks
+        ):
+            networks.append(network)
+    records = count // 2 + 1
+    return [
+        (str(network), city_record(number % records))
+        for number, network in enumerate(networks)
+    ]
+
+
+def sample_addresses(
+    networks: Sequence[Tuple[str, Any]], seed: int, count: int, ip_version: int = 6
+) -> List[str]:
+    """Return addresses in, at the edges of and around the networks
+
+    For an IPv6 tree, some IPv4 addresses are also given in their
+    IPv4-mapped (::ffff:a.b.c.d) and 6to4 (2002:aabb:ccdd::) forms.
+    """
+    rng = random.Random(seed)
+    addresses = {"0.0.0.0", "255.255.255.255"}
+    for network, _ in networks:
+        parsed = ipaddress.ip_network(network)
+        first = int(parsed.network_address)
+        last = int(parsed.broadcast_address)
+        for value in (first, last, last + 1, rng.randint(first, last)):
+            if 0 <= value < 1 << parsed.max_prefixlen:
+                addresses.add(str(parsed.network_address.__class__(value)))
+    while len(addresses) < count:
+        addresses.add(str(ipaddress.IPv4Address(rng.getrandbits(32))))
+    if ip_version == 6:
+        addresses.update(("::", "::ffff:0.0.0.0", "::ffff:255.255.255.255"))
+        for address in rng.sample(sorted(addresses), count // 4):
+            parsed = ipaddress.ip_address(address)
+            if parsed.version == 4:
+                addresses.add(f"::ffff:{parsed}")
+                six_to_four = 0x2002 << 112 | int(parsed) << 80
+                addresses.add(str(ipaddress.IPv6Address(six_to_four)))
+    return sorted(addresses)
+
+
+class TestDatabase(NamedTuple):
+    """A database written for the tests and the addresses to look up in it"""
+
+    path: str
+    ip_version: int
+    record_size: int
+    addresses: List[str]
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """A test case with a database for each IP version and record size
+
+    The reference for every lookup is ``get_with_prefix_len`` of a reader
+    opened without any of the optional accelerations.
+    """
+
+    databases: List[TestDatabase]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.databases = []
+        for ip_version in (4, 6):
+            networks = random_networks(ip_version, 150, ip_version)
+            addresses = sample_addresses(networks, ip_version, 300, ip_version)
+            for record_size in (24, 28, 32):
+                path = os.path.join(
+                    directory.name, f"ipv{ip_version}-{record_size}.mmdb"
+                )
+                write_database(path, networks, ip_version, record_size)
+                cls.databases.append(
+                    TestDatabase(path, ip_version, record_size, addresses)
+                )
+
+    def open(self, database: TestDatabase, **options: Any) -> maxminddb.Reader:
+        """Open a database in MODE_MMAP, closing it after the test"""
+        reader = maxminddb.open_database(database.path, maxminddb.MODE_MMAP, **options)
+        self.addCleanup(reader.close)
+        return reader
+
+    def expected(
+        self, database: TestDatabase, addresses: Sequence[Any]
+    ) -> List[Tuple[Any, int]]:
+        """Return the reference (record, prefix length) of each address"""
+        reader = self.open(database)
+        return [reader.get_with_prefix_len(address) for address in addresses]
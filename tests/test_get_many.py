@@ -0,0 +1,84 @@
+import ipaddress
+import random
+import unittest
+
+from mmdb import DatabaseTestCase
+
+INVALID_ADDRESSES = [
+    "",
+    "1.2.3",
+    "1.2.3.4.5",
+    "256.1.1.1",
+    "1.2.3.4/24",
+    " 1.2.3.4",
+    "::ffff:1.2.3.4.5",
+    "2001:db8::1::1",
+    "not an address",
+]
+
+
+class GetManyTest(DatabaseTestCase):
+    def test_matches_get_with_prefix_len(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                addresses = list(database.addresses)
+                random.Random(4).shuffle(addresses)
+                # Repeated addresses come back in input order as well.
+                addresses += addresses[:50]
+                reader = self.open(database)
+                expected = self.expected(database, addresses)
+                self.assertEqual(reader.get_many_with_prefix_len(addresses), expected)
+                self.assertEqual(
+                    reader.get_many(addresses), [record for record, _ in expected]
+                )
+
+    def test_address_forms(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                addresses = database.addresses[::7]
+                reader = self.open(database)
+                expected = self.expected(database, addresses)
+                parsed = [ipaddress.ip_address(address) for address in addresses]
+                self.assertEqual(reader.get_many_with_prefix_len(parsed), expected)
+                packed = [address.packed for address in parsed]
+                self.assertEqual(reader.get_many_with_prefix_len(packed), expected)
+
+    def test_shares_records(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database)
+                results = reader.get_many_with_prefix_len(database.addresses)
+                records = {}
+                for record, _ in results:
+                    if record is not None:
+                        key = repr(record)
+                        self.assertIs(records.setdefault(key, record), record)
+
+    def test_empty(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                self.assertEqual(self.open(database).get_many([]), [])
+
+    def test_invalid_addresses(self):
+        for database in self.databases:
+            reader = self.open(database)
+            for address in INVALID_ADDRESSES:
+                with self.subTest(database=database.path, address=address):
+                    with self.assertRaises(ValueError):
+                        reader.get_with_prefix_len(address)
+                    with self.assertRaises(ValueError):
+                        reader.get_many(["1.2.3.4", address])
+
+    def test_ipv6_address_in_ipv4_database(self):
+        for database in self.databases:
+            if database.ip_version != 4:
+                continue
+            with self.subTest(database=database.path):
+                reader = self.open(database)
+                for address in ("::1", "::ffff:1.2.3.4"):
+                    with self.assertRaises(ValueError):
+                        reader.get_many(["1.2.3.4", address])
+
+
+if __name__ == "__main__":
+    unittest.main()
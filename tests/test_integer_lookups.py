@@ -0,0 +1,135 @@
+import ipaddress
+import unittest
+
+from mmdb import DatabaseTestCase
+
+from maxminddb import parse_integers
+
+IPV4_END = 1 << 32
+IPV6_END = 1 << 128
+
+BOUNDARY_VALUES = [
+    0,
+    1,
+    IPV4_END - 1,
+    IPV4_END,
+    IPV4_END + 1,
+    0xFFFF << 32,
+    (0xFFFF << 32) + 0x01020304,
+    IPV6_END - 1,
+]
+
+INVALID_VALUES = [
+    -1,
+    IPV6_END,
+    "-1",
+    "+1",
+    " 1",
+    "1.0",
+    "0x10",
+    "١",
+    "",
+    str(IPV6_END),
+    1.0,
+    True,
+    None,
+    b"1",
+]
+
+
+def address(value):
+    """Return the ipaddress object for an integer as parse_integers reads it"""
+    if value < IPV4_END:
+        return ipaddress.IPv4Address(value)
+    return ipaddress.IPv6Address(value)
+
+
+class IntegerLookupTest(DatabaseTestCase):
+    def values(self, database):
+        return BOUNDARY_VALUES + [
+            int(ipaddress.ip_address(address)) for address in database.addresses
+        ]
+
+    def test_parse_integers(self):
+        values = BOUNDARY_VALUES + [str(value) for value in BOUNDARY_VALUES]
+        parsed = parse_integers(values + INVALID_VALUES)
+        self.assertEqual(
+            parsed.keys,
+            [
+                (address(int(value)).max_prefixlen, int(value))
+                for value in values
+            ]
+            + [None] * len(INVALID_VALUES),
+        )
+        self.assertEqual(
+            list(parsed.valid), [1] * len(values) + [0] * len(INVALID_VALUES)
+        )
+
+    def test_get_int_matches_get_with_prefix_len(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database)
+                for value in self.values(database):
+                    parsed = address(value)
+                    if parsed.version > database.ip_version:
+                        with self.assertRaises(ValueError):
+                            reader.get_int(value, 6)
+                        continue
+                    expected = reader.get_with_prefix_len(parsed)
+                    self.assertEqual(
+                        reader.get_int_with_prefix_len(value, parsed.version),
+                        expected,
+                    )
+                    self.assertEqual(
+                        reader.get_int_with_prefix_len(parsed.packed), expected
+                    )
+                    self.assertEqual(reader.get_int(value, parsed.version), expected[0])
+
+    def test_get_int_ipv6_below_the_ipv4_end(self):
+        for database in self.databases:
+            if database.ip_version != 6:
+                continue
+            with self.subTest(database=database.path):
+                reader = self.open(database)
+                for value in (0, 0x01020304, IPV4_END - 1):
+                    self.assertEqual(
+                        reader.get_int_with_prefix_len(value, 6),
+                        reader.get_with_prefix_len(ipaddress.IPv6Address(value)),
+                    )
+
+    def test_get_int_invalid(self):
+        reader = self.open(self.databases[0])
+        for (value, version, error) in (
+            (-1, 4, ValueError),
+            (IPV4_END, 4, ValueError),
+            (IPV6_END, 6, ValueError),
+            (1, 5, ValueError),
+            (b"\x01\x02\x03", 4, ValueError),
+            ("1", 4, TypeError),
+            (True, 4, TypeError),
+            (1.0, 4, TypeError),
+        ):
+            with self.subTest(value=value, version=version):
+                with self.assertRaises(error):
+                    reader.get_int(value, version)
+
+    def test_lookup_matches_get_with_prefix_len(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database)
+                values = self.values(database)
+                expected = []
+                for value in values:
+                    parsed = address(value)
+                    if parsed.version > database.ip_version:
+                        expected.append(None)
+                    else:
+                        expected.append(reader.get_with_prefix_len(parsed))
+                expected += [None] * len(INVALID_VALUES)
+                for values in (values, [str(value) for value in values]):
+                    parsed = parse_integers(values + INVALID_VALUES)
+                    self.assertEqual(reader.get_many_with_prefix_len(parsed), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
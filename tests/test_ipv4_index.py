@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from mmdb import DatabaseTestCase
+
+from maxminddb.index import IPv4Index
+
+
+class IPv4IndexTest(DatabaseTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def assertMatches(self, database, reader):
+        expected = self.expected(database, database.addresses)
+        self.assertEqual(
+            [reader.get_with_prefix_len(address) for address in database.addresses],
+            expected,
+        )
+        self.assertEqual(reader.get_many_with_prefix_len(database.addresses), expected)
+
+    def test_matches_get_with_prefix_len(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database, ipv4_index=True)
+                statistics = reader.statistics()
+                self.assertGreater(statistics["ipv4_index_networks"], 0)
+                self.assertFalse(statistics["ipv4_index_loaded"])
+                self.assertMatches(database, reader)
+
+    def test_save_and_load(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                path = os.path.join(self.directory, os.path.basename(database.path))
+                built = self.open(database, ipv4_index=True, ipv4_index_path=path)
+                self.assertFalse(built.statistics()["ipv4_index_loaded"])
+                self.assertTrue(os.path.exists(path))
+
+                loaded = self.open(database, ipv4_index=True, ipv4_index_path=path)
+                self.assertTrue(loaded.statistics()["ipv4_index_loaded"])
+                self.assertEqual(
+                    loaded.statistics()["ipv4_index_networks"],
+                    built.statistics()["ipv4_index_networks"],
+                )
+                self.assertMatches(database, loaded)
+
+    def test_rejects_other_builds(self):
+        database = self.databases[0]
+        path = os.path.join(self.directory, "index")
+        reader = self.open(database, ipv4_index=True, ipv4_index_path=path)
+        metadata = reader.metadata()
+        key = (metadata.build_epoch, metadata.node_count, metadata.record_size)
+        self.assertIsNotNone(IPv4Index.load(path, *key))
+        for other in (
+            (key[0] + 1, key[1], key[2]),
+            (key[0], key[1] + 1, key[2]),
+            (key[0], key[1], 32 if key[2] != 32 else 24),
+        ):
+            with self.subTest(key=other):
+                self.assertIsNone(IPv4Index.load(path, *other))
+
+    def test_rejects_damaged_files(self):
+        database = self.databases[0]
+        path = os.path.join(self.directory, "index")
+        self.open(database, ipv4_index=True, ipv4_index_path=path)
+        with open(path, "rb") as index_file:
+            data = index_file.read()
+        header_size = IPv4Index._HEADER.size
+        other_byte_order = b">" if IPv4Index._BYTE_ORDER == b"<" else b"<"
+        for name, damaged in (
+            ("empty", b""),
+            ("truncated", data[:-1]),
+            ("header only", data[:header_size]),
+            ("other magic", b"X" + data[1:]),
+            (
+                "other byte order",
+                data[: header_size - 1] + other_byte_order + data[header_size:],
+            ),
+        ):
+            with self.subTest(damage=name):
+                with open(path, "wb") as index_file:
+                    index_file.write(damaged)
+                reader = self.open(database, ipv4_index=True, ipv4_index_path=path)
+                self.assertFalse(reader.statistics()["ipv4_index_loaded"])
+                self.assertMatches(database, reader)
+                # The index was saved again.
+                with open(path, "rb") as index_file:
+                    self.assertEqual(index_file.read(), data)
+
+    def test_missing_directory(self):
+        database = self.databases[0]
+        path = os.path.join(self.directory, "missing", "index")
+        reader = self.open(database, ipv4_index=True, ipv4_index_path=path)
+        self.assertFalse(reader.statistics()["ipv4_index_loaded"])
+        self.assertMatches(database, reader)
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from mmdb import DatabaseTestCase
+
+
+class IPv4TableTest(DatabaseTestCase):
+    def test_matches_get_with_prefix_len(self):
+        for database in self.databases:
+            expected = self.expected(database, database.addresses)
+            for bits in (1, 8, 13, 16):
+                with self.subTest(database=database.path, bits=bits):
+                    reader = self.open(database, ipv4_table_bits=bits)
+                    self.assertEqual(reader.statistics()["ipv4_table_bits"], bits)
+                    self.assertEqual(
+                        [
+                            reader.get_with_prefix_len(address)
+                            for address in database.addresses
+                        ],
+                        expected,
+                    )
+                    self.assertEqual(
+                        reader.get_many_with_prefix_len(database.addresses), expected
+                    )
+
+    def test_invalid_bits(self):
+        database = self.databases[0]
+        for bits in (-1, 25):
+            with self.subTest(bits=bits):
+                with self.assertRaises(ValueError):
+                    self.open(database, ipv4_table_bits=bits)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import ipaddress
+import unittest
+
+from mmdb import DatabaseTestCase
+
+from maxminddb import parse_addresses
+from maxminddb.addresses import parse_address
+
+INVALID_ADDRESSES = [
+    "",
+    "1.2.3",
+    "1.2.3.4.5",
+    "256.1.1.1",
+    "01.2.3.4",
+    "1.2.3.4/24",
+    " 1.2.3.4",
+    "1.2.3.4\n",
+    "::ffff:1.2.3.4.5",
+    "2001:db8::1::1",
+    "not an address",
+    b"\x01\x02\x03",
+    None,
+    42,
+    1.5,
+    ["1.2.3.4"],
+]
+
+
+class ParseAddressesTest(DatabaseTestCase):
+    def test_matches_parse_address(self):
+        values = [
+            "1.2.3.4",
+            "0.0.0.0",
+            "255.255.255.255",
+            "::",
+            "::ffff:1.2.3.4",
+            "2002:102:304::1",
+            "2001:DB8::1",
+            b"\x01\x02\x03\x04",
+            bytes(16),
+            ipaddress.ip_address("10.0.0.1"),
+            ipaddress.ip_address("2001:db8::1"),
+        ] + INVALID_ADDRESSES
+        parsed = parse_addresses(values)
+        self.assertEqual(len(parsed), len(values))
+        for value, key, valid in zip(values, parsed.keys, parsed.valid):
+            with self.subTest(value=value):
+                try:
+                    expected = parse_address(value)
+                except (TypeError, ValueError):
+                    expected = None
+                self.assertEqual(key, expected)
+                self.assertEqual(valid, int(expected is not None))
+        self.assertEqual(parsed.valid.count(0), len(INVALID_ADDRESSES))
+
+    def test_lookup_matches_get_with_prefix_len(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                addresses = database.addresses + INVALID_ADDRESSES + ["::1"]
+                reader = self.open(database)
+                expected = []
+                for address in addresses:
+                    try:
+                        expected.append(reader.get_with_prefix_len(address))
+                    except (TypeError, ValueError):
+                        # Invalid, or an IPv6 address in an IPv4 database
+                        expected.append(None)
+                parsed = parse_addresses(addresses)
+                self.assertEqual(reader.get_many_with_prefix_len(parsed), expected)
+                self.assertEqual(
+                    reader.get_many(parsed),
+                    [result[0] if result else None for result in expected],
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
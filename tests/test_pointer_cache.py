@@ -0,0 +1,73 @@
+import functools
+import unittest
+from unittest import mock
+
+from mmdb import DatabaseTestCase
+
+from maxminddb.decoder import Decoder
+
+
+class PointerCacheTest(DatabaseTestCase):
+    def open_uncached(self, database):
+        """Open a database with the pointer cache of its decoder disabled"""
+        uncached = functools.partial(Decoder, pointer_cache_size=0)
+        with mock.patch("maxminddb.reader.Decoder", uncached):
+            return self.open(database)
+
+    def test_matches_uncached_decoder(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                uncached = self.open_uncached(database)
+                expected = [
+                    uncached.get_with_prefix_len(address)
+                    for address in database.addresses
+                ]
+                self.assertEqual(uncached.statistics()["pointer_cache_hits"], 0)
+                self.assertEqual(self.expected(database, database.addresses), expected)
+                reader = self.open(database)
+                self.assertEqual(
+                    reader.get_many_with_prefix_len(database.addresses), expected
+                )
+
+    def test_statistics(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database)
+                for address in database.addresses:
+                    reader.get(address)
+                statistics = reader.statistics()
+                self.assertGreater(statistics["pointer_cache_size"], 0)
+                self.assertGreater(
+                    statistics["pointer_cache_hits"],
+                    statistics["pointer_cache_misses"],
+                )
+
+    def test_cache_size(self):
+        database = self.databases[0]
+        limited = functools.partial(Decoder, pointer_cache_size=5)
+        with mock.patch("maxminddb.reader.Decoder", limited):
+            reader = self.open(database)
+        expected = self.expected(database, database.addresses)
+        self.assertEqual(
+            [reader.get_with_prefix_len(address) for address in database.addresses],
+            expected,
+        )
+        self.assertEqual(reader.statistics()["pointer_cache_size"], 5)
+
+    def test_records_are_not_shared(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database)
+                address = next(
+                    address for address in database.addresses if reader.get(address)
+                )
+                record = reader.get(address)
+                record["country"]["names"].clear()
+                record["subdivisions"].append({})
+                self.assertEqual(
+                    reader.get(address), self.expected(database, [address])[0][0]
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
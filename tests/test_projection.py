@@ -0,0 +1,91 @@
+import unittest
+
+from mmdb import DatabaseTestCase
+
+FIELDS = [
+    ["country.iso_code"],
+    ["country.names.en", "city.names.en", "location"],
+    ["subdivisions.iso_code", "subdivisions.names.de"],
+    ["traits.is_anycast", "traits.network_id", "postal.code"],
+    # A shorter path keeps the whole value.
+    ["country", "country.names.en"],
+    # Paths into values that are not maps, and keys the records lack.
+    ["location.latitude.value", "missing", "city.missing.key"],
+    [],
+]
+
+
+def project(value, paths):
+    """Return the parts of a decoded record that the paths keep"""
+    if isinstance(value, list):
+        return [project(item, paths) for item in value]
+    if not isinstance(value, dict):
+        return value
+    keep = {}
+    for path in paths:
+        (key, _, rest) = path.partition(".")
+        if keep.get(key, ()) is not None:
+            keep[key] = None if not rest else keep.get(key, []) + [rest]
+    return {
+        key: item if keep[key] is None else project(item, keep[key])
+        for key, item in value.items()
+        if key in keep
+    }
+
+
+class ProjectionTest(DatabaseTestCase):
+    def test_matches_get_with_prefix_len(self):
+        for database in self.databases:
+            full = self.expected(database, database.addresses)
+            reader = self.open(database)
+            for fields in FIELDS:
+                with self.subTest(database=database.path, fields=fields):
+                    expected = [
+                        (project(record, fields) if record else record, length)
+                        for record, length in full
+                    ]
+                    self.assertEqual(
+                        [
+                            reader.get_with_prefix_len(address, fields)
+                            for address in database.addresses
+                        ],
+                        expected,
+                    )
+                    self.assertEqual(
+                        reader.get_many_with_prefix_len(database.addresses, fields),
+                        expected,
+                    )
+
+    def test_without_fields(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database)
+                reader.get_many(database.addresses, ["country.iso_code"])
+                self.assertEqual(
+                    reader.get_many_with_prefix_len(database.addresses),
+                    self.expected(database, database.addresses),
+                )
+
+    def test_with_record_cache(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database, record_cache_size=100)
+                full = self.expected(database, database.addresses)
+                for fields in (["country.iso_code"], None, ["city"]):
+                    expected = [
+                        (
+                            project(record, fields)
+                            if record is not None and fields is not None
+                            else record,
+                            length,
+                        )
+                        for record, length in full
+                    ]
+                    self.assertEqual(
+                        reader.get_many_with_prefix_len(database.addresses, fields),
+                        expected,
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
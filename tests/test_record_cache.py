@@ -0,0 +1,60 @@
+import unittest
+
+from mmdb import DatabaseTestCase
+
+
+class RecordCacheTest(DatabaseTestCase):
+    def test_matches_get_with_prefix_len(self):
+        for database in self.databases:
+            expected = self.expected(database, database.addresses)
+            for size in (1, 10, 10000):
+                with self.subTest(database=database.path, size=size):
+                    reader = self.open(database, record_cache_size=size)
+                    # The second round is answered from the cache.
+                    for _ in range(2):
+                        self.assertEqual(
+                            [
+                                reader.get_with_prefix_len(address)
+                                for address in database.addresses
+                            ],
+                            expected,
+                        )
+                        self.assertEqual(
+                            reader.get_many_with_prefix_len(database.addresses),
+                            expected,
+                        )
+
+    def test_statistics(self):
+        for database in self.databases:
+            with self.subTest(database=database.path):
+                reader = self.open(database, record_cache_size=10)
+                for address in database.addresses:
+                    reader.get(address)
+                statistics = reader.statistics()
+                self.assertEqual(statistics["record_cache_size"], 10)
+                self.assertGreater(statistics["record_cache_hits"], 0)
+                self.assertEqual(
+                    statistics["record_cache_evictions"],
+                    statistics["record_cache_misses"] - 10,
+                )
+
+    def test_returns_cached_records(self):
+        database = self.databases[0]
+        reader = self.open(database, record_cache_size=10)
+        address = next(
+            address for address in database.addresses if reader.get(address)
+        )
+        self.assertIs(reader.get(address), reader.get(address))
+
+    def test_disabled(self):
+        database = self.databases[0]
+        reader = self.open(database)
+        for address in database.addresses:
+            reader.get(address)
+        statistics = reader.statistics()
+        self.assertEqual(statistics["record_cache_size"], 0)
+        self.assertEqual(statistics["record_cache_hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()